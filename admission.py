@@ -0,0 +1,124 @@
+# =================================================================
+#            admission.py - Inbound Flood Control
+#
+# این فایل کلیک‌های تکراری و پشت‌سرهم روی دکمه‌ها را پیش از رسیدن به
+# صف‌های ورودی (intake.offer) و هندلرها کنار می‌گذارد. بدون آن، کاربری
+# که دکمه action یا move_* را پشت سر هم می‌زند، هر بار کل مسیر
+# handle_all_callbacks را اجرا می‌کند: بازیکن تغییر می‌کند و یک ویرایش
+# پیام در صف خروجی قرار می‌گیرد، تا جایی که چند کلاینت مزاحم کل بودجه
+# ارسال ربات را مصرف می‌کنند.
+#   - سطل توکن برای هر کاربر (ratelimit.TokenBucket): نرخ پایدار rate
+#     کلیک در ثانیه با انفجار مجاز burst
+#   - حذف تکراری: همان call.data از همان پیام در کمتر از dedupe_window
+#     ثانیه پس از آخرین کلیک پذیرفته‌شده رد می‌شود (بدون مصرف توکن)
+#   - حافظه محدود و O(1): وضعیت کاربران در یک OrderedDict به ترتیب
+#     آخرین فعالیت نگه داشته می‌شود و با رسیدن به max_users، بی‌کارترین
+#     کاربر حذف می‌شود
+#
+# فقط callback_query محدود می‌شود؛ پیام‌ها و دستورات بدون تغییر عبور
+# می‌کنند. کلیک رد‌شده فقط یک answer_callback_query ارزان (بدون ویرایش
+# پیام) می‌گیرد تا چرخش دکمه در کلاینت متوقف شود؛ این کار در bot.py
+# انجام می‌شود.
+# =================================================================
+
+import threading
+import time
+from collections import OrderedDict
+
+from ratelimit import TokenBucket
+
+# دلایل رد یک آپدیت
+RATE_LIMITED = 'rate'
+DUPLICATE = 'duplicate'
+
+
+class _Caller:
+    """وضعیت ورودی یک کاربر."""
+
+    __slots__ = ('bucket', 'last_key', 'last_at')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.last_key = None                    # (شناسه پیام، call.data) آخرین کلیک پذیرفته‌شده
+        self.last_at = 0.0
+
+
+class AdmissionControl:
+    """
+    گیت ورودی آپدیت‌ها؛ thread-safe. rate <= 0 سطل توکن و
+    dedupe_window <= 0 حذف تکراری را غیرفعال می‌کند.
+    """
+
+    def __init__(self, rate: float = 4.0, burst: float = 8.0, dedupe_window: float = 0.3,
+                 max_users: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.dedupe_window = dedupe_window
+        self.max_users = max_users
+        self._callers = OrderedDict()           # user_id -> _Caller (LRU بر اساس آخرین کلیک)
+        self._lock = threading.Lock()
+        self.stats = {'admitted': 0, 'rejected_rate': 0, 'rejected_duplicate': 0, 'evicted': 0}
+
+    def check(self, update):
+        """None یعنی آپدیت پذیرفته شد؛ در غیر این صورت دلیل رد (RATE_LIMITED یا DUPLICATE)."""
+        call = update.callback_query
+        if call is None or (self.rate <= 0 and self.dedupe_window <= 0):
+            with self._lock:
+                self.stats['admitted'] += 1
+            return None
+
+        message = call.message
+        key = (message.message_id if message is not None else call.inline_message_id, call.data)
+        now = time.monotonic()
+        with self._lock:
+            caller = self._callers.get(call.from_user.id)
+            if caller is None:
+                caller = self._callers[call.from_user.id] = _Caller(TokenBucket(self.rate, self.burst, now)
+                                                                    if self.rate > 0 else None)
+                if len(self._callers) > self.max_users:
+                    self._callers.popitem(last=False)
+                    self.stats['evicted'] += 1
+            else:
+                self._callers.move_to_end(call.from_user.id)
+
+            if key == caller.last_key and now - caller.last_at < self.dedupe_window:
+                self.stats['rejected_duplicate'] += 1
+                return DUPLICATE
+            if caller.bucket is not None and not caller.bucket.try_take(now):
+                self.stats['rejected_rate'] += 1
+                return RATE_LIMITED
+            caller.last_key = key
+            caller.last_at = now
+            self.stats['admitted'] += 1
+        return None
+
+    def tracked(self) -> int:
+        """تعداد کاربرانی که وضعیتشان در حافظه است."""
+        return len(self._callers)
+
+
+# --- بنچمارک ---
+
+def _benchmark(n_checks: int = 1_000_000, n_users: int = 200_000, max_users: int = 50_000):
+    import random
+    from types import SimpleNamespace
+
+    rng = random.Random(0)
+    gate = AdmissionControl(max_users=max_users)
+    message = SimpleNamespace(message_id=1)
+    updates = [SimpleNamespace(callback_query=SimpleNamespace(
+        from_user=SimpleNamespace(id=rng.randrange(n_users)), message=message, inline_message_id=None,
+        data=rng.choice(('action', 'move_up', 'move_down'))))
+        for _ in range(n_checks)]
+
+    started = time.perf_counter()
+    for update in updates:
+        gate.check(update)
+    elapsed = time.perf_counter() - started
+    print(f"{n_checks:,} checks over {n_users:,} users: {elapsed / n_checks * 1e6:.2f} µs/check, "
+          f"tracked {gate.tracked():,} (max {max_users:,})")
+    print(f"  {gate.stats}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,211 @@
+# =================================================================
+#            async_runtime.py - The asyncio Runtime
+#
+# این فایل یک runtime جایگزین برای bot.py بر پایه asyncio فراهم می‌کند.
+# در runtime نخ‌ها هر فراخوانی خروجی یک نخ ارسال‌کننده را برای یک رفت و
+# برگشت کامل HTTPS مسدود می‌کند؛ اینجا:
+#   - تمام فراخوانی‌های Bot API روی یک event loop و با AsyncTeleBot
+#     ارسال می‌شوند؛ یک ClientSession مشترک aiohttp با اتصال‌های
+#     keep-alive (ASYNC_HTTP_CONNECTIONS) و هزاران درخواست هم‌زمان
+#     در جریان (ASYNC_MAX_INFLIGHT)
+#   - زمان‌بندی ارسال (سطل‌های توکن، 429، ادغام ویرایش‌ها) همان
+#     OutboundScheduler است که با poll_op از event loop تخلیه می‌شود
+#   - getUpdates (حالت polling) و سرور HTTP (وب‌هوک، /metrics و
+#     /debug/profile) هم روی همان event loop با aiohttp اجرا می‌شوند
+#     و سرور توسعه Flask دیگر لازم نیست
+#
+# هندلرها، Player و بقیه منطق بازی تغییری نمی‌کنند: آپدیت‌ها مانند قبل
+# به UpdateIntake سپرده می‌شوند و هندلرهای ثبت‌شده در bot.py روی نخ‌های
+# کارگر (به ترتیب هر کاربر) اجرا می‌شوند؛ آن‌ها فقط عملیات خروجی را در
+# صف می‌گذارند و هیچ‌وقت منتظر شبکه نمی‌مانند.
+#
+# اجرا (RUN_MODE مانند bot.py حالت polling یا webhook را انتخاب می‌کند):
+#   python async_runtime.py
+# =================================================================
+
+import asyncio
+import logging
+import os
+import signal
+import time
+
+from aiohttp import web
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+import bot
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# نام متد Bot API هر عملیات OutboundScheduler (برای برچسب متریک‌ها)
+API_METHODS = {'send_message': 'sendMessage', 'reply_to': 'sendMessage',
+               'edit_message_text': 'editMessageText', 'answer_callback_query': 'answerCallbackQuery'}
+
+
+class AsyncSender:
+    """عملیات OutboundScheduler را روی event loop با AsyncTeleBot ارسال می‌کند."""
+
+    def __init__(self, scheduler, async_bot, max_inflight: int = 1000):
+        self.scheduler = scheduler
+        self.bot = async_bot
+        self.max_inflight = max_inflight        # سقف درخواست‌های هم‌زمان در جریان
+        self._inflight = set()
+
+    async def run(self):
+        """تا stop زمان‌بند و تخلیه صف، عملیات آماده را بدون انتظار برای پاسخ قبلی‌ها ارسال می‌کند."""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        # هندلرها از نخ‌های کارگر عملیات اضافه می‌کنند؛ بیدارباش باید thread-safe باشد
+        self.scheduler.wakeup = lambda: loop.call_soon_threadsafe(wakeup.set)
+        try:
+            while True:
+                wakeup.clear()
+                wait, finished = None, False
+                while len(self._inflight) < self.max_inflight:
+                    op, wait, finished = self.scheduler.poll_op()
+                    if op is None:
+                        break
+                    task = loop.create_task(self._send(op))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
+                else:
+                    wait = None                 # ظرفیت پر است؛ پایان هر ارسال بیدارباش می‌دهد
+                if finished and not self._inflight:
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.scheduler.wakeup = None
+
+    async def _send(self, op):
+        method = API_METHODS.get(op.method, op.method)
+        started = time.perf_counter()
+        error = None
+        try:
+            await getattr(self.bot, op.method)(*op.args, **op.kwargs)
+        except Exception as e:
+            error = e
+        metrics.api_seconds.observe(time.perf_counter() - started, method)
+        metrics.api_responses.inc(method, '200' if error is None else str(getattr(error, 'error_code', None)
+                                                                           or type(error).__name__))
+        self.scheduler.complete(op, error)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+
+async def poll_updates(async_bot, timeout: int = 20):
+    """حلقه getUpdates؛ هر دسته آپدیت با یک پرش به executor به صف‌های ورودی سپرده می‌شود."""
+    loop = asyncio.get_running_loop()
+    offset = None
+    while True:
+        try:
+            updates = await async_bot.get_updates(offset=offset, timeout=timeout, request_timeout=timeout + 10)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("getUpdates failed; retrying")
+            await asyncio.sleep(3)
+            continue
+        if updates:
+            offset = updates[-1].update_id + 1
+            # intake.offer(block=True) تا خالی شدن جا صبر می‌کند؛ نباید event loop را مسدود کند
+            await loop.run_in_executor(None, bot.bot.process_new_updates, updates)
+
+
+def create_web_app() -> web.Application:
+    """مسیرهای HTTP همان مسیرهای Flask در bot.py، با همان توابع مشترک."""
+
+    async def index(request):
+        return web.Response(text=bot.ALIVE_TEXT)
+
+    async def webhook(request):
+        payload = await request.text()
+        text, status = await asyncio.get_running_loop().run_in_executor(
+            None, bot.receive_update, payload, request.headers.get(bot.WEBHOOK_SECRET_HEADER))
+        return web.Response(text=text, status=status)
+
+    async def metrics_endpoint(request):
+        if not bot.metrics_authorized(request.query.get('token'), request.headers.get('Authorization')):
+            raise web.HTTPForbidden()
+        text = await asyncio.get_running_loop().run_in_executor(None, metrics.registry.render)
+        return web.Response(body=text.encode(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+    async def profile_endpoint(request):
+        if not bot.METRICS_TOKEN:
+            raise web.HTTPNotFound()
+        if not bot.metrics_authorized(request.query.get('token'), request.headers.get('Authorization')):
+            raise web.HTTPForbidden()
+        text, status = await asyncio.get_running_loop().run_in_executor(
+            None, bot.collect_profile, request.query.get('seconds', 10), request.query.get('interval_ms', 5))
+        return web.Response(text=text, status=status)
+
+    app = web.Application()
+    app.add_routes([web.get('/', index),
+                    web.post(bot.WEBHOOK_PATH, webhook),
+                    web.get('/metrics', metrics_endpoint),
+                    web.get('/debug/profile', profile_endpoint)])
+    return app
+
+
+async def serve(port: int = None, stop: asyncio.Event = None, on_ready=None):
+    """
+    ربات را تا set شدن stop اجرا می‌کند. on_ready(پورت) پس از بالا آمدن سرور
+    HTTP فراخوانی می‌شود (پورت 0 یعنی یک پورت آزاد دلخواه).
+    """
+    if port is None:
+        port = int(os.environ.get('PORT', 5000))
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    # اندازه استخر اتصال‌های keep-alive؛ باید پیش از ساخته شدن اولین session تنظیم شود
+    asyncio_helper.REQUEST_LIMIT = int(os.environ.get('ASYNC_HTTP_CONNECTIONS', 100))
+    async_bot = AsyncTeleBot(bot.BOT_TOKEN)
+    sender = AsyncSender(bot.outbound, async_bot, max_inflight=int(os.environ.get('ASYNC_MAX_INFLIGHT', 1000)))
+    metrics.registry.add_stats('rpg_async', lambda: {'inflight': sender.inflight()}, gauges=('inflight',))
+
+    bot.start_background(senders=False)
+    sender_task = loop.create_task(sender.run())
+    runner = web.AppRunner(create_web_app())
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    if on_ready is not None:
+        on_ready(runner.addresses[0][1])
+
+    poller = None
+    try:
+        if bot.RUN_MODE == 'webhook':
+            await async_bot.set_webhook(**bot.webhook_settings())
+        else:
+            # اگر قبلاً وب‌هوک ثبت شده باشد، getUpdates کار نمی‌کند
+            await async_bot.remove_webhook()
+            poller = loop.create_task(poll_updates(async_bot))
+        await stop.wait()
+    finally:
+        if poller is not None:
+            poller.cancel()
+        await runner.cleanup()
+        # shutdown مسدودکننده است (توقف نخ‌ها و ذخیره بازیکنان)؛ در این مدت
+        # event loop باقی‌مانده صف خروجی را ارسال می‌کند
+        await loop.run_in_executor(None, bot.shutdown)
+        await sender_task
+        await async_bot.close_session()
+
+
+def main():
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"Bot is running ({bot.RUN_MODE}, asyncio)...")
+        await serve(stop=stop)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
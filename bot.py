@@ -8,83 +8,197 @@
 #   - فراخوانی متدها از کلاس Player برای تغییر وضعیت بازیکن
 #   - نمایش اطلاعات و منوها به کاربر
 #   - راه‌اندازی وب‌سرور Flask برای هاستینگ در Render
+#
+# حالت‌های اجرا (متغیر محیطی RUN_MODE):
+#   - polling (پیش‌فرض): python bot.py
+#   - webhook:           gunicorn -c gunicorn.conf.py bot:app
+# هر دو حالت با runtime ناهم‌زمان (asyncio) هم قابل اجرا هستند:
+#   python async_runtime.py
+# (جزئیات در async_runtime.py؛ هندلرها و منطق بازی مشترک‌اند)
 # =================================================================
 
+import hmac
+import math
 import os
+import signal
 import threading
 import telebot
-from flask import Flask
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from flask import Flask, Response, abort, request
 
 # --- وارد کردن ماژول‌های سفارشی پروژه ---
 # Player: کلاس اصلی برای مدیریت وضعیت هر بازیکن
 # gamedata: تمام داده‌های ثابت بازی (نقشه، کوئست‌ها، رتبه‌ها و...)
 from player import Player
-from gamedata import game_world, CULTIVATION_PATHS
+import gametables
+from gametables import GameDataReloader
+from world import game_world
+from storage import create_player_store
+from ingress import UpdateIntake
+from admission import AdmissionControl, RATE_LIMITED
+from render import RenderCache
+from outbound import OutboundScheduler
+from training import TrainingScheduler
+from leaderboard import leaderboard
+from quests import QuestBook, quest_engine, format_quest_log, format_rewards
+from render import build_quest_markup
+import metrics
 
 # --- مقداردهی اولیه ---
 
 # توکن ربات از متغیرهای محیطی خوانده می‌شود تا امنیت حفظ شود
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
-bot = telebot.TeleBot(BOT_TOKEN)
-
-# این دیکشنری، وضعیت تمام بازیکنان آنلاین را نگه می‌دارد
-# کلید: user_id | مقدار: یک شیء کامل از کلاس Player
-players = {}
 
-# --- طراحی کیبوردهای شیشه‌ای (Inline Keyboards) ---
+# حالت دریافت آپدیت‌ها: 'polling' یا 'webhook'
+RUN_MODE = os.environ.get('RUN_MODE', 'polling')
+
+
+class SerializedTeleBot(telebot.TeleBot):
+    """
+    در هر دو حالت polling و وب‌هوک، آپدیت‌ها به جای استخر نخ داخلی telebot
+    به صف‌های UpdateIntake سپرده می‌شوند تا آپدیت‌های هر کاربر به ترتیب
+    و بدون تداخل اجرا شوند.
+    """
+
+    # نوع‌های آپدیتی که این ربات برایشان هندلر دارد -> متد پخش telebot
+    DISPATCH = (('message', 'process_new_messages'),
+                ('edited_message', 'process_new_edited_messages'),
+                ('callback_query', 'process_new_callback_query'))
+
+    def process_new_updates(self, updates):
+        for update in updates:
+            # offset بعدی getUpdates فقط همین‌جا و فقط روی نخ polling جلو می‌رود،
+            # نه پس از پردازش در کارگر؛ وگرنه آپدیت‌های هنوز پردازش‌نشده دوباره
+            # دریافت و دوبار اجرا می‌شوند
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+            if not admit_update(update):
+                continue
+            # نخ polling تا خالی شدن جا در صف منتظر می‌ماند
+            intake.offer(update, block=True)
+
+    def handle_update(self, update):
+        """
+        یک آپدیت را مستقیماً روی نخ فعلی به هندلرها می‌سپارد. به جای
+        TeleBot.process_new_updates (که last_update_id را بدون قفل می‌نویسد
+        و ممکن است آن را روی نخ کارگر به عقب برگرداند) مستقیماً به متد پخش
+        همان نوع آپدیت می‌رود.
+        """
+        for field, method in self.DISPATCH:
+            value = getattr(update, field)
+            if value is not None:
+                getattr(self, method)([value])
+
+
+bot = SerializedTeleBot(BOT_TOKEN, threaded=False)
+
+# صف‌های ورودی آپدیت‌ها: هر کاربر به یک نخ کارگر ثابت هش می‌شود
+intake = UpdateIntake(handler=bot.handle_update,
+                      workers=int(os.environ.get('INTAKE_WORKERS', 4)),
+                      maxsize=int(os.environ.get('INTAKE_QUEUE_SIZE', 1000)),
+                      put_timeout=float(os.environ.get('INTAKE_PUT_TIMEOUT', 1.0)))
+
+# کنترل سیل ورودی: کلیک‌های پشت‌سرهم و تکراری هر کاربر پیش از رسیدن به
+# صف‌ها و هندلرها رد می‌شوند (جزئیات در admission.py)
+admission = AdmissionControl(rate=float(os.environ.get('ADMISSION_RATE', 4)),
+                             burst=float(os.environ.get('ADMISSION_BURST', 8)),
+                             dedupe_window=float(os.environ.get('ADMISSION_DEDUPE_SECONDS', 0.3)),
+                             max_users=int(os.environ.get('ADMISSION_MAX_USERS', 100_000)))
+
+SLOW_DOWN_TEXT = "⏳ کمی آهسته‌تر!"
+
+def admit_update(update) -> bool:
+    """
+    گیت پیش از intake.offer در تمام مسیرهای ورودی. کلیک ردشده فقط یک پاسخ
+    ارزان به دکمه می‌گیرد (بدون ویرایش پیام و بدون اجرای هندلر).
+    """
+    reason = admission.check(update)
+    if reason is None:
+        return True
+    outbound.answer_callback_query(update.callback_query.id, SLOW_DOWN_TEXT if reason == RATE_LIMITED else None)
+    return False
+
+# زمان‌بند ارسال: تمام فراخوانی‌های خروجی (ارسال، ویرایش، پاسخ به دکمه‌ها)
+# با رعایت محدودیت نرخ تلگرام از اینجا عبور می‌کنند
+outbound = OutboundScheduler(bot,
+                             global_rate=float(os.environ.get('OUTBOUND_GLOBAL_RATE', 30)),
+                             per_chat_rate=float(os.environ.get('OUTBOUND_CHAT_RATE', 1)),
+                             senders=int(os.environ.get('OUTBOUND_SENDERS', 4)),
+                             urgent_share=int(os.environ.get('OUTBOUND_URGENT_SHARE', 3)))
+
+# انبار بازیکنان: مانند یک دیکشنری رفتار می‌کند (کلید: user_id | مقدار: شیء Player)
+# اما بازیکنان را در دیسک (پیش‌فرض SQLite) ماندگار می‌کند و در اولین دسترسی بارگذاری می‌کند
+players = create_player_store()
+
+# جدول رده‌بندی یک بار از ستون‌های ذخیره‌شده ساخته می‌شود (در start_background و
+# روی یک نخ پس‌زمینه) و از آن پس با هر add_xp یا صعود به صورت افزایشی به‌روز
+# می‌شود (جزئیات در leaderboard.py)
+LEADERBOARD_NOT_READY_TEXT = "🏆 جدول رده‌بندی در حال آماده‌سازی است؛ چند لحظه دیگر دوباره امتحان کنید."
+
+# --- کیبوردها و متن‌ها (از طریق کش رندر) ---
+# کیبوردهای ثابت و متن مکان‌ها یک بار ساخته می‌شوند و متن وضعیت هر
+# بازیکن تا تغییر بعدی او کش می‌شود (جزئیات در render.py)
+render_cache = RenderCache(game_world)
 
 def create_start_markup():
     """کیبورد برای انتخاب مسیر اولیه بازی."""
-    markup = InlineKeyboardMarkup(row_width=2)
-    markup.add(InlineKeyboardButton("مسیر تهذیب 🧘‍♂️", callback_data="choose_tahzib"),
-               InlineKeyboardButton("مسیر مانا 🔮", callback_data="choose_mana"))
-    return markup
+    return render_cache.start_markup
 
 def create_main_markup(player):
-    """منوی اصلی و داینامیک بازی را بر اساس وضعیت بازیکن می‌سازد."""
-    markup = InlineKeyboardMarkup()
-
-    # اگر بازیکن شرایط صعود به رتبه بعد را داشت، دکمه آن را نشان بده
-    if player.can_breakthrough():
-        markup.add(InlineKeyboardButton("✨ دستیابی به موفقیت! ✨", callback_data="breakthrough"))
-
-    # دکمه‌های حرکتی
-    markup.add(InlineKeyboardButton("⬆️ شمال", callback_data="move_up"))
-    markup.add(InlineKeyboardButton("⬅️ غرب", callback_data="move_left"),
-               InlineKeyboardButton("➡️ شرق", callback_data="move_right"))
-    markup.add(InlineKeyboardButton("⬇️ جنوب", callback_data="move_down"))
-
-    # دکمه‌های اقدامات اصلی
-    markup.add(InlineKeyboardButton("تمرین/کسب XP 💪", callback_data="action"),
-               InlineKeyboardButton("وضعیت من 📊", callback_data="show_status"))
-    markup.add(InlineKeyboardButton("کوئست‌ها 📜", callback_data="show_quests"),
-               InlineKeyboardButton("مهارت‌ها ⚡️", callback_data="show_skills"))
-
-    return markup
+    """منوی اصلی و داینامیک بازی را بر اساس وضعیت بازیکن برمی‌گرداند."""
+    return render_cache.main_markup(player)
 
 # --- توابع کمکی ---
 
 def get_location_text(player):
-    """متن توضیحات مکان فعلی بازیکن را تولید می‌کند."""
-    coords = (player.x, player.y)
-    if coords in game_world:
-        location = game_world[coords]
-        return f"📍 **{location['name']}** (مختصات: {coords})\n\n{location['description']}"
-    return "شما در یک مکان ناشناخته هستید."
+    """متن توضیحات مکان فعلی بازیکن را برمی‌گرداند."""
+    return render_cache.location_text(player)
+
+# --- تمرین خودکار ---
+
+def notify_breakthrough_ready(batch):
+    """اعلان آماده بودن برای صعود را برای یک دسته از بازیکنان، یکجا در صف ارسال می‌گذارد."""
+    outbound.send_many([
+        (chat_id,
+         f"⏳ تمرین شما به ثمر نشست و آماده صعود هستید!\n\n{get_location_text(player)}",
+         {'reply_markup': create_main_markup(player), 'parse_mode': 'Markdown'})
+        for chat_id, player in batch
+    ])
+
+# زمان‌بند تیک تمرین: XP همه بازیکنان در حال تمرین را به صورت دسته‌ای اعتبار می‌دهد
+training = TrainingScheduler(players, intake, notify_breakthrough_ready,
+                             xp_per_minute=float(os.environ.get('TRAINING_XP_PER_MINUTE', 60)),
+                             tick_interval=float(os.environ.get('TRAINING_TICK_SECONDS', 30)),
+                             session_seconds=float(os.environ.get('TRAINING_SESSION_MINUTES', 60)) * 60)
+
+# --- بارگذاری مجدد زنده داده‌های بازی ---
+
+def apply_game_data(new, previous):
+    """ساختارهای وابسته به داده‌های بازی را پس از جایگزینی جدول‌ها به‌روز می‌کند."""
+    quest_engine.book = QuestBook(new.quests)
+    leaderboard.add_paths(new.path_names)
+    game_world.landmarks = new.landmarks
+    game_world.terrains = new.terrains
+    render_cache.invalidate()
+
+# با GAMEDATA_RELOAD=1 تغییرات gamedata.py (یا فایل GAMEDATA_PATH) بدون ری‌استارت اعمال می‌شود
+GAMEDATA_RELOAD = os.environ.get('GAMEDATA_RELOAD') == '1'
+gamedata_reloader = GameDataReloader(os.environ.get('GAMEDATA_PATH'),
+                                     interval=float(os.environ.get('GAMEDATA_RELOAD_INTERVAL', 2)),
+                                     listeners=[apply_game_data])
 
 # --- کنترل‌کننده‌های دستورات (Command Handlers) ---
 
 @bot.message_handler(commands=['start', 'help'])
+@metrics.timed('start')
 def handle_start(message):
     """نقطه ورود اصلی کاربر به ربات."""
     user_id = message.from_user.id
     if user_id in players:
         player = players[user_id]
-        bot.send_message(message.chat.id,
-                         get_location_text(player),
-                         reply_markup=create_main_markup(player),
-                         parse_mode='Markdown')
+        outbound.send_message(message.chat.id,
+                              get_location_text(player),
+                              reply_markup=create_main_markup(player),
+                              parse_mode='Markdown')
     else:
         welcome_text = (
             "به دنیای تهذیب و مانا خوش آمدید!\n\n"
@@ -92,9 +206,10 @@ def handle_start(message):
             "این انتخاب، سرنوشت شما را رقم خواهد زد.\n\n"
             "پس از انتخاب، می‌توانید با دستور /setname [name] نام شخصیت خود را تعیین کنید."
         )
-        bot.send_message(message.chat.id, welcome_text, reply_markup=create_start_markup())
+        outbound.send_message(message.chat.id, welcome_text, reply_markup=create_start_markup())
 
 @bot.message_handler(commands=['setname'])
+@metrics.timed('setname')
 def set_ingame_name(message):
     """دستور برای تغییر نام داخل بازی کاربر."""
     user_id = message.from_user.id
@@ -103,23 +218,62 @@ def set_ingame_name(message):
             # جدا کردن نام از دستور
             new_name = message.text.split(maxsplit=1)[1]
             players[user_id].set_name(new_name)
-            bot.reply_to(message, f"✅ نام شما با موفقیت به **{new_name}** تغییر کرد.", parse_mode='Markdown')
+            outbound.reply_to(message, f"✅ نام شما با موفقیت به **{new_name}** تغییر کرد.", parse_mode='Markdown')
         except IndexError:
-            bot.reply_to(message, "❌ لطفا نام مورد نظر را بعد از دستور وارد کنید.\nمثال: `/setname آرین`", parse_mode='Markdown')
+            outbound.reply_to(message, "❌ لطفا نام مورد نظر را بعد از دستور وارد کنید.\nمثال: `/setname آرین`", parse_mode='Markdown')
     else:
-        bot.reply_to(message, "شما هنوز بازی را شروع نکرده‌اید! لطفاً ابتدا دستور /start را بزنید.")
+        outbound.reply_to(message, "شما هنوز بازی را شروع نکرده‌اید! لطفاً ابتدا دستور /start را بزنید.")
+
+
+@bot.message_handler(commands=['top'])
+@metrics.timed('top')
+def show_top(message):
+    """ده بازیکن برتر مسیر کاربر (یا همه مسیرها برای کاربری که هنوز شروع نکرده)."""
+    if not leaderboard.ready:
+        outbound.send_message(message.chat.id, LEADERBOARD_NOT_READY_TEXT)
+        return
+    player = players.get(message.from_user.id)
+    tables = gametables.tables
+    paths = [player.path] if player is not None else list(tables.path_names)
+
+    sections = []
+    for path in paths:
+        lines = [f"🏆 برترین‌های مسیر {path} ({leaderboard.size(path):,} بازیکن):"]
+        for position, (user_id, rank_index, xp) in enumerate(leaderboard.top(path, 10), start=1):
+            ranked = players.get(user_id)
+            name = ranked.in_game_name if ranked is not None else str(user_id)
+            rank_name = tables.rank_info(tables.path_ids[path], rank_index)['rank_name']
+            lines.append(f"{position}. {name} | {rank_name} | {xp} XP")
+        sections.append("\n".join(lines))
+    if player is not None:
+        sections.append(player.get_leaderboard_text().strip().replace("**", ""))
+    # نام‌ها توسط کاربران تعیین می‌شوند، پس این پیام بدون Markdown ارسال می‌شود
+    outbound.send_message(message.chat.id, "\n\n".join(sections))
 
 
 # --- کنترل‌کننده اصلی دکمه‌ها (Callback Query Handler) ---
 
+# برچسب متریک هر شاخه از handle_all_callbacks؛ مقدارهای ناشناخته زیر "other"
+# جمع می‌شوند تا تعداد برچسب‌ها محدود بماند
+CALLBACK_PREFIXES = ('choose_', 'move_', 'quest_accept:')
+CALLBACK_NAMES = frozenset(('action', 'train', 'breakthrough', 'show_status', 'show_quests', 'explore', 'show_skills'))
+
+def callback_branch(call):
+    data = call.data or ''
+    for prefix in CALLBACK_PREFIXES:
+        if data.startswith(prefix):
+            return 'callback:' + prefix.rstrip('_:')
+    return 'callback:' + (data if data in CALLBACK_NAMES else 'other')
+
 @bot.callback_query_handler(func=lambda call: True)
+@metrics.timed(callback_branch)
 def handle_all_callbacks(call):
     user_id = call.from_user.id
     
     # --- پردازش انتخاب مسیر اولیه (برای بازیکنان جدید) ---
     if call.data.startswith("choose_"):
         if user_id in players:
-            bot.answer_callback_query(call.id, "شما قبلاً مسیر خود را انتخاب کرده‌اید!", show_alert=True)
+            outbound.answer_callback_query(call.id, "شما قبلاً مسیر خود را انتخاب کرده‌اید!", show_alert=True)
             return
         
         path = "تهذیب" if call.data == "choose_tahzib" else "مانا"
@@ -128,17 +282,17 @@ def handle_all_callbacks(call):
         new_player = Player(user_id=user_id, telegram_name=call.from_user.first_name, path=path)
         players[user_id] = new_player
         
-        bot.answer_callback_query(call.id, f"مسیر {path} با موفقیت انتخاب شد.")
-        bot.edit_message_text(chat_id=call.message.chat.id,
-                              message_id=call.message.message_id,
-                              text=get_location_text(new_player),
-                              reply_markup=create_main_markup(new_player),
-                              parse_mode='Markdown')
+        outbound.answer_callback_query(call.id, f"مسیر {path} با موفقیت انتخاب شد.")
+        outbound.edit_message_text(chat_id=call.message.chat.id,
+                                   message_id=call.message.message_id,
+                                   text=get_location_text(new_player),
+                                   reply_markup=create_main_markup(new_player),
+                                   parse_mode='Markdown')
         return
 
     # --- بررسی اینکه آیا بازیکن وجود دارد یا خیر (برای سایر دکمه‌ها) ---
     if user_id not in players:
-        bot.answer_callback_query(call.id, "خطا! لطفاً با دستور /start ربات را مجدداً راه‌اندازی کنید.", show_alert=True)
+        outbound.answer_callback_query(call.id, "خطا! لطفاً با دستور /start ربات را مجدداً راه‌اندازی کنید.", show_alert=True)
         return
 
     player = players[user_id]
@@ -149,50 +303,105 @@ def handle_all_callbacks(call):
         moved = player.move(direction) # فرض می‌کنیم متد move در کلاس Player پیاده‌سازی شده
         
         if moved:
-            bot.answer_callback_query(call.id, f"حرکت به سمت {direction}")
-            bot.edit_message_text(chat_id=call.message.chat.id,
-                                  message_id=call.message.message_id,
-                                  text=get_location_text(player),
-                                  reply_markup=create_main_markup(player),
-                                  parse_mode='Markdown')
+            outbound.answer_callback_query(call.id, f"حرکت به سمت {direction}")
+            outbound.edit_message_text(chat_id=call.message.chat.id,
+                                       message_id=call.message.message_id,
+                                       text=get_location_text(player),
+                                       reply_markup=create_main_markup(player),
+                                       parse_mode='Markdown')
         else:
-            bot.answer_callback_query(call.id, "شما نمی‌توانید از این طرف بروید! 🚧", show_alert=True)
+            outbound.answer_callback_query(call.id, "شما نمی‌توانید از این طرف بروید! 🚧", show_alert=True)
 
     # --- پردازش اقدامات اصلی ---
     elif call.data == "action":
         xp_gain = 25  # مقدار XP دریافتی برای هر تمرین
         player.add_xp(xp_gain)
-        bot.answer_callback_query(call.id, f"+{xp_gain} XP")
+        outbound.answer_callback_query(call.id, f"+{xp_gain} XP")
         # ویرایش پیام برای نمایش دکمه Breakthrough در صورت امکان
-        bot.edit_message_text(chat_id=call.message.chat.id,
-                              message_id=call.message.message_id,
-                              text=get_location_text(player),
-                              reply_markup=create_main_markup(player),
-                              parse_mode='Markdown')
+        outbound.edit_message_text(chat_id=call.message.chat.id,
+                                   message_id=call.message.message_id,
+                                   text=get_location_text(player),
+                                   reply_markup=create_main_markup(player),
+                                   parse_mode='Markdown')
+
+    elif call.data == "train":
+        if training.is_training(user_id):
+            training.stop_session(user_id)
+            outbound.answer_callback_query(call.id, "تمرین خودکار متوقف شد.")
+            outbound.edit_message_text(chat_id=call.message.chat.id,
+                                       message_id=call.message.message_id,
+                                       text=get_location_text(player),
+                                       reply_markup=create_main_markup(player),
+                                       parse_mode='Markdown')
+        elif player.can_breakthrough():
+            outbound.answer_callback_query(call.id, "ابتدا به رتبه بعد صعود کنید!", show_alert=True)
+        else:
+            training.start_session(user_id, call.message.chat.id)
+            minutes = int(training.session_seconds // 60)
+            outbound.answer_callback_query(call.id,
+                                           f"تمرین خودکار شروع شد (حداکثر {minutes} دقیقه). "
+                                           "هر وقت آماده صعود شدید خبرتان می‌کنیم. برای توقف دوباره دکمه را بزنید.",
+                                           show_alert=True)
 
     elif call.data == "breakthrough":
         if player.can_breakthrough():
             result = player.perform_breakthrough() # فرض بر وجود این متد در کلاس Player
-            bot.answer_callback_query(call.id, "موفقیت بزرگ!", show_alert=True)
-            bot.edit_message_text(chat_id=call.message.chat.id,
-                                  message_id=call.message.message_id,
-                                  text=f"🎉 **{result}** 🎉\n\n{get_location_text(player)}",
-                                  reply_markup=create_main_markup(player),
-                                  parse_mode='Markdown')
+            outbound.answer_callback_query(call.id, "موفقیت بزرگ!", show_alert=True)
+            outbound.edit_message_text(chat_id=call.message.chat.id,
+                                       message_id=call.message.message_id,
+                                       text=f"🎉 **{result}** 🎉\n\n{get_location_text(player)}",
+                                       reply_markup=create_main_markup(player),
+                                       parse_mode='Markdown')
         else:
-            bot.answer_callback_query(call.id, "هنوز آماده نیستی!", show_alert=True)
+            outbound.answer_callback_query(call.id, "هنوز آماده نیستی!", show_alert=True)
 
     elif call.data == "show_status":
-        bot.answer_callback_query(call.id)
+        outbound.answer_callback_query(call.id)
         # نمایش وضعیت کامل در یک پیام جدید برای خوانایی بهتر
-        bot.send_message(call.message.chat.id, player.get_status_text(), parse_mode='Markdown')
+        outbound.send_message(call.message.chat.id, render_cache.status_text(player), parse_mode='Markdown')
 
-    # --- بخش‌های مربوط به کوئست و مهارت‌ها (در حال حاضر پیام موقت نمایش می‌دهند) ---
+    # --- بخش‌های مربوط به کوئست‌ها ---
     elif call.data == "show_quests":
-        bot.answer_callback_query(call.id, "سیستم کوئست به زودی اضافه خواهد شد!", show_alert=True)
-    
+        outbound.answer_callback_query(call.id)
+        outbound.send_message(call.message.chat.id,
+                              format_quest_log(quest_engine.book, player),
+                              reply_markup=build_quest_markup(quest_engine.book.available_for(player)),
+                              parse_mode='Markdown')
+
+    elif call.data.startswith("quest_accept:"):
+        quest_id = call.data.split(":", 1)[1]
+        if quest_engine.accept(player, quest_id):
+            outbound.answer_callback_query(call.id, f"کوئست «{quest_engine.book.quests[quest_id].name}» شروع شد!")
+            outbound.edit_message_text(chat_id=call.message.chat.id,
+                                       message_id=call.message.message_id,
+                                       text=format_quest_log(quest_engine.book, player),
+                                       reply_markup=build_quest_markup(quest_engine.book.available_for(player)),
+                                       parse_mode='Markdown')
+        else:
+            outbound.answer_callback_query(call.id, "این کوئست قابل دریافت نیست.", show_alert=True)
+
+    elif call.data == "explore":
+        # رویدادهای این خانه (شکار، پیدا کردن آیتم) فقط به کوئست‌های مرتبط می‌رسند
+        updates = quest_engine.explore(player)
+        if not updates:
+            outbound.answer_callback_query(call.id, "چیز قابل توجهی پیدا نکردید.")
+            return
+        lines = []
+        for update in updates:
+            if update.completed:
+                lines.append(f"✅ کوئست «{update.quest.name}» انجام شد! {format_rewards(update.quest.rewards)}")
+            else:
+                lines.append(f"📜 {update.quest.name}: {update.progress}/{update.quest.count}")
+        outbound.answer_callback_query(call.id, "\n".join(lines), show_alert=True)
+        outbound.edit_message_text(chat_id=call.message.chat.id,
+                                   message_id=call.message.message_id,
+                                   text=get_location_text(player),
+                                   reply_markup=create_main_markup(player),
+                                   parse_mode='Markdown')
+
+    # --- بخش مهارت‌ها (در حال حاضر پیام موقت نمایش می‌دهد) ---
     elif call.data == "show_skills":
-        bot.answer_callback_query(call.id, "سیستم مهارت‌ها به زودی اضافه خواهد شد!", show_alert=True)
+        outbound.answer_callback_query(call.id, "سیستم مهارت‌ها به زودی اضافه خواهد شد!", show_alert=True)
 
 
 # --- بخش مربوط به هاستینگ در Render (بدون تغییر) ---
@@ -200,20 +409,204 @@ def handle_all_callbacks(call):
 
 app = Flask(__name__)
 
+ALIVE_TEXT = "RPG Bot is alive!"
+
 @app.route('/')
 def index():
-    return "RPG Bot is alive!"
+    return ALIVE_TEXT
 
 def run_flask():
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
 
+
+# --- حالت وب‌هوک (Webhook) ---
+# آدرس عمومی سرور (مثلاً https://my-bot.onrender.com) و توکن مخفی برای
+# اطمینان از اینکه درخواست‌ها واقعاً از طرف تلگرام آمده‌اند.
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_PATH = '/webhook'
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+WEBHOOK_SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+def receive_update(payload: str, secret_token):
+    """
+    بدنه یک درخواست وب‌هوک را در صف پردازش قرار می‌دهد و (متن پاسخ، کد HTTP)
+    برمی‌گرداند؛ مسیر Flask و runtime ناهم‌زمان هر دو از همین تابع استفاده می‌کنند.
+    """
+    if WEBHOOK_SECRET and secret_token != WEBHOOK_SECRET:
+        return "forbidden", 403
+    try:
+        update = telebot.types.Update.de_json(payload)
+    except (ValueError, KeyError, TypeError):
+        # بدنه JSON نیست یا آپدیت معتبری نیست (مثلاً بدون update_id)
+        return "", 400
+    if not admit_update(update):
+        # کلیک ردشده پاسخ گرفته است؛ 200 تا تلگرام دوباره ارسالش نکند
+        return "", 200
+    if not intake.offer(update):
+        # صف پر است: تلگرام این آپدیت را بعداً دوباره ارسال می‌کند
+        return "busy", 503
+    return "", 200
+
+@app.route(WEBHOOK_PATH, methods=['POST'])
+def webhook():
+    """آپدیت‌های ارسالی تلگرام را دریافت و در صف پردازش قرار می‌دهد."""
+    return receive_update(request.get_data(as_text=True), request.headers.get(WEBHOOK_SECRET_HEADER))
+
+def webhook_settings() -> dict:
+    """آرگومان‌های set_webhook (مشترک بین TeleBot و AsyncTeleBot)."""
+    return {'url': WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            'secret_token': WEBHOOK_SECRET,
+            'max_connections': int(os.environ.get('WEBHOOK_MAX_CONNECTIONS', 40))}
+
+def start_background(senders: bool = True):
+    """
+    نخ‌های پس‌زمینه (پردازش آپدیت‌ها، تمرین، بارگذاری مجدد داده‌ها) را راه‌اندازی
+    می‌کند. runtime ناهم‌زمان ارسال‌ها را خودش روی event loop انجام می‌دهد (senders=False).
+    """
+    if senders:
+        outbound.start()
+    if not leaderboard.ready:
+        leaderboard.load_in_background(players.backend.rankings)
+    intake.start()
+    training.start()
+    if GAMEDATA_RELOAD:
+        gamedata_reloader.start()
+
+def start_webhook():
+    """نخ‌های پردازش را راه‌اندازی و آدرس وب‌هوک را در تلگرام ثبت می‌کند."""
+    start_background()
+    bot.set_webhook(**webhook_settings())
+
+# --- متریک‌ها و پروفایلر ---
+# /metrics خروجی Prometheus و /debug/profile پشته‌های نمونه‌برداری‌شده را
+# برمی‌گرداند. اگر METRICS_TOKEN تنظیم شده باشد، هر دو به هدر
+# Authorization: Bearer <token> (یا ?token=) نیاز دارند؛ پروفایلر بدون توکن غیرفعال است.
+# مقدار خالی یعنی تنظیم نشده؛ وگرنه درخواست بدون توکن با '' برابر و مجاز می‌شد
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+PROFILE_MAX_SECONDS = 60
+
+metrics.install_api_timer()
+metrics.registry.add_stats('rpg_intake', lambda: dict(intake.snapshot(), queue_depth=intake.depth()),
+                           gauges=('queue_depth', 'queue_depth_max', 'wait_avg', 'wait_max'))
+metrics.registry.add_stats('rpg_admission', lambda: dict(admission.stats, tracked=admission.tracked()),
+                           gauges=('tracked',))
+metrics.registry.add_stats('rpg_outbound', lambda: dict(outbound.stats, queue_depth=outbound.depth()),
+                           gauges=('queue_depth',))
+metrics.registry.add_stats('rpg_store', lambda: dict(players.stats, loaded=players.loaded_count()),
+                           gauges=('loaded',))
+metrics.registry.add_stats('rpg_render', render_cache.stats)
+metrics.registry.add_stats('rpg_training', lambda: dict(training.stats, active=training.active_sessions()),
+                           gauges=('active',))
+metrics.registry.add_stats('rpg_leaderboard', lambda: dict(leaderboard.stats, ready=int(leaderboard.ready)),
+                           gauges=('ready',))
+metrics.registry.add_stats('rpg_quests', quest_engine.stats)
+metrics.registry.add_stats('rpg_gamedata', lambda: dict(gamedata_reloader.stats, version=gametables.tables.version),
+                           gauges=('version',))
+
+def _intake_wait_histogram():
+    snapshot = intake.snapshot()
+    count = snapshot['processed'] + snapshot['errors']
+    name, samples, cumulative = 'rpg_intake_wait_seconds', [], 0
+    for bound, bucket_count in snapshot['wait_buckets'].items():
+        cumulative += bucket_count
+        samples.append((name + '_bucket', (('le', '+Inf' if bound == float('inf') else repr(float(bound))),), cumulative))
+    samples.append((name + '_sum', (), snapshot['wait_avg'] * count))
+    samples.append((name + '_count', (), count))
+    return [(name, 'histogram', 'Time updates waited in the intake queue', samples)]
+
+metrics.registry.add_collector(_intake_wait_histogram)
+
+def metrics_authorized(token, authorization) -> bool:
+    """توکن ?token= یا هدر Authorization را با METRICS_TOKEN مقایسه می‌کند."""
+    if not METRICS_TOKEN:
+        return True
+    given = token or (authorization or '').removeprefix('Bearer ')
+    return hmac.compare_digest(given.encode(), METRICS_TOKEN.encode())
+
+def _positive_number(value):
+    """مقدار پارامتر درخواست به صورت عدد متناهی مثبت، یا None اگر نامعتبر باشد."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and number > 0 else None
+
+def collect_profile(seconds, interval_ms):
+    """پروفایل نمونه‌برداری (متن folded، کد HTTP)؛ تا پایان نمونه‌برداری مسدود می‌کند."""
+    seconds, interval_ms = _positive_number(seconds), _positive_number(interval_ms)
+    if seconds is None or interval_ms is None:
+        return "seconds and interval_ms must be positive numbers", 400
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    result = metrics.sample_stacks(seconds, interval_ms / 1000)
+    if result is None:
+        return "A profile is already running", 409
+    return metrics.format_profile(*result, seconds), 200
+
+def _check_metrics_token():
+    if not metrics_authorized(request.args.get('token'), request.headers.get('Authorization')):
+        abort(403)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    _check_metrics_token()
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
+@app.route('/debug/profile')
+def profile_endpoint():
+    """پشته تمام نخ‌ها را به مدت ?seconds=N نمونه‌برداری می‌کند (خروجی folded برای flamegraph)."""
+    if not METRICS_TOKEN:
+        abort(404)
+    _check_metrics_token()
+    text, status = collect_profile(request.args.get('seconds', 10), request.args.get('interval_ms', 5))
+    return Response(text, status=status, mimetype='text/plain')
+
+def shutdown():
+    """پردازش آپدیت‌ها را متوقف و تغییرات باقی‌مانده بازیکنان را ذخیره می‌کند."""
+    gamedata_reloader.stop()
+    training.stop()
+    intake.stop()
+    outbound.stop()
+    players.close()
+
+def stop_on_sigterm():
+    """
+    SIGTERM (ری‌استارت یا استقرار) مانند Ctrl+C polling یا سرور Flask را متوقف
+    می‌کند تا finally: shutdown() اجرا و بازیکنان تغییریافته ذخیره شوند.
+    """
+    def handle(signum, frame):
+        # سیگنال دوم نباید shutdown در حال اجرا را قطع کند
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        bot.stop_polling()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle)
+
+
 if __name__ == "__main__":
-    # سرور Flask را در یک نخ (Thread) جداگانه اجرا کن
-    flask_thread = threading.Thread(target=run_flask)
-    flask_thread.start()
-    
-    # ربات تلگرام را برای همیشه در حال گوش دادن نگه دار
-    print("Bot is running...")
-    bot.polling(none_stop=True)
+    stop_on_sigterm()
+    if RUN_MODE == 'webhook':
+        # اجرای وب‌هوک با سرور توسعه Flask؛ در محیط عملیاتی از gunicorn استفاده کنید
+        start_webhook()
+        print("Bot is running (webhook)...")
+        try:
+            run_flask()
+        finally:
+            shutdown()
+    else:
+        start_background()
+
+        # سرور Flask را در یک نخ (Thread) جداگانه اجرا کن
+        flask_thread = threading.Thread(target=run_flask, daemon=True)
+        flask_thread.start()
+
+        # اگر قبلاً وب‌هوک ثبت شده باشد، getUpdates کار نمی‌کند
+        bot.remove_webhook()
+
+        # ربات تلگرام را برای همیشه در حال گوش دادن نگه دار
+        print("Bot is running...")
+        try:
+            bot.polling(none_stop=True)
+        finally:
+            shutdown()
 
@@ -0,0 +1,165 @@
+# =================================================================
+#            combat.py - The Monte Carlo Combat Resolver
+#
+# این فایل نبرد بازیکن با حریفان (شخصیت‌های superheroes_data.csv)
+# را شبیه‌سازی می‌کند. تمام راندهای یک نبرد و تمام نبردهای یک دسته
+# با هم و به صورت برداری (NumPy) حل می‌شوند؛ هیچ حلقه پایتونی به
+# ازای هر راند یا هر نبرد وجود ندارد.
+#
+# قواعد هر راند (برای هر دو طرف، هم‌زمان):
+#   - احتمال ضربه: 0.5 + (سرعت خودی - سرعت حریف)/200 + (هوش خودی - هوش حریف)/400
+#   - آسیب: قدرت × عدد تصادفی [0.5, 1.5) × 100 / (100 + دوام حریف)
+#   - جان اولیه: 100 + 2 × دوام
+# نبرد وقتی تمام می‌شود که جان یکی به صفر برسد؛ اگر هر دو در یک راند
+# بیفتند، طرف سریع‌تر برنده است. پس از MAX_ROUNDS، درصد جان باقی‌مانده
+# برنده را تعیین می‌کند.
+#
+# تمام توابع یک seed یا np.random.Generator می‌گیرند تا نتایج قابل
+# بازتولید باشند.
+#
+# اجرای شبیه‌سازی توازن:
+#   python combat.py [تعداد نبرد برای هر حریف]
+# =================================================================
+
+from collections import namedtuple
+
+import numpy as np
+
+import gametables
+from encounters import MATCH_COLUMNS, MATCH_SCALE, PLAYER_STAT_MAPPING, get_roster, player_vector
+from player import DEFAULT_STATS
+
+MAX_ROUNDS = 30
+BATCH_SIZE = 200_000                            # حداکثر نبرد در هر دسته (کنترل مصرف حافظه)
+
+# ترتیب ستون‌های بردار نبرد (همان ترتیب PLAYER_STAT_MAPPING در مقیاس 0 تا 100)
+STRENGTH, SPEED, DURABILITY, INTELLIGENCE = range(4)
+
+FightResult = namedtuple('FightResult', ['player_won', 'rounds', 'player_hp', 'opponent_hp'])
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def _damage_rounds(attacker, defender, rng, max_rounds):
+    """آسیب هر راند از attacker به defender؛ خروجی (n, max_rounds)."""
+    n = len(attacker)
+    hit_chance = np.clip(0.5 + (attacker[:, SPEED] - defender[:, SPEED]) / 200
+                         + (attacker[:, INTELLIGENCE] - defender[:, INTELLIGENCE]) / 400, 0.05, 0.95)
+    hits = rng.random((n, max_rounds), dtype=np.float32) < hit_chance[:, None]
+    rolls = rng.random((n, max_rounds), dtype=np.float32) + np.float32(0.5)
+    per_hit = attacker[:, STRENGTH] * 100 / (100 + defender[:, DURABILITY])
+    return hits * rolls * per_hit[:, None]
+
+
+def _resolve_batch(players, opponents, rng, max_rounds):
+    player_hp = 100 + 2 * players[:, DURABILITY]
+    opponent_hp = 100 + 2 * opponents[:, DURABILITY]
+
+    dealt = np.cumsum(_damage_rounds(players, opponents, rng, max_rounds), axis=1)
+    taken = np.cumsum(_damage_rounds(opponents, players, rng, max_rounds), axis=1)
+
+    # اولین راندی که جان حریف (یا بازیکن) تمام می‌شود؛ max_rounds یعنی هرگز
+    kills = dealt >= opponent_hp[:, None]
+    deaths = taken >= player_hp[:, None]
+    kill_round = np.where(kills.any(axis=1), kills.argmax(axis=1), max_rounds)
+    death_round = np.where(deaths.any(axis=1), deaths.argmax(axis=1), max_rounds)
+
+    rounds = np.minimum(kill_round, death_round)
+    last = np.minimum(rounds, max_rounds - 1)
+    rows = np.arange(len(players))
+    player_left = player_hp - taken[rows, last]
+    opponent_left = opponent_hp - dealt[rows, last]
+
+    won = kill_round < death_round
+    simultaneous = (kill_round == death_round) & (kill_round < max_rounds)
+    won |= simultaneous & (players[:, SPEED] > opponents[:, SPEED])
+    timeout = (kill_round == max_rounds) & (death_round == max_rounds)
+    won |= timeout & (player_left / player_hp > opponent_left / opponent_hp)
+
+    return FightResult(won, np.minimum(rounds + 1, max_rounds),
+                       np.maximum(player_left, 0), np.maximum(opponent_left, 0))
+
+
+def resolve_fights(players, opponents, seed=None, max_rounds: int = MAX_ROUNDS) -> FightResult:
+    """
+    n نبرد مستقل را هم‌زمان حل می‌کند.
+    players و opponents آرایه‌های (n, 4) در مقیاس 0 تا 100 و به ترتیب
+    (قدرت، سرعت، دوام، هوش) هستند.
+    """
+    rng = _rng(seed)
+    players = np.atleast_2d(np.asarray(players, dtype=np.float32))
+    opponents = np.atleast_2d(np.asarray(opponents, dtype=np.float32))
+    players, opponents = np.broadcast_arrays(players, opponents)
+
+    if len(players) <= BATCH_SIZE:
+        return _resolve_batch(players, opponents, rng, max_rounds)
+    parts = [_resolve_batch(players[i:i + BATCH_SIZE], opponents[i:i + BATCH_SIZE], rng, max_rounds)
+             for i in range(0, len(players), BATCH_SIZE)]
+    return FightResult(*(np.concatenate(column) for column in zip(*parts)))
+
+
+def opponent_vectors(indices=None, roster=None) -> np.ndarray:
+    """بردار نبرد شخصیت‌های جدول حریفان (فقط ستون‌های قابل مقایسه با بازیکن)."""
+    roster = roster or get_roster()
+    stats = roster.stats if indices is None else roster.stats[indices]
+    return np.nan_to_num(stats[:, MATCH_COLUMNS])
+
+
+def fight(player, opponent_index: int, seed=None) -> FightResult:
+    """یک نبرد بین بازیکن و یک شخصیت از جدول حریفان."""
+    return resolve_fights(player_vector(player), opponent_vectors([opponent_index]), seed)
+
+
+# --- شبیه‌سازی توازن (Balance) ---
+
+def stats_for_rank(rank_index: int, points_per_rank: int = 1) -> np.ndarray:
+    """
+    بردار نبرد فرضی یک بازیکن در رتبه rank_index: آمار پایه به علاوه
+    امتیازهای ویژگی دریافتی از صعودها که به طور مساوی تقسیم شده‌اند.
+    """
+    points = rank_index * points_per_rank
+    stats = dict(DEFAULT_STATS)
+    names = list(PLAYER_STAT_MAPPING)
+    for i in range(points):
+        stats[names[i % len(names)]] += 1
+    return np.array([stats[name] for name in names], dtype=np.float32) * MATCH_SCALE
+
+
+def simulate_rank_win_rates(fights_per_opponent: int = 100, seed=0, roster=None,
+                            stats_for_rank=stats_for_rank) -> dict:
+    """
+    احتمال پیروزی هر رتبه از مسیرهای بازی در برابر کل جدول حریفان را
+    تخمین می‌زند. خروجی: {نام مسیر: آرایه احتمال پیروزی به ازای هر رتبه}.
+    رتبه آخر همان رتبه نگهبان «افسانه زنده» پس از آخرین صعود است.
+    رشد آمار (stats_for_rank) فقط به شماره رتبه بستگی دارد و نه مسیر، پس
+    هر رتبه یک بار شبیه‌سازی و نتیجه‌اش برای تمام مسیرها استفاده می‌شود.
+    """
+    rng = _rng(seed)
+    roster = roster or get_roster()
+    opponents = opponent_vectors(roster.match_indices(), roster)
+    repeated = np.repeat(opponents, fights_per_opponent, axis=0)
+
+    ranks_by_path = gametables.tables.ranks_by_path
+    rates = np.empty(max(len(ranks) for ranks in ranks_by_path.values()))
+    for rank_index in range(len(rates)):
+        player = stats_for_rank(rank_index)
+        rates[rank_index] = resolve_fights(player[None, :], repeated, rng).player_won.mean()
+    return {path: rates[:len(ranks)].copy() for path, ranks in ranks_by_path.items()}
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    per_opponent = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    started = time.perf_counter()
+    rates = simulate_rank_win_rates(per_opponent, seed=0)
+    elapsed = time.perf_counter() - started
+    # هر رتبه یک بار شبیه‌سازی می‌شود (مشترک بین مسیرها)
+    total = max(len(r) for r in rates.values()) * per_opponent * len(get_roster().match_indices())
+    print(f"{total:,} fights in {elapsed:.2f}s ({total / elapsed:,.0f} fights/s)")
+    for path, path_rates in rates.items():
+        names = [rank['rank_name'] for rank in gametables.tables.ranks_by_path[path]]
+        for name, rate in zip(names, path_rates):
+            print(f"  {path} | {name}: {rate:.1%}")
@@ -0,0 +1,275 @@
+# =================================================================
+#            encounters.py - The Encounter Roster
+#
+# این فایل داده‌های superheroes_data.csv را یک بار به صورت ستونی
+# (آرایه‌های NumPy) بارگذاری می‌کند تا بتوان برای هر بازیکن حریف
+# مناسب پیدا کرد:
+#   - ستون‌های نامرتب قد و وزن (مثل "['6'8", '203 cm']") به عدد
+#     سانتی‌متر و کیلوگرم تبدیل می‌شوند؛ خانه‌های '-' و 'null' به NaN
+#   - نتیجه در یک فایل باینری .npz کش می‌شود تا اجراهای بعدی بدون
+#     پردازش CSV بالا بیایند (با تغییر CSV، کش خودبه‌خود نامعتبر می‌شود)
+#   - جست‌وجوی k نزدیک‌ترین حریف به آمار بازیکن به صورت برداری،
+#     با فیلتر بر اساس alignment و publisher
+#
+# اجرای بنچمارک:
+#   python encounters.py
+# =================================================================
+
+import csv
+import os
+import re
+import threading
+
+import numpy as np
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'superheroes_data.csv')
+
+# ستون‌های آمار عددی در CSV (مقیاس 0 تا 100)
+STAT_COLUMNS = ('intelligence', 'strength', 'speed', 'durability', 'power', 'combat')
+STAT_COLUMN_INDEX = {name: i for i, name in enumerate(STAT_COLUMNS)}
+
+# نگاشت آمار بازیکن به ستون معادل در CSV و ضریب تبدیل به مقیاس 0 تا 100
+# (آمار پایه بازیکن: قدرت/چابکی/هوش = 5 و استقامت = 100)
+PLAYER_STAT_MAPPING = {
+    'strength': ('strength', 5.0),
+    'agility': ('speed', 5.0),
+    'stamina': ('durability', 0.5),
+    'intelligence': ('intelligence', 5.0),
+}
+MATCH_COLUMNS = tuple(STAT_COLUMN_INDEX[column] for column, _ in PLAYER_STAT_MAPPING.values())
+MATCH_SCALE = np.array([scale for _, scale in PLAYER_STAT_MAPPING.values()], dtype=np.float32)
+
+# نسخه قالب فایل کش؛ با تغییر ساختار آرایه‌ها افزایش دهید
+CACHE_FORMAT = 1
+
+_HEIGHT_RE = re.compile(r"([\d.,]+)\s*(cm|meters)")
+_WEIGHT_RE = re.compile(r"([\d.,]+)\s*(kg|tons)")
+_UNIT_FACTORS = {'cm': 1.0, 'meters': 100.0, 'kg': 1.0, 'tons': 1000.0}
+
+# کلید کش برای هر مقدار alignment/publisher که در جدول نیست (نتیجه همه آن‌ها خالی است)
+_UNKNOWN = object()
+
+
+# --- پردازش ستون‌های نامرتب ---
+
+def _parse_stat(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan                           # 'null'، '-' یا خالی
+
+def _parse_measure(value: str, pattern) -> float:
+    """مقدار متریک را از لیست متنی (مثل "['200 lb', '90 kg']") بیرون می‌کشد؛ صفر یعنی نامعلوم."""
+    match = pattern.search(value)
+    if match is None:
+        return np.nan
+    amount = float(match.group(1).replace(',', '')) * _UNIT_FACTORS[match.group(2)]
+    return amount if amount > 0 else np.nan
+
+def _clean_category(value: str) -> str:
+    return '' if value in ('-', 'null') else value
+
+
+# --- جدول ستونی حریفان ---
+
+class Roster:
+    """جدول ستونی شخصیت‌ها به همراه جست‌وجوی نزدیک‌ترین همسایه."""
+
+    def __init__(self, columns: dict):
+        self.ids = columns['ids']                           # int32
+        self.names = columns['names']                       # رشته‌های یونیکد
+        self.stats = columns['stats']                       # float32 (n, 6) به ترتیب STAT_COLUMNS
+        self.height_cm = columns['height_cm']               # float32 (NaN = نامعلوم)
+        self.weight_kg = columns['weight_kg']               # float32 (NaN = نامعلوم)
+        self.alignments = tuple(str(v) for v in columns['alignment_values'])
+        self.alignment_codes = columns['alignment_codes']   # int8، اندیس در alignments
+        self.publishers = tuple(str(v) for v in columns['publisher_values'])
+        self.publisher_codes = columns['publisher_codes']   # int16، اندیس در publishers
+
+        # ماتریس مقایسه فقط شامل شخصیت‌هایی است که هر چهار آمار مقایسه را دارند
+        match = self.stats[:, MATCH_COLUMNS]
+        self._valid = ~np.isnan(match).any(axis=1)
+        self._match = np.nan_to_num(match)
+        self._match_sq = (self._match ** 2).sum(axis=1)
+        self._candidates = {}                               # (alignment, publisher) -> اندیس‌ها (محدود به مقادیر جدول)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- ساخت از CSV و کش باینری ---
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'Roster':
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+        alignments = sorted({_clean_category(r['alignment']) for r in rows})
+        publishers = sorted({_clean_category(r['publisher']) for r in rows})
+        alignment_index = {value: i for i, value in enumerate(alignments)}
+        publisher_index = {value: i for i, value in enumerate(publishers)}
+
+        return cls({
+            'ids': np.array([int(r['id']) for r in rows], dtype=np.int32),
+            'names': np.array([r['name'] for r in rows], dtype=str),
+            'stats': np.array([[_parse_stat(r[c]) for c in STAT_COLUMNS] for r in rows],
+                              dtype=np.float32).reshape(len(rows), len(STAT_COLUMNS)),
+            'height_cm': np.array([_parse_measure(r['height'], _HEIGHT_RE) for r in rows], dtype=np.float32),
+            'weight_kg': np.array([_parse_measure(r['weight'], _WEIGHT_RE) for r in rows], dtype=np.float32),
+            'alignment_values': np.array(alignments, dtype=str),
+            'alignment_codes': np.array([alignment_index[_clean_category(r['alignment'])] for r in rows], dtype=np.int8),
+            'publisher_values': np.array(publishers, dtype=str),
+            'publisher_codes': np.array([publisher_index[_clean_category(r['publisher'])] for r in rows], dtype=np.int16),
+        })
+
+    def columns(self) -> dict:
+        return {
+            'ids': self.ids, 'names': self.names, 'stats': self.stats,
+            'height_cm': self.height_cm, 'weight_kg': self.weight_kg,
+            'alignment_values': np.array(self.alignments, dtype=str), 'alignment_codes': self.alignment_codes,
+            'publisher_values': np.array(self.publishers, dtype=str), 'publisher_codes': self.publisher_codes,
+        }
+
+    @classmethod
+    def load(cls, csv_path: str = CSV_PATH, cache_path: str = None) -> 'Roster':
+        """از کش باینری بارگذاری می‌کند؛ اگر کش نبود یا کهنه بود، CSV را پردازش و کش را بازنویسی می‌کند."""
+        cache_path = cache_path or os.path.splitext(csv_path)[0] + '.npz'
+        source = os.stat(csv_path)
+        signature = np.array([CACHE_FORMAT, source.st_size, source.st_mtime_ns], dtype=np.int64)
+
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                if np.array_equal(cached['signature'], signature):
+                    return cls({name: cached[name] for name in cached.files if name != 'signature'})
+        except (OSError, KeyError, ValueError):
+            pass                                # کش وجود ندارد یا خراب است
+
+        roster = cls.from_csv(csv_path)
+        tmp_path = cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, signature=signature, **roster.columns())
+            os.replace(tmp_path, cache_path)    # جایگزینی اتمیک تا خواننده هم‌زمان فایل ناقص نبیند
+        except OSError:
+            pass                                # پوشه فقط‌خواندنی: بدون کش ادامه بده
+        return roster
+
+    # --- جست‌وجو ---
+
+    def match_indices(self) -> np.ndarray:
+        """اندیس شخصیت‌هایی که هر چهار آمار مقایسه را دارند (حریفان قابل استفاده)."""
+        return self._candidate_indices()
+
+    def _candidate_indices(self, alignment: str = None, publisher: str = None) -> np.ndarray:
+        # مقادیر ناشناخته فراخواننده همه به یک کلید نگاشت می‌شوند تا کش بی‌حد رشد نکند
+        if alignment is not None and alignment not in self.alignments:
+            alignment = _UNKNOWN
+        if publisher is not None and publisher not in self.publishers:
+            publisher = _UNKNOWN
+        key = (alignment, publisher)
+        indices = self._candidates.get(key)
+        if indices is None:
+            mask = self._valid.copy()
+            if alignment is not None:
+                mask &= self.alignment_codes == (-1 if alignment is _UNKNOWN else self.alignments.index(alignment))
+            if publisher is not None:
+                mask &= self.publisher_codes == (-1 if publisher is _UNKNOWN else self.publishers.index(publisher))
+            indices = np.flatnonzero(mask)
+            with self._lock:
+                self._candidates[key] = indices
+        return indices
+
+    def nearest_many(self, vectors, k: int = 3, alignment: str = None, publisher: str = None) -> np.ndarray:
+        """
+        برای هر سطر از vectors (در مقیاس 0 تا 100، ترتیب PLAYER_STAT_MAPPING)
+        اندیس k حریف نزدیک‌تر را به ترتیب فاصله برمی‌گرداند؛ خروجی (m, k).
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        candidates = self._candidate_indices(alignment, publisher)
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.empty((len(vectors), 0), dtype=np.intp)
+
+        # |a - b|² = |a|² - 2a·b + |b|²  (یک ضرب ماتریسی برای همه پرس‌وجوها)
+        dist = self._match_sq[candidates] - 2.0 * vectors @ self._match[candidates].T
+        dist += (vectors ** 2).sum(axis=1, keepdims=True)
+        if k < len(candidates):
+            part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(len(candidates)), dist.shape)
+        order = np.take_along_axis(dist, part, axis=1).argsort(axis=1)
+        return candidates[np.take_along_axis(part, order, axis=1)]
+
+    def nearest(self, vector, k: int = 3, alignment: str = None, publisher: str = None) -> np.ndarray:
+        """اندیس k حریف نزدیک‌تر به یک بردار آمار."""
+        return self.nearest_many(vector, k, alignment, publisher)[0]
+
+    def row(self, index: int) -> dict:
+        """مشخصات یک شخصیت به صورت دیکشنری (NaN به None تبدیل می‌شود)."""
+        def value(x):
+            return None if np.isnan(x) else float(x)
+        return {
+            'id': int(self.ids[index]),
+            'name': str(self.names[index]),
+            'stats': {name: value(self.stats[index, i]) for i, name in enumerate(STAT_COLUMNS)},
+            'height_cm': value(self.height_cm[index]),
+            'weight_kg': value(self.weight_kg[index]),
+            'alignment': self.alignments[self.alignment_codes[index]] or None,
+            'publisher': self.publishers[self.publisher_codes[index]] or None,
+        }
+
+
+def player_vector(player) -> np.ndarray:
+    """آمار بازیکن را به بردار مقایسه در مقیاس CSV تبدیل می‌کند."""
+    stats = player.stats
+    return np.array([stats[name] for name in PLAYER_STAT_MAPPING], dtype=np.float32) * MATCH_SCALE
+
+
+def find_opponents(player, k: int = 3, alignment: str = None, publisher: str = None) -> list:
+    """k حریف با آمار نزدیک به بازیکن را به صورت لیست دیکشنری برمی‌گرداند."""
+    roster = get_roster()
+    return [roster.row(i) for i in roster.nearest(player_vector(player), k, alignment, publisher)]
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+def get_roster() -> Roster:
+    """نمونه سراسری جدول حریفان؛ فقط در اولین فراخوانی بارگذاری می‌شود."""
+    global _roster
+    if _roster is None:
+        with _roster_lock:
+            if _roster is None:
+                _roster = Roster.load(cache_path=os.environ.get('ENCOUNTER_CACHE_PATH'))
+    return _roster
+
+
+# --- بنچمارک ---
+
+def _benchmark():
+    import tempfile
+    import timeit
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'roster.npz')
+        cold = timeit.timeit(lambda: Roster.load(cache_path=cache_path), number=1)   # پردازش CSV + نوشتن کش
+        warm = timeit.timeit(lambda: Roster.load(cache_path=cache_path), number=20) / 20
+        roster = Roster.load(cache_path=cache_path)
+
+    print(f"roster: {len(roster)} characters, {len(roster.match_indices())} with full match stats")
+    print(f"load: cold (CSV) {cold * 1000:.1f} ms, warm (npz) {warm * 1000:.2f} ms")
+
+    rng = np.random.default_rng(0)
+    vector = rng.uniform(0, 100, size=len(MATCH_COLUMNS))
+    for label, kwargs in (("all", {}), ("good+Marvel", {'alignment': 'good', 'publisher': 'Marvel Comics'})):
+        n = 10_000
+        seconds = timeit.timeit(lambda: roster.nearest(vector, k=5, **kwargs), number=n)
+        print(f"nearest k=5 [{label}]: {seconds / n * 1e6:.1f} µs/query")
+
+    batch = rng.uniform(0, 100, size=(10_000, len(MATCH_COLUMNS)))
+    seconds = timeit.timeit(lambda: roster.nearest_many(batch, k=5), number=5) / 5
+    print(f"nearest_many k=5: {len(batch):,} queries in {seconds * 1000:.1f} ms ({seconds / len(batch) * 1e6:.2f} µs/query)")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -5,6 +5,8 @@
 # داده‌های ثابت و از پیش تعریف‌شده بازی است. برای افزودن یک شهر،
 # یک کوئست جدید، یا یک رتبه جدید، فقط کافیست این فایل را
 # ویرایش کنید. این فایل هیچ منطق برنامه‌نویسی پویایی ندارد.
+# داده‌ها هنگام بالا آمدن ربات در gametables.py اعتبارسنجی و به جدول‌های
+# جستجو تبدیل می‌شوند؛ با GAMEDATA_RELOAD=1 تغییرات بدون ری‌استارت اعمال می‌شوند.
 # =================================================================
 
 
@@ -18,6 +20,25 @@ game_world = {
 }
 
 
+# --- نقشه تولیدی (Procedural) ---
+# دنیای بزرگ بازی از روی یک seed ثابت و به صورت تکه‌تکه (Chunk) ساخته می‌شود
+# (پیاده‌سازی در world.py). مکان‌های دست‌ساز بالا به عنوان «نشانه» روی نقشه
+# تولیدی قرار می‌گیرند و همیشه بر خانه تولیدشده اولویت دارند.
+WORLD_SEED = 20240601
+WORLD_CHUNK_SIZE = 32           # هر چانک 32×32 خانه است
+WORLD_SIZE_CHUNKS = 1024        # دنیا 1024×1024 چانک است (حدود یک میلیارد خانه)
+
+# انواع زمین نقشه تولیدی
+# کلید: شناسه زمین (1 تا 255) | weight: احتمال نسبی در تولید | passable: قابل عبور بودن
+TERRAINS = {
+    1: {"name": "صخره‌های صعب‌العبور 🪨", "description": "دیواره‌ای از صخره راه را بسته است.", "passable": False, "weight": 2},
+    2: {"name": "دشت وحشی 🌾", "description": "علف‌های بلند تا افق ادامه دارند. ردپای حیوانات در خاک دیده می‌شود.", "passable": True, "weight": 5},
+    3: {"name": "جنگل انبوه 🌲", "description": "شاخه‌های درهم‌تنیده نور را می‌بلعند. باید با احتیاط قدم برداشت.", "passable": True, "weight": 4},
+    4: {"name": "تپه‌های سنگی ⛰️", "description": "مسیری ناهموار میان تپه‌ها. باد سردی از ارتفاعات می‌وزد.", "passable": True, "weight": 2},
+    5: {"name": "باتلاق مه‌آلود 🌫", "description": "زمین زیر پایتان نرم و لغزنده است و مه همه‌جا را گرفته.", "passable": True, "weight": 1},
+}
+
+
 # --- سیستم پیشرفت و رتبه‌بندی ---
 # این ساختار، مسیرهای رشد دو کلاس اصلی بازی را تعریف می‌کند.
 CULTIVATION_PATHS = {
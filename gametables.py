@@ -0,0 +1,241 @@
+# =================================================================
+#            gametables.py - Compiled Game Data & Hot Reload
+#
+# این فایل داده‌های gamedata.py را یک بار به جدول‌های جستجوی آماده
+# تبدیل و اعتبارسنجی می‌کند تا در مسیرهای داغ (رندر وضعیت، صعود،
+# کوئست‌ها) هیچ پیمایش یا مدیریت استثنایی لازم نباشد:
+#   - آرایه rank_index -> لقب
+#   - آرایه رتبه‌های هر مسیر به همراه یک رتبه نگهبان («افسانه زنده»)
+#     در انتها، به جای گرفتن IndexError برای بالاترین رتبه
+#   - نگاشت شناسه مهارت/کوئست <-> بیت (فقط افزودنی؛ شناسه حذف‌شده
+#     بیتش را نگه می‌دارد تا بیت‌ست‌های بازیکنان در حافظه معتبر بمانند)
+#
+# بارگذاری مجدد زنده: GameDataReloader فایل داده را زیر نظر دارد و
+# در صورت تغییر، آن را در یک نخ پس‌زمینه (با runpy) اجرا، کامپایل و
+# اعتبارسنجی می‌کند و سپس با یک انتساب واحد (tables) جایگزین می‌کند.
+# هندلرها هیچ‌وقت منتظر نمی‌مانند؛ هر عملیات یک snapshot کامل
+# و سازگار از جدول‌ها می‌بیند. اگر فایل جدید نامعتبر باشد، جدول‌های
+# قبلی سر جایشان می‌مانند.
+#
+# پارامترهای تولید نقشه (seed، اندازه چانک، نوع زمین‌ها) و ویژگی‌های
+# آماری بازیکن با بارگذاری مجدد قابل تغییر نیستند و نیاز به ری‌استارت دارند.
+# =================================================================
+
+import logging
+import os
+import runpy
+import sys
+import threading
+
+import gamedata
+
+logger = logging.getLogger(__name__)
+
+LEGEND_RANK = {"rank_name": "افسانه زنده", "xp_needed": float('inf')}   # رتبه نگهبان پس از آخرین صعود
+NO_TITLE = "بی‌لقب"
+
+# نوع‌های هدف کوئست و کلید «هدف» در objective؛ کلیدهای مجاز جایزه
+OBJECTIVE_TARGET_KEYS = {'kill': 'target', 'find_item': 'item'}
+REWARD_KEYS = ('xp', 'gold', 'attribute_points')
+
+# مقادیری که با بارگذاری مجدد نباید تغییر کنند (نقشه تولیدی به آن‌ها وابسته است)
+_WORLD_KEYS = ('WORLD_SEED', 'WORLD_CHUNK_SIZE', 'WORLD_SIZE_CHUNKS')
+
+
+class GameDataError(ValueError):
+    """داده‌های بازی نامعتبر هستند؛ پیام شامل فهرست تمام مشکلات است."""
+
+
+def _append_only(previous: tuple, current) -> tuple:
+    """ترتیب شناسه‌های قبلی را حفظ و شناسه‌های جدید را به انتها اضافه می‌کند."""
+    return previous + tuple(item for item in current if item not in previous)
+
+
+def _generation_fields(terrains: dict) -> dict:
+    return {tid: (terrain.get('weight', 1), terrain['passable']) for tid, terrain in terrains.items()}
+
+
+def validate(data: dict, previous: 'GameTables' = None) -> list:
+    """مشکلات داده‌های بازی را به صورت لیستی از پیام‌ها برمی‌گرداند (لیست خالی یعنی معتبر)."""
+    errors = []
+    paths = data.get('CULTIVATION_PATHS') or {}
+    if not paths:
+        errors.append("CULTIVATION_PATHS is empty")
+    for path, ranks in paths.items():
+        if not ranks:
+            errors.append(f"path {path!r} has no ranks")
+        for i, rank in enumerate(ranks):
+            if not isinstance(rank.get('rank_name'), str):
+                errors.append(f"path {path!r} rank {i}: missing rank_name")
+            xp_needed = rank.get('xp_needed')
+            if not isinstance(xp_needed, int) or xp_needed <= 0:
+                errors.append(f"path {path!r} rank {i}: xp_needed must be a positive int, got {xp_needed!r}")
+
+    for rank_index, title in (data.get('TITLES') or {}).items():
+        if not isinstance(rank_index, int) or rank_index < 0 or not isinstance(title, str):
+            errors.append(f"TITLES: invalid entry {rank_index!r}: {title!r}")
+
+    for skill_id, skill in (data.get('SKILLS') or {}).items():
+        if skill.get('path') not in paths:
+            errors.append(f"skill {skill_id!r}: unknown path {skill.get('path')!r}")
+        elif not 0 <= skill.get('required_rank', 0) <= len(paths[skill['path']]):
+            errors.append(f"skill {skill_id!r}: required_rank out of range")
+
+    for quest_id, quest in (data.get('QUESTS') or {}).items():
+        objective = quest.get('objective') or {}
+        kind = objective.get('type')
+        if kind not in OBJECTIVE_TARGET_KEYS:
+            errors.append(f"quest {quest_id!r}: unknown objective type {kind!r}")
+        elif not objective.get(OBJECTIVE_TARGET_KEYS[kind]):
+            errors.append(f"quest {quest_id!r}: objective needs {OBJECTIVE_TARGET_KEYS[kind]!r}")
+        if not isinstance(objective.get('count', 1), int) or objective.get('count', 1) < 1:
+            errors.append(f"quest {quest_id!r}: count must be a positive int")
+        location = quest.get('location')
+        if location is not None and (len(location) != 2 or not all(isinstance(v, int) for v in location)):
+            errors.append(f"quest {quest_id!r}: location must be an (x, y) pair")
+        unknown = set(quest.get('rewards', {})) - set(REWARD_KEYS)
+        if unknown:
+            errors.append(f"quest {quest_id!r}: unknown rewards {sorted(unknown)}")
+        for key in ('name', 'description'):
+            if not isinstance(quest.get(key), str):
+                errors.append(f"quest {quest_id!r}: missing {key}")
+
+    if previous is not None:
+        removed = set(previous.path_names) - set(paths)
+        if removed:
+            errors.append(f"paths cannot be removed while running: {sorted(removed)}")
+        if tuple(data.get('ATTRIBUTES') or {}) != previous.stat_names:
+            errors.append("ATTRIBUTES keys cannot change while running")
+        for key in _WORLD_KEYS:
+            if data.get(key) != previous.world[key]:
+                errors.append(f"{key} cannot change while running")
+        if _generation_fields(data.get('TERRAINS') or {}) != _generation_fields(previous.terrains):
+            errors.append("TERRAINS ids, weights and passability cannot change while running")
+    return errors
+
+
+class GameTables:
+    """یک snapshot کامپایل‌شده و تغییرناپذیر از داده‌های بازی."""
+
+    def __init__(self, data: dict, previous: 'GameTables' = None, source: str = None):
+        errors = validate(data, previous)
+        if errors:
+            raise GameDataError("Invalid game data:\n  " + "\n  ".join(errors))
+
+        self.source = source
+        self.version = previous.version + 1 if previous is not None else 1
+
+        # --- مسیرها و رتبه‌ها ---
+        self.path_names = tuple(sys.intern(path) for path in
+                                _append_only(previous.path_names if previous else (), data['CULTIVATION_PATHS']))
+        self.path_ids = {path: i for i, path in enumerate(self.path_names)}
+        # ranks[path_id][rank_index]؛ آخرین عنصر همیشه LEGEND_RANK است
+        self.ranks = tuple(tuple(data['CULTIVATION_PATHS'][path]) + (LEGEND_RANK,) for path in self.path_names)
+        self.ranks_by_path = dict(zip(self.path_names, self.ranks))
+
+        # --- القاب: titles[rank_index] برای تمام رتبه‌های ممکن ---
+        max_rank = max(len(ranks) for ranks in self.ranks)
+        thresholds = sorted((data.get('TITLES') or {}).items())
+        titles, title = [], NO_TITLE
+        for rank_index in range(max_rank):
+            for required, name in thresholds:
+                if rank_index >= required:
+                    title = name
+            titles.append(title)
+        self.titles = tuple(titles)
+
+        # --- آمار، مهارت‌ها و کوئست‌ها ---
+        self.stat_names = tuple(data['ATTRIBUTES'])
+        self.stat_index = {name: i for i, name in enumerate(self.stat_names)}
+        self.skills = dict(data.get('SKILLS') or {})
+        self.skill_ids = _append_only(previous.skill_ids if previous else (), self.skills)
+        self.skill_bits = {skill: 1 << i for i, skill in enumerate(self.skill_ids)}
+        self.quests = dict(data.get('QUESTS') or {})
+        self.quest_ids = _append_only(previous.quest_ids if previous else (), self.quests)
+        self.quest_bits = {quest: 1 << i for i, quest in enumerate(self.quest_ids)}
+
+        # --- نقشه ---
+        self.landmarks = dict(data.get('game_world') or {})
+        self.terrains = dict(data.get('TERRAINS') or {})
+        self.world = {key: data.get(key) for key in _WORLD_KEYS}
+
+    def rank_info(self, path_id: int, rank_index: int) -> dict:
+        ranks = self.ranks[path_id]
+        return ranks[rank_index] if rank_index < len(ranks) else LEGEND_RANK
+
+    def title(self, rank_index: int) -> str:
+        titles = self.titles
+        return titles[rank_index] if rank_index < len(titles) else titles[-1]
+
+
+# جدول‌های فعلی بازی؛ فقط با یک انتساب کامل جایگزین می‌شود
+tables = GameTables(vars(gamedata), source=gamedata.__file__)
+
+
+def load_file(path: str, previous: GameTables = None) -> GameTables:
+    """فایل داده را اجرا و به جدول‌های کامپایل‌شده تبدیل می‌کند (بدون جایگزینی)."""
+    return GameTables(runpy.run_path(path), previous=previous, source=path)
+
+
+class GameDataReloader:
+    """
+    فایل داده را هر interval ثانیه بررسی می‌کند و در صورت تغییر mtime،
+    جدول‌ها را دوباره کامپایل و جایگزین می‌کند. listeners پس از هر
+    جایگزینی موفق با (جدول جدید، جدول قبلی) فراخوانی می‌شوند.
+    """
+
+    def __init__(self, path: str = None, interval: float = 2.0, listeners=()):
+        self.path = path or gamedata.__file__
+        self.interval = interval
+        self.listeners = list(listeners)
+        self._mtime = self._stat()
+        self._lock = threading.Lock()          # فقط یک بارگذاری هم‌زمان
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'reloads': 0, 'failures': 0}
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """یک بار بارگذاری مجدد؛ در صورت نامعتبر بودن فایل، جدول‌های فعلی حفظ می‌شوند."""
+        global tables
+        with self._lock:
+            previous = tables
+            try:
+                new = load_file(self.path, previous)
+            except Exception:
+                self.stats['failures'] += 1
+                logger.exception("Game data reload from %s failed; keeping version %d", self.path, previous.version)
+                return False
+            tables = new
+            self.stats['reloads'] += 1
+            logger.info("Game data reloaded from %s (version %d)", self.path, new.version)
+            for listener in self.listeners:
+                try:
+                    listener(new, previous)
+                except Exception:
+                    logger.exception("Game data reload listener failed")
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            mtime = self._stat()
+            if mtime is not None and mtime != self._mtime:
+                self._mtime = mtime
+                self.reload()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gamedata-reload", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
@@ -0,0 +1,45 @@
+# =================================================================
+#            gunicorn.conf.py - Webhook Server Configuration
+#
+# اجرای ربات در حالت وب‌هوک:
+#   gunicorn -c gunicorn.conf.py bot:app
+#
+# متغیرهای محیطی:
+#   PORT             پورت شنود (پیش‌فرض 5000)
+#   WEB_WORKERS      تعداد پروسس‌های gunicorn؛ فقط 1 مجاز است (پایین را ببینید)
+#   WEB_THREADS      تعداد نخ‌های هر پروسس برای درخواست‌های HTTP (پیش‌فرض 8)
+#   INTAKE_WORKERS   تعداد نخ‌های پردازش آپدیت (پیش‌فرض 4)
+#   INTAKE_QUEUE_SIZE, INTAKE_PUT_TIMEOUT  ظرفیت صف ورودی و زمان انتظار قبل از 503
+#
+# هر پروسس کش بازیکنان، صف نوشتن دسته‌ای و صف‌های ترتیب هر کاربر مخصوص
+# خودش را دارد؛ با بیش از یک پروسس، آپدیت‌های یک کاربر به پروسس‌های
+# مختلف می‌رسند، ترتیبشان به هم می‌ریزد و تغییرات یکدیگر را بازنویسی
+# می‌کنند. بنابراین WEB_WORKERS بزرگ‌تر از 1 هنگام شروع رد می‌شود؛ برای
+# مقیاس‌پذیری WEB_THREADS را افزایش دهید.
+# =================================================================
+
+import os
+
+os.environ.setdefault('RUN_MODE', 'webhook')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_WORKERS', 1))
+threads = int(os.environ.get('WEB_THREADS', 8))
+worker_class = 'gthread'
+
+
+def on_starting(server):
+    # پس از اعمال آرگومان‌های خط فرمان (مثلاً -w 4) هم بررسی می‌شود
+    if server.cfg.workers != 1:
+        raise ValueError(f"{server.cfg.workers} gunicorn workers are not supported: player state is per "
+                         "process, so the bot must run in a single worker (scale with WEB_THREADS)")
+
+
+def post_worker_init(worker):
+    import bot
+    bot.start_webhook()
+
+
+def worker_exit(server, worker):
+    import bot
+    bot.shutdown()
@@ -0,0 +1,178 @@
+# =================================================================
+#            ingress.py - Per-User Serialized Update Intake
+#
+# این فایل صف ورودی آپدیت‌ها و نخ‌های کارگر پردازش‌کننده را پیاده‌سازی
+# می‌کند. هر آپدیت بر اساس user_id به یکی از N صف کارگر هش می‌شود:
+#   - آپدیت‌های یک کاربر همیشه به ترتیب و توسط یک نخ اجرا می‌شوند،
+#     پس دو کلیک سریع هرگز هم‌زمان یک شیء Player را تغییر نمی‌دهند
+#   - کاربران مختلف به صورت موازی روی نخ‌های مختلف پردازش می‌شوند
+#     و هیچ قفل سراسری وجود ندارد
+#
+# فشار معکوس (Backpressure): هر صف کارگر ظرفیت محدودی دارد. در حالت
+# وب‌هوک اگر صف پر بماند، درخواست با خطای 503 رد می‌شود و تلگرام
+# آپدیت را بعداً دوباره ارسال می‌کند. در حالت polling، نخ polling
+# تا خالی شدن جا منتظر می‌ماند.
+# =================================================================
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# مرزهای هیستوگرام زمان انتظار در صف (ثانیه)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def update_user_id(update) -> int:
+    """شناسه کاربر فرستنده آپدیت را برمی‌گرداند (یا update_id اگر فرستنده‌ای نداشت)."""
+    for event in (update.message, update.callback_query, update.edited_message, update.inline_query):
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+    return update.update_id
+
+
+class UpdateIntake:
+    """صف‌های ورودی محدود به ازای هر کارگر، با ترتیب تضمین‌شده برای هر کاربر."""
+
+    def __init__(self, handler, workers: int = 4, maxsize: int = 1000, put_timeout: float = 1.0,
+                 key_func=update_user_id):
+        self.handler = handler                  # تابعی که هر آپدیت را پردازش می‌کند
+        self.workers = workers
+        self.put_timeout = put_timeout          # حداکثر انتظار برای جای خالی در صف (ثانیه)
+        self.key_func = key_func                # استخراج کلید ترتیب (user_id) از آپدیت
+        # ظرفیت کل بین صف‌های کارگرها تقسیم می‌شود
+        self._queues = [queue.Queue(maxsize=max(1, maxsize // workers)) for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+
+        self.stats = {'accepted': 0, 'rejected': 0}
+        # آمار هر کارگر فقط توسط نخ خودش به‌روز می‌شود و نیازی به قفل ندارد
+        self._worker_stats = [self._new_worker_stats() for _ in range(workers)]
+
+    @staticmethod
+    def _new_worker_stats():
+        return {'processed': 0, 'errors': 0, 'wait_total': 0.0, 'wait_max': 0.0,
+                'wait_buckets': [0] * (len(WAIT_BUCKETS) + 1)}
+
+    def start(self):
+        """نخ‌های کارگر را راه‌اندازی می‌کند (فراخوانی مجدد بی‌اثر است)."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, args=(i,), name=f"update-intake-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def offer(self, update, block: bool = False) -> bool:
+        """
+        آپدیت را در صف کارگر مخصوص کاربرش قرار می‌دهد.
+        اگر block برابر True باشد تا خالی شدن جا صبر می‌کند؛ در غیر این صورت
+        حداکثر put_timeout ثانیه صبر کرده و در صورت پر ماندن صف False برمی‌گرداند.
+        """
+        worker_queue = self._queues[self.shard_of(self.key_func(update))]
+        try:
+            worker_queue.put((time.monotonic(), self.handler, update), timeout=None if block else self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        # offer هم‌زمان از چند نخ (gthread در gunicorn) فراخوانی می‌شود
+        with self._lock:
+            self.stats['accepted'] += 1
+        return True
+
+    def shard_of(self, key) -> int:
+        """اندیس صف کارگری که کلید (user_id) به آن تعلق دارد."""
+        return hash(key) % self.workers
+
+    def run_batched(self, keyed_items, fn, on_done=None):
+        """
+        کارهای پس‌زمینه (مثل اعتبار XP تمرین) را روی همان نخ‌های کاربران اجرا می‌کند:
+        keyed_items لیستی از (user_id, item) است؛ آیتم‌ها بر اساس صف کارگر گروه‌بندی
+        شده و fn(items) یک بار برای هر گروه، به ترتیب پس از آپدیت‌های قبلی آن صف، اجرا می‌شود.
+        on_done() (اختیاری) یک بار پس از اجرای همه گروه‌ها، روی نخ آخرین گروه فراخوانی می‌شود.
+        """
+        groups = {}
+        for key, item in keyed_items:
+            groups.setdefault(self.shard_of(key), []).append(item)
+        if on_done is not None and not groups:
+            on_done()                           # گروهی برای صف کردن نیست؛ حلقه زیر کاری نمی‌کند
+        remaining = [len(groups)]
+        lock = threading.Lock()
+
+        def _counted(items):
+            try:
+                fn(items)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    on_done()
+
+        task = _counted if on_done is not None else fn
+        now = time.monotonic()
+        for index, items in groups.items():
+            self._queues[index].put((now, task, items))
+
+    def depth(self) -> int:
+        """تعداد کل آپدیت‌های در انتظار پردازش."""
+        return sum(q.qsize() for q in self._queues)
+
+    def snapshot(self) -> dict:
+        """آمار عمق صف‌ها و زمان انتظار آپدیت‌ها را به صورت یکجا برمی‌گرداند."""
+        depths = [q.qsize() for q in self._queues]
+        processed = sum(s['processed'] for s in self._worker_stats)
+        errors = sum(s['errors'] for s in self._worker_stats)
+        wait_total = sum(s['wait_total'] for s in self._worker_stats)
+        return {
+            'accepted': self.stats['accepted'],
+            'rejected': self.stats['rejected'],
+            'processed': processed,
+            'errors': errors,
+            'queue_depths': depths,
+            'queue_depth_max': max(depths),
+            'wait_avg': wait_total / (processed + errors) if processed + errors else 0.0,
+            'wait_max': max(s['wait_max'] for s in self._worker_stats),
+            'wait_buckets': dict(zip(WAIT_BUCKETS + (float('inf'),),
+                                     (sum(col) for col in zip(*(s['wait_buckets'] for s in self._worker_stats))))),
+        }
+
+    def _worker(self, index: int):
+        worker_queue = self._queues[index]
+        stats = self._worker_stats[index]
+        while True:
+            item = worker_queue.get()
+            if item is None:
+                return
+            enqueued_at, handler, payload = item
+
+            waited = time.monotonic() - enqueued_at
+            stats['wait_total'] += waited
+            if waited > stats['wait_max']:
+                stats['wait_max'] = waited
+            bucket = 0
+            while bucket < len(WAIT_BUCKETS) and waited > WAIT_BUCKETS[bucket]:
+                bucket += 1
+            stats['wait_buckets'][bucket] += 1
+
+            try:
+                handler(payload)
+                stats['processed'] += 1
+            except Exception:
+                stats['errors'] += 1
+                logger.exception("Failed to process update")
+
+    def stop(self):
+        """پس از تخلیه صف‌ها، نخ‌های کارگر را متوقف می‌کند."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+        for thread in threads:
+            thread.join()
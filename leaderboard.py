@@ -0,0 +1,338 @@
+# =================================================================
+#            leaderboard.py - The Incremental Leaderboard
+#
+# این فایل جدول رده‌بندی بازیکنان هر مسیر (gamedata.CULTIVATION_PATHS) را
+# نگه می‌دارد. به جای مرتب کردن کل بازیکنان در هر درخواست /top،
+# یک ساختار مرتب برای هر مسیر به صورت افزایشی به‌روز می‌شود:
+#   - کلید هر بازیکن یک عدد صحیح است که (rank_index, xp) به ترتیب
+#     نزولی و user_id را برای شکستن تساوی در خود دارد
+#   - کلیدها در یک لیست مرتب تکه‌تکه (chunked) نگه داشته می‌شوند؛
+#     درج و حذف با جستجوی دودویی انجام می‌شود و طول تکه‌ها در یک
+#     درخت Fenwick نگه داشته می‌شود تا «جایگاه من» و top-k بدون
+#     پیمایش کامل و در O(log n) پاسخ داده شوند
+#   - هنگام بالا آمدن ربات، جدول یک بار از ستون‌های path/rank_index/xp
+#     انبار بازیکنان ساخته می‌شود (بدون بارگذاری کامل بازیکنان)؛ این کار
+#     در یک نخ پس‌زمینه انجام می‌شود تا زمان بالا آمدن با تعداد بازیکنان
+#     رشد نکند. تا پایان ساخت، ready برابر False است و تغییرات زنده
+#     بازیکنان نگه داشته و روی نتیجه ساخت اعمال می‌شوند
+#
+# اجرای بنچمارک:
+#   python leaderboard.py [تعداد بازیکنان]
+# =================================================================
+
+import logging
+import threading
+from bisect import bisect_left, insort
+
+import gametables
+
+logger = logging.getLogger(__name__)
+
+_MASK = (1 << 64) - 1
+
+
+def encode_key(user_id: int, rank_index: int, xp: int) -> int:
+    """کلید مرتب‌سازی: رتبه و XP بالاتر کوچک‌تر است و در تساوی، user_id کوچک‌تر جلوتر می‌آید."""
+    return -(((rank_index << 64) | xp) << 64) + user_id
+
+
+def decode_key(key: int) -> tuple:
+    """کلید را به (user_id, rank_index, xp) برمی‌گرداند."""
+    score = -(key >> 64)
+    return key & _MASK, score >> 64, score & _MASK
+
+
+class RankIndex:
+    """لیست مرتب تکه‌تکه از کلیدهای عددی با اندیس موقعیتی (درخت Fenwick روی طول تکه‌ها)."""
+
+    LOAD = 1000                                 # اندازه هدف هر تکه؛ تکه‌های بزرگ‌تر از 2*LOAD نصف می‌شوند
+
+    def __init__(self):
+        self._chunks = []                       # تکه‌های مرتب کلیدها
+        self._maxes = []                        # بزرگ‌ترین کلید هر تکه (برای جستجوی دودویی تکه)
+        self._tree = None                       # درخت Fenwick طول تکه‌ها؛ پس از تقسیم/حذف تکه دوباره ساخته می‌شود
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def load(self, keys: list):
+        """محتوا را با لیستی از کلیدها جایگزین می‌کند (ساخت اولیه در O(n log n))."""
+        keys = sorted(keys)
+        self._chunks = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._tree = None
+        self._len = len(keys)
+
+    def add(self, key: int):
+        chunks, maxes = self._chunks, self._maxes
+        if not chunks:
+            chunks.append([key])
+            maxes.append(key)
+            self._tree = None
+            self._len = 1
+            return
+
+        i = bisect_left(maxes, key)
+        if i == len(chunks):
+            i -= 1
+            chunks[i].append(key)
+            maxes[i] = key
+        else:
+            insort(chunks[i], key)
+        self._len += 1
+
+        chunk = chunks[i]
+        if len(chunk) > 2 * self.LOAD:
+            chunks[i:i + 1] = [chunk[:self.LOAD], chunk[self.LOAD:]]
+            maxes[i:i + 1] = [chunk[self.LOAD - 1], chunk[-1]]
+            self._tree = None
+        elif self._tree is not None:
+            self._tree_add(i, 1)
+
+    def discard(self, key: int) -> bool:
+        chunks, maxes = self._chunks, self._maxes
+        i = bisect_left(maxes, key)
+        if i == len(chunks):
+            return False
+        chunk = chunks[i]
+        j = bisect_left(chunk, key)
+        if chunk[j] != key:
+            return False
+
+        del chunk[j]
+        self._len -= 1
+        if not chunk:
+            del chunks[i], maxes[i]
+            self._tree = None
+        else:
+            if j == len(chunk):
+                maxes[i] = chunk[-1]
+            if self._tree is not None:
+                self._tree_add(i, -1)
+        return True
+
+    def index(self, key: int):
+        """موقعیت (از صفر) کلید در ترتیب مرتب، یا None اگر کلید وجود نداشته باشد."""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._chunks):
+            return None
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if chunk[j] != key:
+            return None
+        return self._prefix(i) + j
+
+    def slice(self, start: int, stop: int) -> list:
+        """کلیدهای موقعیت start تا stop (بدون stop)."""
+        stop = min(stop, self._len)
+        if start >= stop:
+            return []
+        i, j = self._locate(start)
+        result = []
+        while len(result) < stop - start:
+            chunk = self._chunks[i]
+            result.extend(chunk[j:j + stop - start - len(result)])
+            i, j = i + 1, 0
+        return result
+
+    # --- درخت Fenwick روی طول تکه‌ها ---
+
+    def _fenwick(self) -> list:
+        tree = self._tree
+        if tree is None:
+            tree = [0] + [len(chunk) for chunk in self._chunks]
+            for i in range(1, len(tree)):
+                parent = i + (i & -i)
+                if parent < len(tree):
+                    tree[parent] += tree[i]
+            self._tree = tree
+        return tree
+
+    def _tree_add(self, chunk_index: int, delta: int):
+        tree = self._tree
+        i = chunk_index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, chunk_index: int) -> int:
+        """تعداد کل کلیدهای تکه‌های قبل از chunk_index."""
+        tree = self._fenwick()
+        total, i = 0, chunk_index
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position: int) -> tuple:
+        """(شماره تکه، موقعیت درون تکه) برای یک موقعیت سراسری."""
+        tree = self._fenwick()
+        i, bit = 0, 1 << (len(tree) - 1).bit_length()
+        while bit:
+            step = i + bit
+            if step < len(tree) and tree[step] <= position:
+                i = step
+                position -= tree[step]
+            bit >>= 1
+        return i, position
+
+
+class Leaderboard:
+    """جدول رده‌بندی جداگانه برای هر مسیر؛ تمام متدها thread-safe هستند."""
+
+    def __init__(self, paths):
+        self._indexes = {path: RankIndex() for path in paths}
+        self._lock = threading.Lock()
+        self.ready = False                      # True پس از پایان اولین load
+        self._live = {}                         # user_id -> (path, key) برای تغییرات حین ساخت اولیه
+        self.stats = {'updates': 0, 'queries': 0}
+
+    def add_paths(self, paths):
+        """برای مسیرهای جدید (مثلاً پس از بارگذاری مجدد داده‌ها) جدول خالی می‌سازد."""
+        with self._lock:
+            for path in paths:
+                self._indexes.setdefault(path, RankIndex())
+
+    def load(self, rows):
+        """
+        جدول را از ردیف‌های (user_id, path, rank_index, xp) می‌سازد؛ معمولاً
+        از PlayerBackend.rankings() هنگام بالا آمدن ربات.
+        """
+        keys = {path: [] for path in self._indexes}
+        for user_id, path, rank_index, xp in rows:
+            if path in keys:
+                keys[path].append(encode_key(user_id, rank_index, xp))
+        with self._lock:
+            # وضعیت زنده بازیکنانی که حین ساخت تغییر کردند، جایگزین ردیف ذخیره‌شده‌شان می‌شود
+            live, self._live = self._live, {}
+            for path, index in self._indexes.items():
+                path_keys = keys.get(path, [])
+                if live:
+                    path_keys = [key for key in path_keys if key & _MASK not in live]
+                    path_keys.extend(key for live_path, key in live.values() if live_path == path)
+                index.load(path_keys)
+            self.ready = True
+
+    def load_in_background(self, rows_factory) -> threading.Thread:
+        """load(rows_factory()) را در یک نخ پس‌زمینه اجرا می‌کند."""
+        def run():
+            try:
+                self.load(rows_factory())
+            except Exception:
+                logger.exception("Leaderboard build failed")
+
+        thread = threading.Thread(target=run, name="leaderboard-load", daemon=True)
+        thread.start()
+        return thread
+
+    def place(self, path: str, user_id: int, rank_index: int, xp: int):
+        """بازیکن را با وضعیت فعلی‌اش ثبت می‌کند؛ ثبت دوباره همان وضعیت بی‌اثر است."""
+        key = encode_key(user_id, rank_index, xp)
+        with self._lock:
+            index = self._indexes[path]
+            index.discard(key)
+            index.add(key)
+            if not self.ready:
+                self._live[user_id] = (path, key)
+
+    def remove(self, path: str, user_id: int, rank_index: int, xp: int):
+        """بازیکن را از جدول مسیر path برمی‌دارد (مثلاً پس از تغییر مسیر)."""
+        with self._lock:
+            self._indexes[path].discard(encode_key(user_id, rank_index, xp))
+            if not self.ready:
+                # ردیف ذخیره‌شده بازیکن نباید در ساخت اولیه دوباره اضافه شود
+                self._live[user_id] = (None, None)
+
+    def move(self, path: str, user_id: int, old_rank: int, old_xp: int, rank_index: int, xp: int):
+        """جایگاه بازیکن را پس از تغییر رتبه یا XP در O(log n) به‌روز می‌کند."""
+        old_key = encode_key(user_id, old_rank, old_xp)
+        key = encode_key(user_id, rank_index, xp)
+        with self._lock:
+            index = self._indexes[path]
+            index.discard(old_key)
+            index.add(key)
+            if not self.ready:
+                self._live[user_id] = (path, key)
+            self.stats['updates'] += 1
+
+    def position(self, path: str, user_id: int, rank_index: int, xp: int):
+        """(جایگاه از 1، تعداد کل بازیکنان مسیر) یا None اگر بازیکن در جدول نباشد."""
+        key = encode_key(user_id, rank_index, xp)
+        with self._lock:
+            index = self._indexes[path]
+            i = index.index(key)
+            self.stats['queries'] += 1
+            return None if i is None else (i + 1, len(index))
+
+    def percentile(self, path: str, user_id: int, rank_index: int, xp: int):
+        """درصد بازیکنان مسیر که پایین‌تر از این بازیکن هستند، یا None."""
+        result = self.position(path, user_id, rank_index, xp)
+        if result is None:
+            return None
+        position, total = result
+        return 100.0 * (total - position) / total
+
+    def top(self, path: str, k: int = 10, start: int = 0) -> list:
+        """k بازیکن برتر مسیر (از موقعیت start) به صورت لیست (user_id, rank_index, xp)."""
+        with self._lock:
+            keys = self._indexes[path].slice(start, start + k)
+            self.stats['queries'] += 1
+        return [decode_key(key) for key in keys]
+
+    def size(self, path: str) -> int:
+        return len(self._indexes[path])
+
+
+# جدول رده‌بندی سراسری بازی (مانند game_world، توسط Player به‌روز می‌شود)
+leaderboard = Leaderboard(gametables.tables.path_names)
+
+
+# --- بنچمارک ---
+
+def _benchmark(n: int):
+    import random
+    import time
+
+    rng = random.Random(0)
+    paths = list(gametables.tables.path_names)
+    state = {user_id: (paths[user_id % len(paths)], rng.randrange(8), rng.randrange(100_000))
+             for user_id in range(n)}
+    board = Leaderboard(paths)
+
+    started = time.perf_counter()
+    board.load((user_id, path, rank_index, xp) for user_id, (path, rank_index, xp) in state.items())
+    print(f"n={n:,}: initial build {time.perf_counter() - started:.2f}s")
+
+    samples = [rng.randrange(n) for _ in range(100_000)]
+
+    started = time.perf_counter()
+    for user_id in samples:
+        path, rank_index, xp = state[user_id]
+        board.move(path, user_id, rank_index, xp, rank_index, xp + 25)
+        state[user_id] = (path, rank_index, xp + 25)
+    print(f"  update (add_xp):   {(time.perf_counter() - started) / len(samples) * 1e6:8.2f} µs")
+
+    started = time.perf_counter()
+    for user_id in samples:
+        path, rank_index, xp = state[user_id]
+        board.position(path, user_id, rank_index, xp)
+    print(f"  position/percent:  {(time.perf_counter() - started) / len(samples) * 1e6:8.2f} µs")
+
+    started = time.perf_counter()
+    for user_id in samples[:10_000]:
+        board.top(state[user_id][0], 10)
+    print(f"  top-10:            {(time.perf_counter() - started) / 10_000 * 1e6:8.2f} µs")
+
+    # مقایسه با روش ساده: مرتب کردن کل بازیکنان یک مسیر در هر درخواست /top
+    started = time.perf_counter()
+    ranked = sorted((item for item in state.items() if item[1][0] == paths[0]),
+                    key=lambda item: (-item[1][1], -item[1][2], item[0]))
+    naive = time.perf_counter() - started
+    assert [user_id for user_id, _ in ranked[:10]] == [user_id for user_id, _, _ in board.top(paths[0], 10)]
+    print(f"  full sort per /top: {naive * 1e6:,.0f} µs")
+
+
+if __name__ == "__main__":
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
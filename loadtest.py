@@ -0,0 +1,585 @@
+# =================================================================
+#            loadtest.py - Load-Test Harness
+#
+# این فایل توان عملیاتی ربات را بدون تماس با تلگرام واقعی می‌سنجد:
+#   - FakeBotAPI: یک سرور HTTP محلی که به جای api.telegram.org متدهای
+#     getUpdates، sendMessage، editMessageText و answerCallbackQuery
+#     (و setWebhook/deleteWebhook) را پاسخ می‌دهد؛ با تأخیر قابل تنظیم
+#     و تزریق خطای 429 با احتمال مشخص
+#   - هزاران کاربر مصنوعی که هر کدام مسیر /start، انتخاب مسیر، حرکت،
+#     تمرین خودکار، کسب XP و صعود را طی می‌کنند (حلقه بسته: هر کاربر
+#     پس از دریافت پاسخ قدم قبلی، قدم بعدی را می‌فرستد)
+#   - اجرا در حالت polling (آپدیت‌ها از getUpdates) یا webhook (POST
+#     به /webhook روی سرور واقعی Flask)
+#   - نتیجه (آپدیت بر ثانیه، صدک‌های تأخیر، تعداد فراخوانی‌های API و
+#     آمار اجزای ربات) در یک فایل JSON ذخیره می‌شود تا نسخه‌ها قابل
+#     مقایسه باشند
+#
+# اجرا:
+#   python loadtest.py --mode polling --users 2000
+#   python loadtest.py --mode both --latency-ms 20 --rate-429 0.01
+#   python loadtest.py --runtime async --output async.json
+#   python loadtest.py --spammers 20 --admission-rate 4 --admission-dedupe 0.3
+#   python loadtest.py --compare old.json new.json
+#
+# ربات در یک پردازه جداگانه اجرا می‌شود (bot.py تنظیماتش را هنگام
+# import از متغیرهای محیطی می‌خواند و نباید GIL را با سرور جعلی و
+# کاربران مصنوعی شریک باشد).
+# =================================================================
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+TOKEN = "123456:LOADTEST"
+WEBHOOK_SECRET = "loadtest-secret"
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+
+# --- سرور جعلی Bot API ---
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """
+    قطع اتصال از سمت ربات (هنگام خاموش شدن یا بسته شدن long poll) خطای
+    اجرا نیست؛ بدون این، هر اجرای عادی با چند traceback تمام می‌شد.
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeBotAPI:
+    """جایگزین محلی Bot API تلگرام با تأخیر و خطای 429 قابل تنظیم."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_429: float = 0.0,
+                 retry_after: int = 1, on_call=None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.on_call = on_call                  # on_call(method, params) پس از هر پاسخ موفق
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+        self._updates = []                      # صف آپدیت‌ها برای getUpdates
+        self._cond = threading.Condition()
+        self._next_update_id = 1
+        self._message_ids = {}                  # chat_id -> آخرین message_id
+
+        self.calls = {}                         # method -> تعداد فراخوانی
+        self.injected_429 = {}                  # method -> تعداد 429 تزریق‌شده
+        self._stats_lock = threading.Lock()
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # سربرگ و بدنه جدا نوشته می‌شوند؛ بدون این، هر پاسخ ~40ms منتظر ACK می‌ماند
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                url = urlparse(self.path)
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    body = self.rfile.read(length).decode()
+                    if self.headers.get('Content-Type', '').startswith('application/json'):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body))
+                status, payload = api.handle(url.path.rsplit('/', 1)[-1], params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _handle
+
+        self.server = _QuietHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = None
+
+    # --- صف آپدیت‌ها (حالت polling) ---
+
+    def push_update(self, update: dict):
+        with self._cond:
+            update['update_id'] = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._cond.notify_all()
+
+    def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # آپدیت‌های تأییدشده (کمتر از offset) کنار گذاشته می‌شوند
+            if offset:
+                self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._updates[:limit]
+
+    # --- پاسخ به متدها ---
+
+    def handle(self, method: str, params: dict):
+        if method != 'getUpdates':
+            with self._rng_lock:
+                delay = self.latency + self._rng.random() * self.jitter
+                limited = self._rng.random() < self.rate_429
+            if delay:
+                time.sleep(delay)
+            with self._stats_lock:
+                self.calls[method] = self.calls.get(method, 0) + 1
+                if limited:
+                    self.injected_429[method] = self.injected_429.get(method, 0) + 1
+            if limited:
+                return 429, {'ok': False, 'error_code': 429,
+                             'description': f"Too Many Requests: retry after {self.retry_after}",
+                             'parameters': {'retry_after': self.retry_after}}
+        else:
+            with self._stats_lock:
+                self.calls[method] = self.calls.get(method, 0) + 1
+            return 200, {'ok': True, 'result': self._get_updates(params)}
+
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            with self._stats_lock:
+                message_id = self._message_ids.get(chat_id, 0) + (method == 'sendMessage')
+                self._message_ids[chat_id] = message_id
+            result = {'message_id': int(params.get('message_id') or message_id), 'date': int(time.time()),
+                      'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text', '')}
+        elif method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'loadtest', 'username': 'loadtest_bot'}
+        else:
+            result = True
+        if self.on_call is not None:
+            self.on_call(method, params)
+        return 200, {'ok': True, 'result': result}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-bot-api", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# --- کاربران مصنوعی ---
+
+def make_script(rng: random.Random, moves: int, actions: int) -> list:
+    """قدم‌های یک کاربر: (نوع، داده) که نوع 'message' یا 'callback' است."""
+    steps = [('message', '/start'), ('callback', rng.choice(('choose_tahzib', 'choose_mana')))]
+    steps += [('callback', 'move_' + rng.choice(DIRECTIONS)) for _ in range(moves)]
+    steps.append(('callback', 'train'))                        # شروع تمرین خودکار
+    steps += [('callback', 'action')] * actions
+    steps.append(('callback', 'train'))                        # توقف تمرین (اعتبار XP جزئی)
+    steps += [('callback', 'breakthrough'), ('callback', 'show_status')]
+    return steps
+
+
+def make_spam_script(clicks: int) -> list:
+    """کاربر مزاحم: پس از ورود، clicks بار دکمه action را بدون انتظار برای پاسخ می‌زند."""
+    return [('message', '/start'), ('callback', 'choose_tahzib'), ('burst', 'action', clicks)]
+
+
+def make_update(user_id: int, kind: str, data: str, callback_id: str) -> dict:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"load{user_id}"}
+    chat = {'id': user_id, 'type': 'private'}
+    if kind == 'message':
+        command = data.split()[0]
+        return {'message': {'message_id': 1, 'date': int(time.time()), 'chat': chat, 'from': user, 'text': data,
+                            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]}}
+    return {'callback_query': {'id': callback_id, 'from': user, 'chat_instance': str(user_id), 'data': data,
+                               'message': {'message_id': 1, 'date': int(time.time()), 'chat': chat,
+                                           'from': {'id': 1, 'is_bot': True, 'first_name': 'bot'}, 'text': '-'}}}
+
+
+class SyntheticLoad:
+    """
+    حلقه بسته کاربران مصنوعی: هر کاربر یک قدم در جریان دارد و قدم بعدی
+    را وقتی می‌فرستد که پاسخ قدم فعلی (answerCallbackQuery یا sendMessage)
+    به سرور جعلی رسیده باشد.
+    """
+
+    def __init__(self, users: int, deliver, moves: int = 5, actions: int = 4, step_timeout: float = 30.0,
+                 seed: int = 0, user_id_base: int = 10_000_000, spammers: int = 0, spam_clicks: int = 0):
+        rng = random.Random(seed)
+        self.deliver = deliver                  # deliver(update) آپدیت را به ربات می‌رساند
+        self.step_timeout = step_timeout
+        self._scripts = {user_id_base + i: make_script(rng, moves, actions) for i in range(users)}
+        self._scripts.update((user_id_base + users + i, make_spam_script(spam_clicks)) for i in range(spammers))
+        self._position = dict.fromkeys(self._scripts, 0)
+        self._pending = {}                      # کلید انتظار (('cb', id) یا ('chat', id)) -> (user_id, sent_at, data)
+        self._lock = threading.Lock()
+        self._remaining = len(self._scripts)
+        self.done = threading.Event()
+        self.latencies = []                     # تأخیر انتها به انتها هر قدم (ثانیه)
+        self.timeouts = {}                      # داده قدم -> تعداد قدم‌های بی‌پاسخ
+        self.updates_sent = 0
+        self._callback_ids = 0
+
+    def start(self):
+        for user_id in list(self._scripts):
+            self._send_next(user_id)
+
+    def _send_next(self, user_id: int):
+        with self._lock:
+            position = self._position[user_id]
+            script = self._scripts[user_id]
+            if position >= len(script):
+                self._remaining -= 1
+                if self._remaining == 0:
+                    self.done.set()
+                return
+            self._position[user_id] = position + 1
+            kind, data = script[position][:2]
+            count = script[position][2] if kind == 'burst' else 1
+            first_id = self._callback_ids + 1
+            self._callback_ids += count
+            self.updates_sent += count
+            if kind != 'burst':
+                key = ('cb', str(first_id)) if kind == 'callback' else ('chat', user_id)
+                self._pending[key] = (user_id, time.perf_counter(), data)
+        if kind == 'burst':
+            # کلیک‌های پشت‌سرهم (حلقه باز): منتظر پاسخ‌ها نمی‌ماند و تأخیرشان ثبت نمی‌شود
+            for callback_id in range(first_id, first_id + count):
+                self.deliver(make_update(user_id, 'callback', data, str(callback_id)))
+            self._send_next(user_id)
+        else:
+            self.deliver(make_update(user_id, kind, data, str(first_id)))
+
+    def on_call(self, method: str, params: dict):
+        """فراخوانی‌های Bot API را به قدم در انتظار کاربر مربوط وصل می‌کند."""
+        if method == 'answerCallbackQuery':
+            key = ('cb', params.get('callback_query_id'))
+        elif method == 'sendMessage':
+            key = ('chat', int(params.get('chat_id', 0)))
+        else:
+            return
+        with self._lock:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                return                          # مثلاً اعلان تمرین یا پیام وضعیت پس از پاسخ دکمه
+            self.latencies.append(time.perf_counter() - entry[1])
+        self._send_next(entry[0])
+
+    def reap_timeouts(self):
+        """قدم‌هایی را که در step_timeout پاسخ نگرفته‌اند رها و کاربر را به قدم بعد می‌برد."""
+        now = time.perf_counter()
+        with self._lock:
+            expired = [(key, entry) for key, entry in self._pending.items() if now - entry[1] > self.step_timeout]
+            for key, (_, _, data) in expired:
+                del self._pending[key]
+                self.timeouts[data] = self.timeouts.get(data, 0) + 1
+        for _, (user_id, _, _) in expired:
+            self._send_next(user_id)
+
+
+# --- اجرای یک حالت ---
+
+def _percentiles(values, qs=(0.5, 0.95, 0.99)) -> dict:
+    if not values:
+        return {f"p{int(q * 100)}": None for q in qs}
+    values = sorted(values)
+    return {f"p{int(q * 100)}": round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3) for q in qs}
+
+
+def _git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def serve_bot(args):
+    """
+    پردازه ربات: bot.py را با Bot API جعلی (args.api_url) و runtime انتخاب‌شده
+    اجرا می‌کند، پورت HTTP را چاپ و با رسیدن یک خط به stdin متوقف می‌شود و آمار اجزا را چاپ می‌کند.
+    """
+    import logging
+
+    from telebot import apihelper, asyncio_helper
+    apihelper.API_URL = asyncio_helper.API_URL = args.api_url + "/bot{0}/{1}"
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)     # بدون لاگ هر درخواست
+
+    import bot as bot_module
+    import metrics
+
+    if args.runtime == 'async':
+        import asyncio
+
+        import async_runtime
+
+        async def run():
+            stop = asyncio.Event()
+            serving = asyncio.create_task(async_runtime.serve(port=0, stop=stop,
+                                                              on_ready=lambda port: print(port, flush=True)))
+            await asyncio.get_running_loop().run_in_executor(None, sys.stdin.readline)
+            stop.set()
+            await serving
+        asyncio.run(run())
+    else:
+        bot_module.start_background()
+        if args.mode == 'polling':
+            port = 0
+            threading.Thread(target=bot_module.bot.polling, name="polling", daemon=True,
+                             kwargs={'non_stop': True, 'interval': 0, 'timeout': 1, 'long_polling_timeout': 1}).start()
+        else:
+            from werkzeug.serving import make_server
+            server = make_server('127.0.0.1', 0, bot_module.app, threaded=True)
+            port = server.server_port
+            threading.Thread(target=server.serve_forever, name="webhook-server", daemon=True).start()
+        print(port, flush=True)
+
+        sys.stdin.readline()
+        if args.mode == 'polling':
+            bot_module.bot.stop_polling()
+        else:
+            server.shutdown()
+        bot_module.shutdown()
+
+    # از هیستوگرام rpg_handler_seconds (درون‌یابی داخل بازه‌ها، پس تقریبی است)
+    handler_quantiles = metrics.handler_seconds.quantiles((0.5, 0.95, 0.99))
+    print(json.dumps({
+        'handler_latency_ms': {f"p{q}": round(v * 1000, 3) for q, v in zip((50, 95, 99), handler_quantiles)},
+        'outbound': dict(bot_module.outbound.stats),
+        'intake': {key: value for key, value in bot_module.intake.snapshot().items() if key != 'wait_buckets'},
+        'training': dict(bot_module.training.stats),
+        'admission': dict(bot_module.admission.stats),
+    }), flush=True)
+
+
+def run_mode(args, mode: str) -> dict:
+    """
+    یک حالت (polling یا webhook) را اجرا می‌کند: Bot API جعلی و کاربران
+    مصنوعی در همین پردازه، خود ربات در یک پردازه جدا (تا GIL و تنظیمات
+    محیطی دو طرف از هم جدا باشند).
+    """
+    api = FakeBotAPI(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, rate_429=args.rate_429,
+                     retry_after=args.retry_after, seed=args.seed)
+    api.start()
+
+    # پایگاه داده یک‌بارمصرف ربات؛ پس از پایان پردازه ربات پاک می‌شود (در صورت خطا، finalizer خود TemporaryDirectory)
+    workdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+    env = dict(os.environ,
+               BOT_TOKEN=TOKEN,
+               RUN_MODE=mode,
+               WEBHOOK_SECRET=WEBHOOK_SECRET,
+               PLAYER_STORE=args.store,
+               PLAYER_DB_PATH=os.path.join(workdir.name, 'players.db'),
+               OUTBOUND_GLOBAL_RATE=str(args.global_rate),
+               OUTBOUND_CHAT_RATE=str(args.chat_rate),
+               OUTBOUND_SENDERS=str(args.senders),
+               OUTBOUND_URGENT_SHARE=str(args.urgent_share),
+               INTAKE_WORKERS=str(args.workers),
+               TRAINING_TICK_SECONDS=str(args.training_tick),
+               ADMISSION_RATE=str(args.admission_rate),
+               ADMISSION_DEDUPE_SECONDS=str(args.admission_dedupe))
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-bot', '--mode', mode,
+                              '--runtime', args.runtime, '--api-url', api.url],
+                             env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    port = child.stdout.readline().strip()
+    if not port:
+        raise SystemExit(f"{mode}: bot process failed to start")
+
+    posters = []
+    rejected = [0]
+    if mode == 'polling':
+        deliver = api.push_update
+    else:
+        post_queue = queue.Queue()
+
+        def poster():
+            # http.client به جای requests تا سربار سمت «تلگرام» کمتر از خود ربات باشد
+            connection = http.client.HTTPConnection('127.0.0.1', int(port))
+            headers = {'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET}
+            while True:
+                update = post_queue.get()
+                if update is None:
+                    connection.close()
+                    return
+                body = json.dumps(update).encode()
+                while True:
+                    connection.request('POST', '/webhook', body, headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 503:
+                        break
+                    # 503 یعنی صف ورودی پر است؛ تلگرام هم در این حالت دوباره تلاش می‌کند
+                    rejected[0] += 1
+                    time.sleep(0.01)
+
+        posters = [threading.Thread(target=poster, daemon=True) for _ in range(args.posters)]
+        for thread in posters:
+            thread.start()
+        update_ids = iter(range(1, 1 << 62))
+
+        def deliver(update):
+            update['update_id'] = next(update_ids)
+            post_queue.put(update)
+
+    load = SyntheticLoad(args.users, deliver, moves=args.moves, actions=args.actions,
+                         step_timeout=args.step_timeout, seed=args.seed,
+                         spammers=args.spammers, spam_clicks=args.spam_clicks)
+    api.on_call = load.on_call
+
+    started = time.perf_counter()
+    load.start()
+    while not load.done.wait(0.5):
+        load.reap_timeouts()
+        if time.perf_counter() - started > args.max_seconds:
+            break
+    elapsed = time.perf_counter() - started
+
+    for _ in posters:
+        post_queue.put(None)
+    bot_stats, _ = child.communicate("stop\n", timeout=60)
+    api.stop()
+    workdir.cleanup()
+
+    result = {
+        'version': _git_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'mode': mode,
+        'config': {key: getattr(args, key) for key in
+                   ('runtime', 'users', 'moves', 'actions', 'store', 'latency_ms', 'jitter_ms', 'rate_429', 'retry_after',
+                    'global_rate', 'chat_rate', 'senders', 'urgent_share', 'workers', 'posters', 'training_tick',
+                    'spammers', 'spam_clicks', 'admission_rate', 'admission_dedupe', 'seed')},
+        'completed': load.done.is_set(),
+        'duration_seconds': round(elapsed, 3),
+        'updates': load.updates_sent,
+        'updates_per_second': round(load.updates_sent / elapsed, 1),
+        'timeouts': load.timeouts,
+        'end_to_end_latency_ms': _percentiles(load.latencies),
+        'api_calls': dict(sorted(api.calls.items())),
+        'injected_429': dict(sorted(api.injected_429.items())),
+    }
+    if mode == 'webhook':
+        result['webhook_503'] = rejected[0]
+    result.update(json.loads(bot_stats.strip().splitlines()[-1]))
+    return result
+
+
+# --- مقایسه نتایج ---
+
+COMPARED = (('updates_per_second', 1), ('end_to_end_latency_ms.p50', -1), ('end_to_end_latency_ms.p95', -1),
+            ('end_to_end_latency_ms.p99', -1), ('handler_latency_ms.p50', -1), ('handler_latency_ms.p99', -1))
+
+
+def compare(old: dict, new: dict) -> str:
+    """تفاوت شاخص‌های اصلی دو نتیجه (هم حالت) را به صورت متن برمی‌گرداند."""
+    def get(result, path):
+        for part in path.split('.'):
+            result = (result or {}).get(part)
+        return result
+
+    lines = [f"{old.get('version')} -> {new.get('version')} ({new.get('mode')})"]
+    for path, better in COMPARED:
+        a, b = get(old, path), get(new, path)
+        if a is None or b is None:
+            continue
+        change = (b - a) / a * 100 if a else 0.0
+        flag = "" if abs(change) < 5 else (" better" if change * better > 0 else " WORSE")
+        lines.append(f"  {path:<28} {a:>10} -> {b:>10}  ({change:+.1f}%){flag}")
+    return "\n".join(lines)
+
+
+def _load_results(path) -> list:
+    with open(path) as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the bot against a local fake Bot API.")
+    parser.add_argument('--mode', choices=('polling', 'webhook', 'both'), default='both')
+    parser.add_argument('--runtime', choices=('threads', 'async'), default='threads',
+                        help="bot.py threads or async_runtime.py")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--moves', type=int, default=5, help="moves per user")
+    parser.add_argument('--actions', type=int, default=4, help="XP clicks per user (4 x 25 XP reaches rank 1)")
+    parser.add_argument('--store', choices=('memory', 'sqlite'), default='sqlite')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="fake API latency per call")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="extra uniform random latency")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="probability of injecting a 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--global-rate', type=float, default=100_000, help="OUTBOUND_GLOBAL_RATE for the bot")
+    parser.add_argument('--chat-rate', type=float, default=1_000, help="OUTBOUND_CHAT_RATE for the bot")
+    parser.add_argument('--senders', type=int, default=8, help="OUTBOUND_SENDERS for the bot")
+    parser.add_argument('--urgent-share', type=int, default=3, help="OUTBOUND_URGENT_SHARE for the bot")
+    parser.add_argument('--workers', type=int, default=4, help="INTAKE_WORKERS for the bot")
+    parser.add_argument('--posters', type=int, default=16, help="concurrent webhook POST threads")
+    parser.add_argument('--training-tick', type=float, default=1.0, help="TRAINING_TICK_SECONDS for the bot")
+    parser.add_argument('--spammers', type=int, default=0, help="extra users that hammer the action button")
+    parser.add_argument('--spam-clicks', type=int, default=200, help="back-to-back clicks per spammer")
+    # کاربران مصنوعی سریع‌تر از هر انسانی کلیک می‌کنند؛ کنترل سیل ورودی به طور پیش‌فرض خاموش است
+    parser.add_argument('--admission-rate', type=float, default=0, help="ADMISSION_RATE for the bot (0 = off)")
+    parser.add_argument('--admission-dedupe', type=float, default=0,
+                        help="ADMISSION_DEDUPE_SECONDS for the bot (0 = off)")
+    parser.add_argument('--step-timeout', type=float, default=30.0)
+    parser.add_argument('--max-seconds', type=float, default=600.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON file for the results (default: loadtest-<version>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files and exit")
+    parser.add_argument('--serve-bot', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--api-url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        old_results = {result['mode']: result for result in _load_results(args.compare[0])}
+        for new in _load_results(args.compare[1]):
+            if new['mode'] in old_results:
+                print(compare(old_results[new['mode']], new))
+        return
+
+    if args.serve_bot:
+        serve_bot(args)
+        return
+
+    modes = ('polling', 'webhook') if args.mode == 'both' else (args.mode,)
+    results = []
+    for mode in modes:
+        result = run_mode(args, mode)
+        results.append(result)
+        print(f"{mode:>8}: {result['updates']:,} updates in {result['duration_seconds']}s "
+              f"({result['updates_per_second']:,} updates/s), e2e {result['end_to_end_latency_ms']}, "
+              f"handler {result['handler_latency_ms']}, timeouts {result['timeouts']}")
+        print(f"          api calls {result['api_calls']}, 429s {result['injected_429']}")
+
+    output = args.output or f"loadtest-{results[0]['version'] or 'unknown'}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
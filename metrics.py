@@ -0,0 +1,282 @@
+# =================================================================
+#            metrics.py - Metrics & Sampling Profiler
+#
+# این فایل ابزارهای مشاهده‌پذیری ربات را فراهم می‌کند:
+#   - Counter و Histogram سبک (بدون وابستگی خارجی) با خروجی متنی
+#     Prometheus برای مسیر /metrics
+#   - دکوراتور timed برای اندازه‌گیری تأخیر و خطای هندلرها
+#   - زمان‌سنج تمام درخواست‌های Bot API از طریق
+#     telebot.apihelper.CUSTOM_REQUEST_SENDER
+#   - کلکتورهایی که در لحظه scrape، شمارنده‌های stats اجزای دیگر
+#     (intake، outbound، انبار، کش رندر و ...) را خروجی می‌دهند
+#   - پروفایلر نمونه‌بردار: پشته تمام نخ‌ها را با sys._current_frames
+#     هر چند میلی‌ثانیه می‌خواند و پشته‌های تجمیع‌شده را به فرمت
+#     folded (سازگار با flamegraph) برمی‌گرداند
+# =================================================================
+
+import collections
+import functools
+import math
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# مرزهای پیش‌فرض هیستوگرام تأخیر (ثانیه)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """شمارنده افزایشی با برچسب‌های اختیاری."""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}                       # tuple(label values) -> عدد
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """هیستوگرام با مرزهای ثابت؛ هر مشاهده فقط یک جستجوی دودویی و سه جمع است."""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}                       # tuple(label values) -> [شمارش هر بازه..., جمع, تعداد]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 3)
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def quantiles(self, qs, *labels) -> list:
+        """
+        تخمین چندک‌ها با درون‌یابی خطی داخل بازه‌ها؛ بدون labels، تمام
+        سری‌ها با هم جمع می‌شوند. برای مشاهدات بالاتر از آخرین مرز، همان
+        مرز برگردانده می‌شود.
+        """
+        with self._lock:
+            if labels:
+                entries = [self._values[labels]] if labels in self._values else []
+            else:
+                entries = list(self._values.values())
+            counts = [sum(column) for column in zip(*entries)] if entries else [0] * (len(self.buckets) + 3)
+        total = counts[-1]
+        results = []
+        for q in qs:
+            if not total:
+                results.append(0.0)
+                continue
+            rank, cumulative, lower = q * total, 0, 0.0
+            for bound, count in zip(self.buckets + (self.buckets[-1],), counts):
+                if count and cumulative + count >= rank:
+                    results.append(lower + (bound - lower) * (rank - cumulative) / count)
+                    break
+                cumulative += count
+                lower = bound
+            else:
+                results.append(self.buckets[-1])
+        return results
+
+    def collect(self):
+        with self._lock:
+            values = [(labels, list(entry)) for labels, entry in self._values.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        for labels, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{label_text} {entry[-1]}")
+        return lines
+
+
+class Registry:
+    """مجموعه متریک‌ها و کلکتورها؛ render() خروجی متنی Prometheus را می‌سازد."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        collector() باید لیستی از خانواده‌های (نام، نوع، توضیح، نمونه‌ها) برگرداند؛
+        هر نمونه (نام نمونه، ((برچسب، مقدار)، ...)، مقدار) است.
+        """
+        self._collectors.append(collector)
+
+    def add_stats(self, prefix: str, stats, gauges=(), documentation: str = ""):
+        """
+        یک دیکشنری stats (یا تابعی که آن را برمی‌گرداند) را به صورت متریک
+        خروجی می‌دهد: کلیدهای gauges به عنوان gauge و بقیه به عنوان counter.
+        """
+        def collect():
+            values = stats() if callable(stats) else stats
+            families = []
+            for key, value in list(values.items()):
+                if not isinstance(value, (int, float)):
+                    continue
+                kind, name = ('gauge', f"{prefix}_{key}") if key in gauges else ('counter', f"{prefix}_{key}_total")
+                families.append((name, kind, documentation or key, [(name, (), value)]))
+            return families
+        self.add_collector(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for sample_name, labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(*zip(*labels)) if labels else ''} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# رجیستری سراسری ربات
+registry = Registry()
+handler_seconds = registry.histogram('rpg_handler_seconds', 'Latency of bot handlers', ['handler'])
+handler_errors = registry.counter('rpg_handler_errors_total', 'Exceptions raised by bot handlers', ['handler'])
+api_seconds = registry.histogram('rpg_telegram_api_seconds', 'Latency of Telegram Bot API requests', ['method'])
+api_responses = registry.counter('rpg_telegram_api_responses_total', 'Telegram Bot API responses by status',
+                                 ['method', 'status'])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def timed(label):
+    """
+    تأخیر و خطاهای یک هندلر را ثبت می‌کند. label یک رشته ثابت یا تابعی
+    است که از آرگومان‌های هندلر برچسب می‌سازد (مثلاً شاخه callback).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            name = label(*args, **kwargs) if callable(label) else label
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                handler_errors.inc(name)
+                raise
+            finally:
+                handler_seconds.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+def install_api_timer():
+    """تمام درخواست‌های HTTP به Bot API را (از هر مسیری در telebot) زمان‌سنجی می‌کند."""
+    from telebot import apihelper
+
+    def send(method, url, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            response = apihelper._get_req_session().request(method, url, **kwargs)
+        except Exception as e:
+            api_responses.inc(api_method, type(e).__name__)
+            raise
+        finally:
+            api_seconds.observe(time.perf_counter() - started, api_method)
+        api_responses.inc(api_method, str(response.status_code))
+        return response
+
+    apihelper.CUSTOM_REQUEST_SENDER = send
+
+
+# --- پروفایلر نمونه‌بردار ---
+
+_profile_lock = threading.Lock()
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, max_depth: int = 64):
+    """
+    به مدت seconds، هر interval ثانیه پشته تمام نخ‌ها (به جز نخ خودش) را
+    نمونه‌برداری می‌کند. خروجی: (Counter پشته‌های folded، تعداد نمونه‌ها)
+    یا None اگر پروفایل دیگری در حال اجرا باشد.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = collections.Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                parts = []
+                while frame is not None and len(parts) < max_depth:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                parts.append(names.get(ident, str(ident)))
+                stacks[";".join(reversed(parts))] += 1
+            samples += 1
+            time.sleep(interval)
+        return stacks, samples
+    finally:
+        _profile_lock.release()
+
+
+def format_profile(stacks, samples: int, seconds: float) -> str:
+    """خروجی folded (هر خط: پشته;پشته;... تعداد) به همراه یک سربرگ خلاصه."""
+    lines = [f"# {samples} samples over {seconds:g}s; folded stacks (flamegraph.pl compatible)"]
+    lines.extend(f"{stack} {count}" for stack, count in stacks.most_common())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,397 @@
+# =================================================================
+#            outbound.py - Outbound Telegram API Scheduler
+#
+# تمام فراخوانی‌های خروجی ربات (ارسال پیام، ویرایش پیام و پاسخ به
+# دکمه‌ها) از این زمان‌بند عبور می‌کنند تا از محدودیت‌های نرخ
+# تلگرام عبور نکنیم و درخواست‌های بی‌فایده ارسال نشوند:
+#   - سطل توکن سراسری (~30 پیام در ثانیه) و سطل توکن برای هر چت
+#   - رعایت retry_after در پاسخ‌های 429 و ارسال مجدد
+#   - ادغام (Coalescing): اگر چند ویرایش برای یک message_id در صف
+#     باشد، فقط آخرین آن‌ها ارسال می‌شود
+#   - حذف ویرایش‌های بی‌اثر: اگر هش متن و کیبورد با آخرین نسخه
+#     ارسال‌شده یکسان باشد، ویرایش اصلاً ارسال نمی‌شود
+#
+# فراخوانی‌ها غیرمسدودکننده‌اند: هندلرها فقط عملیات را در صف
+# می‌گذارند و نخ‌های ارسال‌کننده آن‌ها را اجرا می‌کنند. پاسخ به
+# دکمه‌ها (answer_callback_query) پیام چت محسوب نمی‌شود و بدون
+# انتظار برای سطل‌ها، در اولویت ارسال می‌شود؛ اما وقتی پیام چتی آماده
+# ارسال است، پس از حداکثر urgent_share پاسخ پشت‌سرهم نوبت به آن
+# می‌رسد تا سیل کلیک‌ها ارسال پیام‌ها و ویرایش‌ها را گرسنه نگه ندارد.
+#
+# اجرای عملیات یا با نخ‌های ارسال‌کننده (start) است یا در runtime
+# ناهم‌زمان (async_runtime.py) با poll_op روی event loop؛ زمان‌بندی در
+# هر دو حالت یکسان است.
+# =================================================================
+
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+def _content_hash(text, reply_markup, parse_mode) -> int:
+    """هش محتوای یک پیام برای تشخیص ویرایش‌های تکراری."""
+    if reply_markup is not None and not isinstance(reply_markup, str):
+        reply_markup = reply_markup.to_json()
+    return hash((text, reply_markup, parse_mode))
+
+
+class OutboundOp:
+    """یک فراخوانی صف‌شده از API تلگرام."""
+
+    __slots__ = ('method', 'chat_id', 'args', 'kwargs', 'key', 'digest')
+
+    def __init__(self, method, chat_id, args=(), kwargs=None, key=None, digest=None):
+        self.method = method                    # نام متد telebot (مثلاً 'send_message')
+        self.chat_id = chat_id                  # None برای عملیات بدون چت (پاسخ به دکمه‌ها)
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.key = key                          # (chat_id, message_id) برای ویرایش‌ها
+        self.digest = digest                    # هش محتوای ویرایش
+
+
+class OutboundScheduler:
+    """زمان‌بند ارسال با محدودیت نرخ، ادغام ویرایش‌ها و حذف ویرایش‌های تکراری."""
+
+    def __init__(self, bot, global_rate: float = 30.0, per_chat_rate: float = 1.0, per_chat_burst: float = 3.0,
+                 senders: int = 4, max_tracked: int = 100_000, urgent_share: int = 3):
+        self.bot = bot
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.senders = senders
+        self.max_tracked = max_tracked          # سقف تعداد سطل‌های چت و هش‌های نگه‌داشته‌شده
+        self.urgent_share = urgent_share        # حداکثر پاسخ دکمه پشت‌سرهم وقتی پیام چتی آماده است
+
+        self._cond = threading.Condition()
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = OrderedDict()      # chat_id -> TokenBucket (LRU)
+        self._last_sent = OrderedDict()         # (chat_id, message_id) -> هش آخرین محتوای ارسال‌شده (LRU)
+        self._sending = {}                      # (chat_id, message_id) -> هش ویرایش در حال ارسال
+        self._suppressed = {}                   # (chat_id, message_id) -> آخرین ویرایش حذف‌شده به خاطر ویرایش در حال ارسال
+
+        self._urgent = deque()                  # عملیات بدون چت، بدون محدودیت سطل
+        self._chats = {}                        # chat_id -> deque از عملیات در انتظار
+        self._pending_edits = {}                # (chat_id, message_id) -> ویرایش در انتظار
+        self._ready = deque()                   # چت‌های آماده ارسال (نوبت چرخشی)
+        self._delayed = []                      # هیپ (زمان آماده شدن, chat_id) برای چت‌های منتظر توکن
+        self._scheduled = set()                 # چت‌هایی که در _ready یا _delayed حضور دارند
+        self._busy = set()                      # چت‌هایی که یک درخواست در حال ارسال دارند
+        self._urgent_streak = 0                 # پاسخ‌های دکمه ارسال‌شده از آخرین پیام چت
+
+        self._threads = []
+        self._stopping = False
+        self._stop_deadline = 0.0
+        # اختیاری: پس از هر تغییر صف فراخوانی می‌شود (runtime ناهم‌زمان با آن
+        # event loop را بیدار می‌کند؛ در حالت نخ‌ها همان Condition کافی است)
+        self.wakeup = None
+
+        # throttled: دفعاتی که ارسال یک چت به خاطر سطل توکن به تعویق افتاد
+        # rate_limited: پاسخ‌های 429 دریافتی از تلگرام
+        self.stats = {'queued': 0, 'sent': 0, 'coalesced': 0, 'suppressed': 0, 'throttled': 0,
+                      'rate_limited': 0, 'errors': 0}
+
+    # --- رابط عمومی (هم‌نام با متدهای telebot) ---
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._enqueue(OutboundOp('send_message', chat_id, (chat_id, text), kwargs))
+
+    def send_many(self, messages):
+        """لیستی از (chat_id, text, kwargs) را با یک بار گرفتن قفل در صف قرار می‌دهد."""
+        with self._cond:
+            for chat_id, text, kwargs in messages:
+                self._enqueue_locked(OutboundOp('send_message', chat_id, (chat_id, text), kwargs))
+
+    def reply_to(self, message, text, **kwargs):
+        self._enqueue(OutboundOp('reply_to', message.chat.id, (message, text), kwargs))
+
+    def answer_callback_query(self, callback_query_id, text=None, show_alert=None):
+        self._enqueue(OutboundOp('answer_callback_query', None, (callback_query_id, text, show_alert)))
+
+    def edit_message_text(self, text, chat_id, message_id, reply_markup=None, parse_mode=None):
+        key = (chat_id, message_id)
+        digest = _content_hash(text, reply_markup, parse_mode)
+        kwargs = {'text': text, 'chat_id': chat_id, 'message_id': message_id,
+                  'reply_markup': reply_markup, 'parse_mode': parse_mode}
+        with self._cond:
+            pending = self._pending_edits.get(key)
+            if pending is not None:
+                # ویرایش قبلی هنوز ارسال نشده: فقط محتوای آن را با نسخه جدید جایگزین کن
+                pending.kwargs = kwargs
+                pending.digest = digest
+                self.stats['coalesced'] += 1
+                return
+            self._suppressed.pop(key, None)
+            op = OutboundOp('edit_message_text', chat_id, (), kwargs, key=key, digest=digest)
+            # مقایسه با ویرایشی که الان در حال ارسال است (اگر باشد)، نه آخرین ارسال
+            # کامل‌شده؛ وگرنه بازگشت به محتوای قبلی (A -> B -> A) حذف می‌شد و پیام روی B می‌ماند
+            if self._sending.get(key, self._last_sent.get(key)) == digest:
+                if key in self._sending:
+                    # اگر ارسال در حال انجام شکست بخورد، _finish این ویرایش را دوباره صف‌بندی می‌کند
+                    self._suppressed[key] = op
+                self.stats['suppressed'] += 1
+                return
+            self._pending_edits[key] = op
+            self._enqueue_locked(op)
+
+    # --- صف‌بندی ---
+
+    def _enqueue(self, op: OutboundOp):
+        with self._cond:
+            self._enqueue_locked(op)
+
+    def _enqueue_locked(self, op: OutboundOp):
+        if op.chat_id is None:
+            self._urgent.append(op)
+        else:
+            chat_queue = self._chats.get(op.chat_id)
+            if chat_queue is None:
+                chat_queue = self._chats[op.chat_id] = deque()
+            chat_queue.append(op)
+            self._schedule(op.chat_id)
+        self.stats['queued'] += 1
+        self._cond.notify()
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def _schedule(self, chat_id):
+        if chat_id not in self._busy and chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._ready.append(chat_id)
+
+    def _chat_bucket(self, chat_id, now) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst, now)
+            if len(self._chat_buckets) > self.max_tracked:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _remember_sent(self, key, digest):
+        self._last_sent[key] = digest
+        self._last_sent.move_to_end(key)
+        if len(self._last_sent) > self.max_tracked:
+            self._last_sent.popitem(last=False)
+
+    def _has_pending(self) -> bool:
+        return bool(self._urgent or self._chats or self._busy)
+
+    def next_op(self):
+        """
+        تا زمانی که عملیاتی مجاز به ارسال شود صبر می‌کند و آن را برمی‌گرداند.
+        پس از stop و تخلیه صف (یا پایان مهلت) None برمی‌گرداند.
+        """
+        with self._cond:
+            while True:
+                op, wait, finished = self._poll_locked()
+                if op is not None or finished:
+                    return op
+                self._cond.wait(wait)
+
+    def poll_op(self):
+        """
+        نسخه غیرمسدودکننده next_op برای اجرا روی event loop. خروجی (op, wait, finished):
+        عملیات آماده ارسال، یا None به همراه ثانیه‌های تا بررسی بعدی (None یعنی
+        تا بیدارباش بعدی)؛ finished پس از stop و تخلیه صف True است.
+        """
+        with self._cond:
+            return self._poll_locked()
+
+    def _poll_locked(self):
+        now = time.monotonic()
+        if self._stopping and (now >= self._stop_deadline or not self._has_pending()):
+            return None, None, True
+
+        urgent_ready = self._urgent and self._global.blocked_until <= now
+        if urgent_ready and self._urgent_streak < self.urgent_share:
+            self._urgent_streak += 1
+            return self._urgent.popleft(), None, False
+
+        while self._delayed and self._delayed[0][0] <= now:
+            self._ready.append(heapq.heappop(self._delayed)[1])
+
+        wait = None
+        if self._ready:
+            global_wait = self._global.delay(now)
+            if global_wait > 0:
+                wait = global_wait
+            else:
+                op = self._take_ready(now)
+                if op is not None:
+                    self._global.try_take(now)
+                    self._urgent_streak = 0
+                    return op, None, False
+                # تمام چت‌های آماده به هیپ انتظار رفتند؛ یک بار دیگر با _ready خالی
+                return self._poll_locked()
+        if urgent_ready:
+            # هیچ پیام چتی مجاز به ارسال نیست؛ سهم پاسخ‌ها محدود نمی‌شود
+            return self._urgent.popleft(), None, False
+        if self._delayed:
+            until_next = self._delayed[0][0] - now
+            wait = until_next if wait is None else min(wait, until_next)
+        if self._urgent:
+            until_unblocked = self._global.blocked_until - now
+            wait = until_unblocked if wait is None else min(wait, until_unblocked)
+        if self._stopping:
+            until_deadline = self._stop_deadline - now
+            wait = until_deadline if wait is None else min(wait, until_deadline)
+        return None, wait, False
+
+    def _take_ready(self, now):
+        """اولین عملیات مجاز از چت‌های آماده را برمی‌دارد؛ چت‌های بدون توکن به هیپ انتظار می‌روند."""
+        while self._ready:
+            chat_id = self._ready.popleft()
+            chat_queue = self._chats[chat_id]
+
+            # ویرایش‌هایی که محتوایشان با آخرین ارسال یکسان شده، حذف می‌شوند
+            while chat_queue and chat_queue[0].key is not None \
+                    and self._last_sent.get(chat_queue[0].key) == chat_queue[0].digest:
+                del self._pending_edits[chat_queue.popleft().key]
+                self.stats['suppressed'] += 1
+            if not chat_queue:
+                del self._chats[chat_id]
+                self._scheduled.discard(chat_id)
+                continue
+
+            bucket = self._chat_bucket(chat_id, now)
+            delay = bucket.delay(now)
+            if delay > 0:
+                heapq.heappush(self._delayed, (now + delay, chat_id))
+                self.stats['throttled'] += 1
+                continue
+
+            bucket.try_take(now)
+            op = chat_queue.popleft()
+            if not chat_queue:
+                del self._chats[chat_id]
+            if op.key is not None:
+                del self._pending_edits[op.key]
+                self._sending[op.key] = op.digest
+            self._scheduled.discard(chat_id)
+            self._busy.add(chat_id)
+            return op
+        return None
+
+    def _finish(self, op: OutboundOp, retry_after: float = None, failed: bool = False):
+        """
+        پایان ارسال یک عملیات را ثبت می‌کند و در صورت 429 آن را دوباره صف‌بندی می‌کند.
+        failed: ارسال با خطایی غیر از 429 شکست خورده و محتوای پیام تغییر نکرده است.
+        """
+        with self._cond:
+            now = time.monotonic()
+            suppressed = None
+            if op.key is not None:
+                self._sending.pop(op.key, None)
+                suppressed = self._suppressed.pop(op.key, None)
+            if retry_after is not None:
+                until = now + retry_after
+                if op.chat_id is None:
+                    self._global.pause(until)
+                    self._urgent.appendleft(op)
+                else:
+                    self._chat_bucket(op.chat_id, now).pause(until)
+                    # اگر در این فاصله ویرایش جدیدتری برای همین پیام آمده، نسخه قدیمی کنار گذاشته می‌شود
+                    if op.key is None or op.key not in self._pending_edits:
+                        if op.key is not None:
+                            self._pending_edits[op.key] = op
+                        chat_queue = self._chats.get(op.chat_id)
+                        if chat_queue is None:
+                            chat_queue = self._chats[op.chat_id] = deque()
+                        chat_queue.appendleft(op)
+            elif failed:
+                # ویرایشی که به خاطر همین ارسال حذف شده بود، حالا باید خودش ارسال شود
+                if suppressed is not None and op.key not in self._pending_edits:
+                    self._pending_edits[op.key] = suppressed
+                    chat_queue = self._chats.get(op.chat_id)
+                    if chat_queue is None:
+                        chat_queue = self._chats[op.chat_id] = deque()
+                    chat_queue.append(suppressed)
+                    self.stats['queued'] += 1
+            elif op.key is not None:
+                self._remember_sent(op.key, op.digest)
+
+            if op.chat_id is not None:
+                self._busy.discard(op.chat_id)
+                if self._chats.get(op.chat_id):
+                    self._schedule(op.chat_id)
+            self._cond.notify_all()
+            if self.wakeup is not None:
+                self.wakeup()
+
+    # --- اجرای عملیات ---
+
+    def execute(self, op: OutboundOp):
+        """یک عملیات را به صورت هم‌زمان از طریق telebot ارسال می‌کند."""
+        try:
+            getattr(self.bot, op.method)(*op.args, **op.kwargs)
+        except Exception as e:
+            self.complete(op, e)
+        else:
+            self.complete(op)
+
+    def complete(self, op: OutboundOp, error: Exception = None):
+        """
+        نتیجه ارسال یک عملیات را ثبت می‌کند (مشترک بین نخ‌های ارسال و runtime
+        ناهم‌زمان). خطاهای API نسخه asyncio در telebot کلاس جداگانه‌ای دارند،
+        پس به جای isinstance، error_code بررسی می‌شود.
+        """
+        retry_after = None
+        failed = False
+        if error is None:
+            self.stats['sent'] += 1
+        elif getattr(error, 'error_code', None) is not None:
+            if error.error_code == 429:
+                retry_after = (error.result_json.get('parameters') or {}).get('retry_after', 1)
+                self.stats['rate_limited'] += 1
+            elif 'message is not modified' in error.description:
+                self.stats['suppressed'] += 1
+            else:
+                failed = True
+                self.stats['errors'] += 1
+                logger.warning("Telegram API call %s failed: %s", op.method, error)
+        else:
+            failed = True
+            self.stats['errors'] += 1
+            logger.error("Telegram API call %s failed", op.method, exc_info=error)
+        self._finish(op, retry_after, failed)
+
+    def _sender(self):
+        while True:
+            op = self.next_op()
+            if op is None:
+                return
+            self.execute(op)
+
+    def start(self):
+        """نخ‌های ارسال‌کننده را راه‌اندازی می‌کند (فراخوانی مجدد بی‌اثر است)."""
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.senders):
+                thread = threading.Thread(target=self._sender, name=f"outbound-sender-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """حداکثر timeout ثانیه برای ارسال عملیات باقی‌مانده صبر کرده و نخ‌ها را متوقف می‌کند."""
+        with self._cond:
+            threads, self._threads = self._threads, []
+            self._stopping = True
+            self._stop_deadline = time.monotonic() + timeout
+            self._cond.notify_all()
+            if self.wakeup is not None:
+                self.wakeup()
+        for thread in threads:
+            thread.join()
+
+    def depth(self) -> int:
+        """تعداد عملیات در انتظار ارسال."""
+        with self._cond:
+            return len(self._urgent) + sum(len(q) for q in self._chats.values())
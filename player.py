@@ -8,62 +8,389 @@
 
 # --- وارد کردن داده‌های ثابت بازی ---
 # ما به این داده‌ها برای انجام محاسبات داخلی کلاس نیاز داریم
-from gamedata import TITLES, CULTIVATION_PATHS, game_world
+import logging
+import sys
+from array import array
+from collections.abc import MutableMapping, MutableSequence, Sequence
+
+import gametables
+from world import game_world
+from leaderboard import leaderboard
+
+logger = logging.getLogger(__name__)
+
+# --- جداول شناسه‌های فشرده ---
+# برای کاهش مصرف حافظه در مقیاس میلیون‌ها بازیکن، به جای نگه‌داشتن رشته‌ها
+# و لیست‌ها در هر شیء، فقط شناسه‌های عددی کوچک یا بیت‌ست‌ها ذخیره می‌شوند.
+# نگاشت شناسه‌ها (مسیر، مهارت، کوئست) در gametables.tables است و با
+# بارگذاری مجدد داده‌ها فقط افزایش می‌یابد، پس شناسه‌های ذخیره‌شده معتبر می‌مانند.
+# ترتیب آمار با بارگذاری مجدد تغییر نمی‌کند.
+STAT_NAMES = gametables.tables.stat_names
+STAT_INDEX = gametables.tables.stat_index
+
+# مقادیر اولیه آمار به ترتیب STAT_NAMES
+DEFAULT_STATS = {
+    'strength': 5,      # قدرت
+    'agility': 5,       # چابکی
+    'stamina': 100,     # استقامت
+    'intelligence': 5   # هوش
+}
+
+
+def _bits_to_ids(bits: int, ids: tuple) -> list:
+    return [ids[i] for i in range(bits.bit_length()) if bits >> i & 1]
+
+def _ids_to_bits(items, bit_table: dict) -> int:
+    """برای شناسه ناشناخته KeyError می‌دهد تا نوشتن اشتباه بی‌صدا گم نشود."""
+    bits = 0
+    for item in items:
+        bits |= bit_table[item]
+    return bits
+
+def _saved_ids_to_bits(items, bit_table: dict) -> int:
+    """
+    نسخه مخصوص from_record: شناسه‌هایی که در جدول نیستند (کوئست یا مهارتی که
+    پس از ذخیره از gamedata حذف شده) با یک هشدار کنار گذاشته می‌شوند تا
+    بارگذاری بازیکن شکست نخورد.
+    """
+    bits = 0
+    for item in items:
+        bit = bit_table.get(item)
+        if bit is None:
+            logger.warning("Dropping unknown id %r (no longer in game data)", item)
+            continue
+        bits |= bit
+    return bits
+
+
+class PlayerStats(MutableMapping):
+    """
+    نمای دیکشنری‌مانند روی آرایه آمار بازیکن؛
+    تا player.stats['strength'] مثل قبل کار کند (و نوشتن در آن ذخیره شود).
+    """
+    __slots__ = ('_player',)
+
+    def __init__(self, player: 'Player'):
+        self._player = player
+
+    def __getitem__(self, name):
+        return self._player._stats[STAT_INDEX[name]]
+
+    def __setitem__(self, name, value):
+        self._player._stats[STAT_INDEX[name]] = value
+        self._player._touch()
+
+    def __delitem__(self, name):
+        raise TypeError("Player stats cannot be removed")
+
+    def __iter__(self):
+        return iter(STAT_NAMES)
+
+    def __len__(self):
+        return len(STAT_NAMES)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PlayerIdList(MutableSequence):
+    """
+    نمای لیست‌مانند روی یک بیت‌ست بازیکن (مهارت‌ها یا کوئست‌های تمام‌شده)؛
+    تا player.learned_skills.append(...) مثل قبل کار کند. هر تغییر به
+    بیت‌ست نوشته و ذخیره می‌شود. ترتیب، ترتیب شناسه‌ها در gametables است،
+    شناسه تکراری فقط یک بار نگه داشته می‌شود و نوشتن شناسه ناشناخته KeyError می‌دهد.
+    """
+    __slots__ = ('_player', '_field', '_kind')
+
+    def __init__(self, player: 'Player', field: str, kind: str):
+        self._player = player
+        self._field = field                     # نام بیت‌ست در Player (مثلاً '_skill_bits')
+        self._kind = kind                       # 'skill' یا 'quest' (tables.<kind>_ids و <kind>_bits)
+
+    def _list(self) -> list:
+        return _bits_to_ids(getattr(self._player, self._field), getattr(gametables.tables, self._kind + '_ids'))
+
+    def _assign(self, items):
+        setattr(self._player, self._field, _ids_to_bits(items, getattr(gametables.tables, self._kind + '_bits')))
+        self._player._touch()
+
+    def __getitem__(self, index):
+        return self._list()[index]
+
+    def __setitem__(self, index, value):
+        items = self._list()
+        items[index] = value
+        self._assign(items)
+
+    def __delitem__(self, index):
+        items = self._list()
+        del items[index]
+        self._assign(items)
+
+    def insert(self, index, value):
+        items = self._list()
+        items.insert(index, value)
+        self._assign(items)
+
+    def __len__(self):
+        return bin(getattr(self._player, self._field)).count('1')
+
+    def __contains__(self, item):
+        bit = getattr(gametables.tables, self._kind + '_bits').get(item)
+        return bit is not None and bool(getattr(self._player, self._field) & bit)
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return self._list() == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self._list())
+
 
 class Player:
     """
     این کلاس، یک بازیکن در دنیای بازی را با تمام ویژگی‌هایش نشان می‌دهد.
     """
+    # استفاده از __slots__ دیکشنری __dict__ هر شیء را حذف می‌کند
+    __slots__ = ('user_id', 'telegram_name', '_in_game_name', '_path_id', '_rank_index', '_xp',
+                 '_x', '_y', '_stats', '_attribute_points', '_gold', '_skill_bits', '_active_quests',
+                 '_completed_bits', '_store', 'version')
+
     def __init__(self, user_id: int, telegram_name: str, path: str):
         # --- اطلاعات هویتی ---
         self.user_id = user_id                  # شناسه عددی تلگرام کاربر
         self.telegram_name = telegram_name      # نام کاربر در تلگرام
-        self.in_game_name = telegram_name       # نام شخصیت در بازی (قابل تغییر با /setname)
+        self._in_game_name = None               # نام شخصیت در بازی؛ None یعنی همان نام تلگرام (قابل تغییر با /setname)
 
         # --- سیستم پیشرفت (Progression) ---
-        self.path = path                        # مسیر انتخابی: "تهذیب" یا "مانا"
-        self.rank_index = 0                     # ایندکس رتبه فعلی در لیست رتبه‌ها (شروع از 0)
-        self.xp = 0                             # میزان تجربه فعلی
+        self._path_id = gametables.tables.path_ids[path]  # شناسه مسیر انتخابی: "تهذیب" یا "مانا"
+        self._rank_index = 0                    # ایندکس رتبه فعلی در لیست رتبه‌ها (شروع از 0)
+        self._xp = 0                            # میزان تجربه فعلی
 
         # --- موقعیت مکانی ---
-        self.x = 0                              # مختصات X روی نقشه
-        self.y = 0                              # مختصات Y روی نقشه
+        self._x = 0                             # مختصات X روی نقشه
+        self._y = 0                             # مختصات Y روی نقشه
 
         # --- آمار و ویژگی‌ها (Attributes/Stats) ---
-        self.stats = {
-            'strength': 5,      # قدرت
-            'agility': 5,       # چابکی
-            'stamina': 100,     # استقامت
-            'intelligence': 5   # هوش
-        }
-        self.attribute_points = 0 # امتیازاتی که پس از صعود به رتبه بالاتر برای تخصیص داده می‌شود
+        self._stats = array('i', (DEFAULT_STATS[name] for name in STAT_NAMES))
+        self._attribute_points = 0 # امتیازاتی که پس از صعود به رتبه بالاتر برای تخصیص داده می‌شود
+        self._gold = 0                          # طلا (جایزه کوئست‌ها)
 
         # --- مهارت‌ها و کوئست‌ها ---
-        self.learned_skills = []                # لیست مهارت‌های یاد گرفته شده
-        self.active_quests = {}                 # دیکشنری کوئست‌های فعال
-        self.completed_quests = []              # لیست کوئست‌های تمام شده
+        self._skill_bits = 0                    # بیت‌ست مهارت‌های یاد گرفته شده (بر اساس tables.skill_ids)
+        self._active_quests = None              # دیکشنری کوئست‌های فعال (شناسه -> پیشرفت)؛ تا اولین استفاده ساخته نمی‌شود
+        self._completed_bits = 0                # بیت‌ست کوئست‌های تمام شده (بر اساس tables.quest_ids)
+
+        # --- ماندگاری و کش ---
+        self._store = None                      # انبار ذخیره‌سازی (storage.PlayerStore) که بازیکن به آن تعلق دارد
+        self.version = 0                        # شمارنده نسخه؛ با هر تغییر وضعیت یک واحد افزایش می‌یابد
+
+    # --- ویژگی‌های عمومی روی نمایش فشرده ---
+    # هر نوشتن عمومی از _touch می‌گذرد تا ذخیره شود و متن‌های کش‌شده نامعتبر شوند؛
+    # متدهای داخلی (add_xp، move و ...) مستقیم روی فیلدهای خصوصی می‌نویسند تا
+    # چند تغییر هم‌زمان فقط یک بار علامت‌گذاری شوند.
+
+    @property
+    def in_game_name(self) -> str:
+        return self._in_game_name if self._in_game_name is not None else self.telegram_name
+
+    @in_game_name.setter
+    def in_game_name(self, value: str):
+        self._in_game_name = None if value == self.telegram_name else value
+        self._touch()
+
+    @property
+    def path(self) -> str:
+        return gametables.tables.path_names[self._path_id]
+
+    @path.setter
+    def path(self, value: str):
+        old_path = self.path
+        self._path_id = gametables.tables.path_ids[value]
+        if self._store is not None and value != old_path:
+            leaderboard.remove(old_path, self.user_id, self._rank_index, self._xp)
+            leaderboard.place(value, self.user_id, self._rank_index, self._xp)
+        self._touch()
+
+    @property
+    def rank_index(self) -> int:
+        return self._rank_index
+
+    @rank_index.setter
+    def rank_index(self, value: int):
+        old_rank, self._rank_index = self._rank_index, value
+        self._rerank(old_rank, self._xp)
+        self._touch()
+
+    @property
+    def xp(self) -> int:
+        return self._xp
+
+    @xp.setter
+    def xp(self, value: int):
+        old_xp, self._xp = self._xp, value
+        self._rerank(self._rank_index, old_xp)
+        self._touch()
+
+    @property
+    def x(self) -> int:
+        return self._x
+
+    @x.setter
+    def x(self, value: int):
+        self._x = value
+        self._relocate()
+        self._touch()
+
+    @property
+    def y(self) -> int:
+        return self._y
+
+    @y.setter
+    def y(self, value: int):
+        self._y = value
+        self._relocate()
+        self._touch()
+
+    @property
+    def attribute_points(self) -> int:
+        return self._attribute_points
+
+    @attribute_points.setter
+    def attribute_points(self, value: int):
+        self._attribute_points = value
+        self._touch()
+
+    @property
+    def gold(self) -> int:
+        return self._gold
+
+    @gold.setter
+    def gold(self, value: int):
+        self._gold = value
+        self._touch()
+
+    @property
+    def stats(self) -> PlayerStats:
+        return PlayerStats(self)
+
+    @property
+    def learned_skills(self) -> PlayerIdList:
+        return PlayerIdList(self, '_skill_bits', 'skill')
+
+    @learned_skills.setter
+    def learned_skills(self, skills):
+        self._skill_bits = _ids_to_bits(skills, gametables.tables.skill_bits)
+        self._touch()
+
+    @property
+    def active_quests(self) -> dict:
+        if self._active_quests is None:
+            self._active_quests = {}
+        return self._active_quests
+
+    @active_quests.setter
+    def active_quests(self, quests: dict):
+        self._active_quests = quests or None
+        self._touch()
+
+    @property
+    def completed_quests(self) -> PlayerIdList:
+        return PlayerIdList(self, '_completed_bits', 'quest')
+
+    @completed_quests.setter
+    def completed_quests(self, quests):
+        self._completed_bits = _ids_to_bits(quests, gametables.tables.quest_bits)
+        self._touch()
+
+    def has_skill(self, skill_id: str) -> bool:
+        return bool(self._skill_bits & gametables.tables.skill_bits.get(skill_id, 0))
+
+    def has_completed(self, quest_id: str) -> bool:
+        return bool(self._completed_bits & gametables.tables.quest_bits.get(quest_id, 0))
+
+    # --- متدهای مربوط به ماندگاری ---
+
+    def _attach(self, store):
+        """بازیکن را به انبار ذخیره‌سازی متصل و روی نقشه (ایندکس مکانی) و جدول رده‌بندی ثبت می‌کند."""
+        self._store = store
+        game_world.occupancy.place(self.user_id, (self._x, self._y))
+        leaderboard.place(self.path, self.user_id, self._rank_index, self._xp)
+
+    def _touch(self):
+        """
+        نسخه بازیکن را افزایش می‌دهد (تا متن‌های کش‌شده نامعتبر شوند) و
+        بازیکن را برای ذخیره در نوبت بعدی نوشتن دسته‌ای علامت‌گذاری می‌کند.
+        """
+        self.version += 1
+        if self._store is not None:
+            self._store.mark_dirty(self)
+
+    def _rerank(self, old_rank: int, old_xp: int):
+        """جایگاه بازیکن متصل به انبار را پس از تغییر رتبه یا XP در جدول رده‌بندی به‌روز می‌کند."""
+        if self._store is not None:
+            leaderboard.move(self.path, self.user_id, old_rank, old_xp, self._rank_index, self._xp)
+
+    def _relocate(self):
+        """موقعیت بازیکن متصل به انبار را در ایندکس مکانی نقشه به‌روز می‌کند."""
+        if self._store is not None:
+            game_world.occupancy.place(self.user_id, (self._x, self._y))
+
+    def to_record(self) -> dict:
+        """وضعیت بازیکن را به یک دیکشنری ساده و قابل سریال‌سازی تبدیل می‌کند."""
+        return {
+            'user_id': self.user_id,
+            'telegram_name': self.telegram_name,
+            'in_game_name': self.in_game_name,
+            'path': self.path,
+            'rank_index': self.rank_index,
+            'xp': self.xp,
+            'x': self.x,
+            'y': self.y,
+            'stats': dict(zip(STAT_NAMES, self._stats)),
+            'attribute_points': self.attribute_points,
+            'gold': self.gold,
+            'learned_skills': _bits_to_ids(self._skill_bits, gametables.tables.skill_ids),
+            'active_quests': dict(self._active_quests or {}),
+            'completed_quests': _bits_to_ids(self._completed_bits, gametables.tables.quest_ids),
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'Player':
+        """یک بازیکن را از روی دیکشنری تولید شده توسط to_record بازسازی می‌کند."""
+        player = cls(user_id=record['user_id'], telegram_name=record['telegram_name'], path=record['path'])
+        # مستقیم روی فیلدهای خصوصی، تا بازسازی بازیکن او را تغییریافته علامت نزند
+        in_game_name = record['in_game_name']
+        player._in_game_name = None if in_game_name == player.telegram_name else in_game_name
+        player._rank_index = record['rank_index']
+        player._xp = record['xp']
+        player._x, player._y = record['x'], record['y']
+        for name, value in record['stats'].items():
+            player._stats[STAT_INDEX[name]] = value
+        player._attribute_points = record['attribute_points']
+        player._gold = record.get('gold', 0)
+        player._skill_bits = _saved_ids_to_bits(record['learned_skills'], gametables.tables.skill_bits)
+        player._active_quests = dict(record['active_quests']) or None
+        player._completed_bits = _saved_ids_to_bits(record['completed_quests'], gametables.tables.quest_bits)
+        return player
 
     # --- متدهای مربوط به پیشرفت و رتبه ---
 
     def get_rank_info(self) -> dict:
-        """اطلاعات رتبه فعلی بازیکن را از gamedata استخراج می‌کند."""
-        try:
-            return CULTIVATION_PATHS[self.path][self.rank_index]
-        except (KeyError, IndexError):
-            # اگر بازیکن به بالاترین رتبه رسیده باشد
-            return {"rank_name": "افسانه زنده", "xp_needed": float('inf')}
+        """اطلاعات رتبه فعلی بازیکن (پس از آخرین رتبه: رتبه نگهبان «افسانه زنده»)."""
+        return gametables.tables.rank_info(self._path_id, self.rank_index)
 
     def get_title(self) -> str:
-        """لقب مناسب بازیکن را بر اساس رتبه او پیدا می‌کند."""
-        current_title = "بی‌لقب"
-        for rank_req, title in TITLES.items():
-            if self.rank_index >= rank_req:
-                current_title = title
-        return current_title
+        """لقب مناسب بازیکن بر اساس رتبه او (از جدول از پیش محاسبه‌شده)."""
+        return gametables.tables.title(self.rank_index)
 
     def add_xp(self, amount: int):
         """مقدار مشخصی تجربه به بازیکن اضافه می‌کند."""
-        self.xp += amount
+        old_xp = self._xp
+        self._xp += amount
+        self._rerank(self._rank_index, old_xp)
+        self._touch()
 
     def can_breakthrough(self) -> bool:
         """بررسی می‌کند که آیا XP بازیکن برای صعود به رتبه بعدی کافی است یا خیر."""
@@ -73,14 +400,45 @@ class Player:
     def perform_breakthrough(self) -> str:
         """عملیات صعود به رتبه بعدی را انجام می‌دهد."""
         if self.can_breakthrough():
-            self.rank_index += 1
-            self.xp = 0  # ریست کردن تجربه پس از صعود
-            self.attribute_points += 1 # جایزه: یک امتیاز ویژگی
-            
+            old_rank, old_xp = self._rank_index, self._xp
+            self._rank_index += 1
+            self._xp = 0  # ریست کردن تجربه پس از صعود
+            self._attribute_points += 1 # جایزه: یک امتیاز ویژگی
+            self._rerank(old_rank, old_xp)
+            self._touch()
+
             new_rank_info = self.get_rank_info()
             return f"شما با موفقیت به رتبه {new_rank_info['rank_name']} صعود کردید!"
         return "شرایط لازم برای صعود را ندارید."
 
+    def grant_rewards(self, xp: int = 0, gold: int = 0, attribute_points: int = 0):
+        """جوایز (معمولاً مجموع چند کوئست) را یکجا و با یک بار علامت‌گذاری تغییر اعمال می‌کند."""
+        old_xp = self._xp
+        self._xp += xp
+        self._gold += gold
+        self._attribute_points += attribute_points
+        if xp:
+            self._rerank(self._rank_index, old_xp)
+        self._touch()
+
+    # --- متدهای مربوط به کوئست‌ها (منطق پیشرفت در quests.py) ---
+
+    def start_quest(self, quest_id: str):
+        self.active_quests[quest_id] = 0
+        self._touch()
+
+    def set_quest_progress(self, quest_id: str, progress: int):
+        self._active_quests[quest_id] = progress
+        self._touch()
+
+    def finish_quest(self, quest_id: str):
+        """کوئست را از فهرست فعال خارج و به عنوان انجام شده ثبت می‌کند."""
+        del self._active_quests[quest_id]
+        if not self._active_quests:
+            self._active_quests = None
+        self._completed_bits |= gametables.tables.quest_bits[quest_id]
+        self._touch()
+
     # --- متدهای مربوط به اقدامات بازیکن ---
 
     def set_name(self, new_name: str):
@@ -89,7 +447,7 @@ class Player:
 
     def move(self, direction: str) -> bool:
         """بازیکن را در جهت مشخص شده حرکت می‌دهد و موفقیت‌آمیز بودن حرکت را برمی‌گرداند."""
-        new_x, new_y = self.x, self.y
+        new_x, new_y = self._x, self._y
 
         if direction == "up": new_y += 1
         elif direction == "down": new_y -= 1
@@ -98,19 +456,40 @@ class Player:
 
         # بررسی اینکه آیا مختصات جدید در نقشه بازی معتبر است یا خیر
         if (new_x, new_y) in game_world:
-            self.x, self.y = new_x, new_y
+            self._x, self._y = new_x, new_y
+            self._relocate()
+            self._touch()
             return True # حرکت موفقیت‌آمیز بود
         return False # حرکت ناموفق بود
 
     def get_status_text(self) -> str:
         """یک متن کامل و فرمت‌شده از وضعیت فعلی بازیکن را تولید می‌کند."""
+        return self.get_status_body() + self.get_leaderboard_text()
+
+    def get_leaderboard_text(self) -> str:
+        """
+        خط جایگاه بازیکن در جدول رده‌بندی مسیرش. با حرکت بقیه بازیکنان
+        تغییر می‌کند، پس جدا از بدنه وضعیت (که با version کش می‌شود) ساخته می‌شود.
+        """
+        if not leaderboard.ready:
+            return "\n🏆 **جایگاه شما:** جدول رده‌بندی در حال آماده‌سازی است..."
+        result = leaderboard.position(self.path, self.user_id, self.rank_index, self.xp)
+        if result is None:
+            return ""
+        position, total = result
+        top_percent = 100.0 * position / total
+        return f"\n🏆 **جایگاه شما:** {position:,} از {total:,} در مسیر {self.path} (برترین {top_percent:.1f}٪)"
+
+    def get_status_body(self) -> str:
+        """بخش ثابت متن وضعیت که فقط با تغییر خود بازیکن عوض می‌شود."""
         rank_info = self.get_rank_info()
         status_message = (
             f"👤 **نام:** {self.in_game_name}\n"
             f"🎖 **لقب:** {self.get_title()}\n\n"
             f"⚔️ **مسیر:** {self.path}\n"
             f"💠 **رتبه:** {rank_info['rank_name']}\n"
-            f"✨ **تجربه (XP):** {self.xp} / {rank_info['xp_needed']}\n\n"
+            f"✨ **تجربه (XP):** {self.xp} / {rank_info['xp_needed']}\n"
+            f"💰 **طلا:** {self.gold}\n\n"
             f"**----- آمار -----**\n"
             f"💪 **قدرت:** {self.stats['strength']}\n"
             f"🏃‍♂️ **چابکی:** {self.stats['agility']}\n"
@@ -122,3 +501,24 @@ class Player:
         
         return status_message
 
+
+
+# --- بنچمارک حافظه ---
+# اجرا: python player.py [تعداد بازیکنان]
+
+def _benchmark_memory(n: int):
+    import tracemalloc
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    players = {user_id: Player(user_id=1_000_000_000 + user_id, telegram_name=f"user{user_id}", path=gametables.tables.path_names[user_id % 2])
+               for user_id in range(n)}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{n:,} players: {(after - before) / 2**20:,.1f} MiB total, {(after - before) / n:,.0f} bytes/player "
+          f"(including the players dict and telegram_name strings)")
+    return players
+
+
+if __name__ == "__main__":
+    _benchmark_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,256 @@
+# =================================================================
+#            quests.py - The Event-Indexed Quest Engine
+#
+# این فایل پیشرفت کوئست‌ها (gamedata.QUESTS) را مدیریت می‌کند.
+# پیشرفت کاملاً رویدادمحور است: هر رویداد بازی (مثلاً «شکار گرگ در
+# (1, 0)» یا «پیدا کردن rare_herb») از طریق ایندکس‌هایی که یک بار از
+# تعریف کوئست‌ها ساخته می‌شوند، فقط به کوئست‌هایی می‌رسد که واقعاً
+# می‌توانند تحت تأثیر آن باشند:
+#   - ایندکس (نوع هدف، هدف، مکان) -> کوئست‌ها؛ کوئست‌های بدون مکان
+#     زیر مکان None ثبت می‌شوند و در همه جا تطبیق می‌خورند
+#   - ایندکس مکان -> رویدادهای قابل وقوع در آن خانه (برای «جستجوی اطراف»)
+#   - هیچ حلقه‌ای روی تمام کوئست‌های فعال تمام بازیکنان وجود ندارد
+#
+# جوایز (XP، طلا و امتیاز ویژگی) کوئست‌هایی که در یک دسته رویداد
+# تمام می‌شوند، برای هر بازیکن جمع زده و یکجا اعمال می‌شوند.
+#
+# رویدادهای هر بازیکن باید روی نخ کارگر همان بازیکن (ingress) ارسال
+# شوند، مانند هر تغییر دیگری در وضعیت بازیکن.
+#
+# اجرای بنچمارک:
+#   python quests.py [تعداد تعریف کوئست]
+# =================================================================
+
+from collections import namedtuple
+
+import gametables
+from gametables import OBJECTIVE_TARGET_KEYS, REWARD_KEYS
+
+Quest = namedtuple('Quest', ['id', 'name', 'description', 'type', 'target', 'count', 'location', 'rewards'])
+QuestEvent = namedtuple('QuestEvent', ['player', 'type', 'target', 'location', 'amount'], defaults=(1,))
+QuestUpdate = namedtuple('QuestUpdate', ['player', 'quest', 'progress', 'completed'])
+
+
+class QuestBook:
+    """تعریف‌های کامپایل‌شده کوئست‌ها به همراه ایندکس‌های رویداد."""
+
+    def __init__(self, definitions: dict):
+        self.quests = {}                        # quest_id -> Quest
+        self._by_event = {}                     # (type, target, location) -> tuple[Quest]
+        self._events_at = {}                    # location -> tuple[(type, target)]
+
+        for quest_id, data in definitions.items():
+            objective = data['objective']
+            kind = objective['type']
+            if kind not in OBJECTIVE_TARGET_KEYS:
+                raise ValueError(f"Quest {quest_id!r}: unknown objective type {kind!r}")
+            location = tuple(data['location']) if data.get('location') is not None else None
+            quest = Quest(quest_id, data['name'], data['description'], kind,
+                          objective[OBJECTIVE_TARGET_KEYS[kind]], objective.get('count', 1),
+                          location, {key: data.get('rewards', {}).get(key, 0) for key in REWARD_KEYS})
+            self.quests[quest_id] = quest
+            self._by_event.setdefault((kind, quest.target, location), []).append(quest)
+            if location is not None:
+                self._events_at.setdefault(location, set()).add((kind, quest.target))
+
+        self._by_event = {key: tuple(quests) for key, quests in self._by_event.items()}
+        self._events_at = {location: tuple(sorted(events)) for location, events in self._events_at.items()}
+
+    def candidates(self, kind: str, target: str, location) -> tuple:
+        """کوئست‌هایی که یک رویداد می‌تواند رویشان اثر بگذارد (مکان‌دار و بدون مکان)."""
+        return self._by_event.get((kind, target, location), ()) + self._by_event.get((kind, target, None), ())
+
+    def events_at(self, location) -> tuple:
+        """رویدادهای (type, target) قابل وقوع در یک خانه نقشه."""
+        return self._events_at.get(location, ())
+
+    def available_for(self, player) -> list:
+        """کوئست‌هایی که بازیکن هنوز نه شروع کرده و نه تمام کرده است."""
+        active = player.active_quests
+        return [quest for quest in self.quests.values()
+                if quest.id not in active and not player.has_completed(quest.id)]
+
+
+class QuestEngine:
+    """اعمال رویدادهای بازی روی کوئست‌های فعال بازیکنان و پرداخت دسته‌ای جوایز."""
+
+    def __init__(self, book: QuestBook):
+        self.book = book
+        self.stats = {'events': 0, 'checked': 0, 'progressed': 0, 'completed': 0, 'reward_batches': 0}
+
+    def accept(self, player, quest_id: str) -> bool:
+        """کوئست را برای بازیکن شروع می‌کند؛ اگر قابل دریافت نباشد False برمی‌گرداند."""
+        if quest_id not in self.book.quests or quest_id in player.active_quests or player.has_completed(quest_id):
+            return False
+        player.start_quest(quest_id)
+        return True
+
+    def dispatch(self, events) -> list:
+        """
+        لیستی از QuestEvent را پردازش می‌کند و برای هر کوئست پیشرفت‌کرده یک
+        QuestUpdate برمی‌گرداند. جوایز کوئست‌های تمام‌شده در پایان یکجا اعمال می‌شوند.
+        """
+        quests = self.book.quests
+        updates = []
+        for event in events:
+            self.stats['events'] += 1
+            active = event.player._active_quests
+            if not active:
+                continue
+            candidates = self.book.candidates(event.type, event.target, event.location)
+            if len(candidates) > len(active):
+                # وقتی بازیکن کوئست‌های فعال کمتری دارد، پیمایش آن‌ها ارزان‌تر است
+                candidates = [quest for quest in map(quests.get, active)
+                              if quest is not None and quest.type == event.type and quest.target == event.target
+                              and quest.location in (None, event.location)]
+            for quest in candidates:
+                self.stats['checked'] += 1
+                progress = active.get(quest.id)
+                if progress is None:
+                    continue
+                progress = min(progress + event.amount, quest.count)
+                completed = progress >= quest.count
+                if completed:
+                    event.player.finish_quest(quest.id)
+                    self.stats['completed'] += 1
+                else:
+                    event.player.set_quest_progress(quest.id, progress)
+                self.stats['progressed'] += 1
+                updates.append(QuestUpdate(event.player, quest, progress, completed))
+                if completed and not event.player._active_quests:
+                    break
+
+        self._grant([update for update in updates if update.completed])
+        return updates
+
+    def _grant(self, completions):
+        """جوایز را برای هر بازیکن جمع می‌زند و با یک فراخوانی grant_rewards اعمال می‌کند."""
+        if not completions:
+            return
+        totals = {}
+        for update in completions:
+            entry = totals.get(update.player.user_id)
+            if entry is None:
+                entry = totals[update.player.user_id] = [update.player, 0, 0, 0]
+            rewards = update.quest.rewards
+            entry[1] += rewards['xp']
+            entry[2] += rewards['gold']
+            entry[3] += rewards['attribute_points']
+        for player, xp, gold, attribute_points in totals.values():
+            player.grant_rewards(xp=xp, gold=gold, attribute_points=attribute_points)
+        self.stats['reward_batches'] += 1
+
+    def explore(self, player) -> list:
+        """بازیکن اطراف خانه فعلی‌اش را می‌گردد؛ تمام رویدادهای ممکن در آن خانه ارسال می‌شوند."""
+        location = (player.x, player.y)
+        return self.dispatch([QuestEvent(player, kind, target, location)
+                              for kind, target in self.book.events_at(location)])
+
+
+def format_rewards(rewards: dict) -> str:
+    parts = []
+    if rewards['xp']:
+        parts.append(f"+{rewards['xp']} XP")
+    if rewards['gold']:
+        parts.append(f"+{rewards['gold']} طلا")
+    if rewards['attribute_points']:
+        parts.append(f"+{rewards['attribute_points']} امتیاز ویژگی")
+    return "، ".join(parts)
+
+
+def format_quest_log(book: QuestBook, player) -> str:
+    """متن فهرست کوئست‌های فعال، قابل دریافت و تعداد کوئست‌های انجام‌شده."""
+    lines = ["📜 **کوئست‌های فعال:**"]
+    active = player.active_quests
+    for quest_id, progress in active.items():
+        quest = book.quests.get(quest_id)
+        if quest is not None:
+            lines.append(f"• **{quest.name}** ({progress}/{quest.count})\n  {quest.description}")
+    if not active:
+        lines.append("هیچ کوئست فعالی ندارید.")
+
+    available = book.available_for(player)
+    lines.append("\n🆕 **کوئست‌های قابل دریافت:**")
+    for quest in available:
+        lines.append(f"• **{quest.name}** ({format_rewards(quest.rewards)})\n  {quest.description}")
+    if not available:
+        lines.append("فعلاً کوئست جدیدی نیست.")
+
+    lines.append(f"\n✅ کوئست‌های انجام‌شده: {len(player.completed_quests)}")
+    return "\n".join(lines)
+
+
+# موتور سراسری کوئست‌ها؛ با بارگذاری مجدد داده‌ها، quest_engine.book جایگزین می‌شود
+quest_engine = QuestEngine(QuestBook(gametables.tables.quests))
+
+
+# --- بنچمارک ---
+
+def _benchmark(n_quests: int, n_players: int = 10_000, active_per_player: int = 20, n_events: int = 200_000):
+    import random
+    import time
+
+    from player import Player
+
+    rng = random.Random(0)
+    targets = [f"monster_{i}" for i in range(200)]
+    items = [f"item_{i}" for i in range(200)]
+    locations = [(x, y) for x in range(30) for y in range(30)]
+    definitions = {}
+    for i in range(n_quests):
+        kind = rng.choice(('kill', 'find_item'))
+        objective = ({'type': 'kill', 'target': rng.choice(targets), 'count': 10**9} if kind == 'kill'
+                     else {'type': 'find_item', 'item': rng.choice(items), 'count': 10**9})
+        definitions[f"bench_{i}"] = {"name": f"bench {i}", "description": "", "objective": objective,
+                                     "location": rng.choice(locations) if rng.random() < 0.9 else None,
+                                     "rewards": {"xp": 10}}
+    book = QuestBook(definitions)
+    engine = QuestEngine(book)
+    quest_ids = list(book.quests)
+
+    # بازیکنان متصل به انبار نیستند؛ فقط هزینه تطبیق رویداد اندازه‌گیری می‌شود
+    # (count بسیار بزرگ است تا هیچ کوئستی در طول بنچمارک تمام نشود)
+    players = [Player(user_id=i, telegram_name=f"user{i}", path="تهذیب") for i in range(n_players)]
+    for player in players:
+        player.active_quests = {quest_id: 0 for quest_id in rng.sample(quest_ids, active_per_player)}
+
+    events = []
+    for _ in range(n_events):
+        player = rng.choice(players)
+        quest = book.quests[rng.choice(list(player.active_quests))] if rng.random() < 0.3 else None
+        if quest is not None:
+            events.append(QuestEvent(player, quest.type, quest.target, quest.location or rng.choice(locations)))
+        else:
+            kind = rng.choice(('kill', 'find_item'))
+            events.append(QuestEvent(player, kind, rng.choice(targets if kind == 'kill' else items),
+                                     rng.choice(locations)))
+
+    started = time.perf_counter()
+    updates = engine.dispatch(events)
+    indexed = time.perf_counter() - started
+
+    def naive(events):
+        # روش ساده: پیمایش تمام کوئست‌های فعال بازیکن برای هر رویداد
+        hits = 0
+        for event in events:
+            for quest_id in event.player.active_quests:
+                quest = book.quests[quest_id]
+                if quest.type == event.type and quest.target == event.target \
+                        and quest.location in (None, event.location):
+                    hits += 1
+        return hits
+
+    started = time.perf_counter()
+    hits = naive(events)
+    scanned = time.perf_counter() - started
+    assert hits == len(updates)
+
+    print(f"{n_quests:,} quests, {n_players:,} players × {active_per_player} active, {n_events:,} events "
+          f"({len(updates):,} progressed)")
+    print(f"  indexed: {indexed / n_events * 1e6:6.2f} µs/event  (checked {engine.stats['checked']:,} quests)")
+    print(f"  scan:    {scanned / n_events * 1e6:6.2f} µs/event  (checked {n_events * active_per_player:,} quests)")
+
+
+if __name__ == "__main__":
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000)
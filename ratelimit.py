@@ -0,0 +1,51 @@
+# =================================================================
+#            ratelimit.py - Token Bucket
+#
+# پیاده‌سازی ساده الگوریتم سطل توکن (Token Bucket) برای محدود
+# کردن نرخ عملیات. سطل با نرخ ثابت rate توکن در ثانیه پر می‌شود
+# و حداکثر capacity توکن در خود نگه می‌دارد.
+#
+# این کلاس قفل ندارد؛ فراخواننده مسئول هماهنگی بین نخ‌هاست.
+# =================================================================
+
+import time
+
+
+class TokenBucket:
+    """سطل توکن با امکان توقف موقت (مثلاً پس از خطای 429 تلگرام)."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float, now: float = None):
+        self.rate = rate                        # تعداد توکن اضافه‌شده در هر ثانیه
+        self.capacity = capacity                # حداکثر توکن قابل ذخیره (اندازه انفجار مجاز)
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+        self.blocked_until = 0.0                # تا این لحظه هیچ توکنی داده نمی‌شود
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """مدت زمان (ثانیه) تا در دسترس قرار گرفتن یک توکن؛ صفر یعنی همین حالا."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def try_take(self, now: float) -> bool:
+        """در صورت وجود توکن، یکی برمی‌دارد و True برمی‌گرداند."""
+        if self.delay(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    def pause(self, until: float):
+        """سطل را تا لحظه until خالی و مسدود می‌کند."""
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, until)
+        # پر شدن دوباره سطل از پایان توقف شروع می‌شود
+        self.updated = max(self.updated, until)
@@ -0,0 +1,178 @@
+# =================================================================
+#            render.py - The Render Cache
+#
+# این فایل خروجی‌های متنی و کیبوردهای ربات را کش می‌کند تا در هر
+# کلیک، کیبورد و متن‌ها از نو ساخته و سریال‌سازی نشوند:
+#   - کیبورد اصلی فقط دو شکل دارد (با/بدون دکمه Breakthrough) و
+#     هر دو یک بار به JSON تبدیل می‌شوند
+#   - متن توضیحات هر مکان فقط به مختصات بستگی دارد و برای هر
+#     خانه نقشه در اولین بازدید یک بار ساخته می‌شود (کش LRU، چون
+#     نقشه چانک‌بندی‌شده میلیون‌ها خانه دارد)
+#   - متن وضعیت هر بازیکن تا زمانی که شمارنده version او تغییر
+#     نکرده، دوباره ساخته نمی‌شود؛ فقط خط جایگاه در جدول رده‌بندی
+#     (که با حرکت بقیه بازیکنان عوض می‌شود) در هر بار تازه است
+#
+# اجرای میکروبنچمارک:
+#   python render.py
+# =================================================================
+
+import threading
+from collections import OrderedDict
+
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# --- سازنده‌های کیبورد ---
+
+def build_start_markup() -> InlineKeyboardMarkup:
+    """کیبورد برای انتخاب مسیر اولیه بازی."""
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(InlineKeyboardButton("مسیر تهذیب 🧘‍♂️", callback_data="choose_tahzib"),
+               InlineKeyboardButton("مسیر مانا 🔮", callback_data="choose_mana"))
+    return markup
+
+def build_main_markup(show_breakthrough: bool) -> InlineKeyboardMarkup:
+    """منوی اصلی بازی؛ تنها بخش متغیر آن دکمه Breakthrough است."""
+    markup = InlineKeyboardMarkup()
+
+    # اگر بازیکن شرایط صعود به رتبه بعد را داشت، دکمه آن را نشان بده
+    if show_breakthrough:
+        markup.add(InlineKeyboardButton("✨ دستیابی به موفقیت! ✨", callback_data="breakthrough"))
+
+    # دکمه‌های حرکتی
+    markup.add(InlineKeyboardButton("⬆️ شمال", callback_data="move_up"))
+    markup.add(InlineKeyboardButton("⬅️ غرب", callback_data="move_left"),
+               InlineKeyboardButton("➡️ شرق", callback_data="move_right"))
+    markup.add(InlineKeyboardButton("⬇️ جنوب", callback_data="move_down"))
+
+    # دکمه‌های اقدامات اصلی
+    markup.add(InlineKeyboardButton("تمرین/کسب XP 💪", callback_data="action"),
+               InlineKeyboardButton("تمرین خودکار ⏳", callback_data="train"))
+    markup.add(InlineKeyboardButton("وضعیت من 📊", callback_data="show_status"),
+               InlineKeyboardButton("جستجوی اطراف 🔍", callback_data="explore"))
+    markup.add(InlineKeyboardButton("کوئست‌ها 📜", callback_data="show_quests"),
+               InlineKeyboardButton("مهارت‌ها ⚡️", callback_data="show_skills"))
+
+    return markup
+
+def build_quest_markup(quests) -> InlineKeyboardMarkup:
+    """یک دکمه «دریافت» برای هر کوئست قابل دریافت."""
+    markup = InlineKeyboardMarkup()
+    for quest in quests:
+        markup.add(InlineKeyboardButton(f"دریافت: {quest.name}", callback_data=f"quest_accept:{quest.id}"))
+    return markup
+
+def format_location_text(coords, location) -> str:
+    """متن توضیحات یک مکان را از روی مشخصات آن می‌سازد."""
+    return f"📍 **{location['name']}** (مختصات: {coords})\n\n{location['description']}"
+
+UNKNOWN_LOCATION_TEXT = "شما در یک مکان ناشناخته هستید."
+
+
+# --- کش ---
+
+class RenderCache:
+    """کش متن‌ها و کیبوردهای سریال‌شده به همراه شمارنده‌های نرخ برخورد."""
+
+    def __init__(self, world, max_status_entries: int = 100_000, max_location_entries: int = 100_000):
+        self.world = world
+        # کیبوردها به صورت رشته JSON نگه داشته می‌شوند؛ telebot رشته را بدون تغییر ارسال می‌کند
+        self.start_markup = build_start_markup().to_json()
+        self._main_markups = {flag: build_main_markup(flag).to_json() for flag in (False, True)}
+
+        self.max_location_entries = max_location_entries
+        self._locations = OrderedDict()         # (x, y) -> text به ترتیب LRU
+        self.max_status_entries = max_status_entries
+        self._status = OrderedDict()            # user_id -> (player, version, text) به ترتیب LRU
+        self._lock = threading.Lock()
+
+        self.stats = {'location_hits': 0, 'location_misses': 0, 'status_hits': 0, 'status_misses': 0}
+
+    def main_markup(self, player) -> str:
+        return self._main_markups[player.can_breakthrough()]
+
+    def location_text(self, player) -> str:
+        coords = (player.x, player.y)
+        with self._lock:
+            text = self._locations.get(coords)
+            if text is not None:
+                self._locations.move_to_end(coords)
+                self.stats['location_hits'] += 1
+                return text
+
+        location = self.world.get(coords)
+        if location is None:
+            return UNKNOWN_LOCATION_TEXT
+        text = format_location_text(coords, location)
+        with self._lock:
+            self._locations[coords] = text
+            if len(self._locations) > self.max_location_entries:
+                self._locations.popitem(last=False)
+            self.stats['location_misses'] += 1
+        return text
+
+    def status_text(self, player) -> str:
+        return self._status_body(player) + player.get_leaderboard_text()
+
+    def _status_body(self, player) -> str:
+        with self._lock:
+            entry = self._status.get(player.user_id)
+            if entry is not None and entry[0] is player and entry[1] == player.version:
+                self._status.move_to_end(player.user_id)
+                self.stats['status_hits'] += 1
+                return entry[2]
+
+        text = player.get_status_body()
+        with self._lock:
+            self._status[player.user_id] = (player, player.version, text)
+            self._status.move_to_end(player.user_id)
+            if len(self._status) > self.max_status_entries:
+                self._status.popitem(last=False)
+            self.stats['status_misses'] += 1
+        return text
+
+    def invalidate(self):
+        """تمام متن‌های وضعیت و مکان کش‌شده را دور می‌ریزد (مثلاً پس از بارگذاری مجدد داده‌های بازی)."""
+        with self._lock:
+            self._status.clear()
+            self._locations.clear()
+
+    def hit_rates(self) -> dict:
+        """نرخ برخورد کش برای متن مکان و متن وضعیت."""
+        rates = {}
+        for kind in ('location', 'status'):
+            hits, misses = self.stats[f'{kind}_hits'], self.stats[f'{kind}_misses']
+            rates[kind] = hits / (hits + misses) if hits + misses else 0.0
+        return rates
+
+
+# --- میکروبنچمارک ---
+
+def _benchmark(iterations: int = 100_000):
+    import timeit
+
+    from player import Player
+    from world import game_world
+
+    cache = RenderCache(game_world)
+    player = Player(user_id=1, telegram_name="bench", path="تهذیب")
+
+    def uncached():
+        coords = (player.x, player.y)
+        location = game_world[coords]
+        format_location_text(coords, location)
+        build_main_markup(player.can_breakthrough()).to_json()
+        player.get_status_text()
+
+    def cached():
+        cache.location_text(player)
+        cache.main_markup(player)
+        cache.status_text(player)
+
+    for name, fn in (("uncached", uncached), ("cached", cached)):
+        seconds = timeit.timeit(fn, number=iterations)
+        print(f"{name:>9}: {seconds / iterations * 1e6:8.2f} µs/render")
+    print("hit rates:", cache.hit_rates())
+
+
+if __name__ == "__main__":
+    _benchmark()
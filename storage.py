@@ -0,0 +1,346 @@
+# =================================================================
+#            storage.py - The Durable Player Store
+#
+# این فایل لایه ماندگاری بازیکنان را پیاده‌سازی می‌کند تا با هر
+# ری‌استارت یا کرش، پیشرفت بازیکنان از بین نرود.
+# اصول طراحی:
+#   - بک‌اند قابل تعویض (پیش‌فرض: SQLite در حالت WAL)
+#   - نوشتن تأخیری (Write-Behind): بازیکنان تغییر یافته علامت‌گذاری
+#     شده و به صورت دسته‌ای در یک تراکنش ذخیره می‌شوند
+#   - بارگذاری تنبل: هر بازیکن فقط در اولین دسترسی از دیسک خوانده
+#     می‌شود، پس زمان بالا آمدن ربات به تعداد بازیکنان بستگی ندارد
+#   - بازیکنان بارگذاری‌شده از حافظه بیرون رانده نمی‌شوند (هندلرها و
+#     زمان‌بند تمرین به همان شیء Player ارجاع نگه می‌دارند)؛ پس کل
+#     بازیکنان فعال باید در حافظه جا شوند (Player فشرده است، player.py)
+#   - جست‌وجوی ناموفق (کاربری که /start نزده) مدت کوتاهی کش می‌شود تا
+#     هر آپدیت چنین کاربری یک کوئری SQLite روی نخ کارگر نباشد
+#
+# اجرای بنچمارک:
+#   python storage.py 10000 100000 1000000
+# =================================================================
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from player import Player
+
+logger = logging.getLogger(__name__)
+
+
+# --- بک‌اندهای ذخیره‌سازی ---
+
+class PlayerBackend:
+    """رابط پایه برای هر نوع مخزن دائمی بازیکنان."""
+
+    def load(self, user_id: int):
+        """رکورد یک بازیکن را برمی‌گرداند یا در صورت نبودن None."""
+        raise NotImplementedError
+
+    def save_many(self, records: list):
+        """لیستی از رکوردها را در یک تراکنش واحد ذخیره می‌کند."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """تعداد کل بازیکنان ذخیره‌شده را برمی‌گرداند."""
+        raise NotImplementedError
+
+    def rankings(self):
+        """ردیف‌های (user_id, path, rank_index, xp) همه بازیکنان؛ برای ساخت جدول رده‌بندی."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(PlayerBackend):
+    """بک‌اند ساده درون حافظه؛ برای توسعه محلی و آزمایش."""
+
+    def __init__(self):
+        self._rows = {}
+
+    def load(self, user_id):
+        data = self._rows.get(user_id)
+        return json.loads(data) if data is not None else None
+
+    def save_many(self, records):
+        for record in records:
+            self._rows[record['user_id']] = json.dumps(record, ensure_ascii=False)
+
+    def count(self):
+        return len(self._rows)
+
+    def rankings(self):
+        # نخ flush هم‌زمان در _rows می‌نویسد؛ پیمایش روی یک کپی (کپی list() زیر GIL اتمیک است)
+        for data in list(self._rows.values()):
+            record = json.loads(data)
+            yield record['user_id'], record['path'], record['rank_index'], record['xp']
+
+
+class SQLiteBackend(PlayerBackend):
+    """بک‌اند پیش‌فرض مبتنی بر SQLite در حالت WAL."""
+
+    # ستون‌های path/rank_index/xp برای پرس‌وجوهای مستقیم جدا نگه داشته می‌شوند
+    # و بقیه وضعیت بازیکن به صورت JSON در ستون data قرار می‌گیرد.
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS players ("
+        " user_id INTEGER PRIMARY KEY,"
+        " path TEXT NOT NULL,"
+        " rank_index INTEGER NOT NULL,"
+        " xp INTEGER NOT NULL,"
+        " data TEXT NOT NULL)"
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # اتصال نویسنده فقط توسط نخ flush استفاده می‌شود؛
+        # هر نخ خواننده اتصال مخصوص خودش را دارد تا در حالت WAL
+        # خواندن‌ها پشت نوشتن‌ها منتظر نمانند.
+        self._writer = self._connect()
+        self._writer.execute(self.SCHEMA)
+        self._writer_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._readers.append(conn)
+        return conn
+
+    def load(self, user_id):
+        row = self._reader().execute("SELECT data FROM players WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save_many(self, records):
+        rows = [(r['user_id'], r['path'], r['rank_index'], r['xp'], json.dumps(r, ensure_ascii=False))
+                for r in records]
+        with self._writer_lock:
+            self._writer.execute("BEGIN")
+            try:
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO players (user_id, path, rank_index, xp, data) VALUES (?, ?, ?, ?, ?)",
+                    rows)
+                self._writer.execute("COMMIT")
+            except Exception:
+                # COMMIT هم ممکن است شکست بخورد (مثلاً SQLITE_BUSY)؛ بدون ROLLBACK اتصال
+                # داخل تراکنش می‌ماند و BEGIN در تمام flush های بعدی خطا می‌دهد.
+                # PlayerStore.flush بازیکنان این دسته را دوباره علامت‌گذاری می‌کند.
+                if self._writer.in_transaction:
+                    self._writer.execute("ROLLBACK")
+                raise
+
+    def count(self):
+        return self._reader().execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+    def rankings(self):
+        # فقط ستون‌های جدا؛ ستون JSON خوانده و پارس نمی‌شود
+        return self._reader().execute("SELECT user_id, path, rank_index, xp FROM players")
+
+    def close(self):
+        for conn in self._readers:
+            conn.close()
+        self._readers.clear()
+        self._writer.close()
+
+
+# --- انبار بازیکنان با نوشتن دسته‌ای ---
+
+class PlayerStore:
+    """
+    جایگزین دیکشنری players در bot.py.
+    بازیکنان در حافظه کش می‌شوند، در اولین دسترسی از بک‌اند بارگذاری
+    می‌شوند و تغییراتشان توسط یک نخ پس‌زمینه به صورت دسته‌ای ذخیره می‌شود.
+    """
+
+    def __init__(self, backend: PlayerBackend, flush_interval: float = 2.0, batch_size: int = 500,
+                 miss_ttl: float = 30.0, max_misses: int = 100_000):
+        self.backend = backend
+        self.flush_interval = flush_interval    # حداکثر فاصله زمانی بین دو flush (ثانیه)
+        self.batch_size = batch_size            # با رسیدن تعداد تغییرات به این عدد، flush زودتر انجام می‌شود
+        self.miss_ttl = miss_ttl                # مدت اعتبار کش جست‌وجوی ناموفق (ثانیه)
+        self.max_misses = max_misses            # سقف تعداد جست‌وجوهای ناموفق نگه‌داشته‌شده
+
+        self._cache = {}                        # user_id -> Player (بازیکنان بارگذاری شده)
+        self._misses = OrderedDict()            # user_id -> زمان انقضای کش «بازیکن وجود ندارد» (LRU)
+        self._dirty = {}                        # user_id -> Player (منتظر ذخیره)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()     # جلوگیری از نوشتن هم‌زمان دو snapshot
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.stats = {'hydrated': 0, 'misses': 0, 'flushes': 0, 'flushed_players': 0, 'flush_errors': 0}
+
+        self._thread = threading.Thread(target=self._flush_loop, name="player-store-flush", daemon=True)
+        self._thread.start()
+
+    # --- رابط شبیه دیکشنری ---
+
+    def __contains__(self, user_id) -> bool:
+        return self._get(user_id) is not None
+
+    def __getitem__(self, user_id) -> Player:
+        player = self._get(user_id)
+        if player is None:
+            raise KeyError(user_id)
+        return player
+
+    def __setitem__(self, user_id, player: Player):
+        player._attach(self)
+        with self._lock:
+            self._cache[user_id] = player
+            self._misses.pop(user_id, None)
+        self.mark_dirty(player)
+
+    def get(self, user_id, default=None):
+        player = self._get(user_id)
+        return player if player is not None else default
+
+    def loaded_count(self) -> int:
+        """تعداد بازیکنانی که هم‌اکنون در حافظه هستند."""
+        return len(self._cache)
+
+    def _get(self, user_id):
+        player = self._cache.get(user_id)
+        if player is not None:
+            return player
+
+        expires = self._misses.get(user_id)
+        if expires is not None and expires > time.monotonic():
+            return None
+
+        # بارگذاری تنبل از بک‌اند (بیرون از قفل تا I/O بقیه را معطل نکند)
+        record = self.backend.load(user_id)
+        with self._lock:
+            # ممکن است نخ دیگری هم‌زمان همین بازیکن را بارگذاری (یا ایجاد) کرده باشد
+            player = self._cache.get(user_id)
+            if player is None and record is None:
+                self._misses[user_id] = time.monotonic() + self.miss_ttl
+                self._misses.move_to_end(user_id)
+                if len(self._misses) > self.max_misses:
+                    self._misses.popitem(last=False)
+                self.stats['misses'] += 1
+                return None
+            if player is None:
+                player = Player.from_record(record)
+                player._attach(self)
+                self._cache[user_id] = player
+                self.stats['hydrated'] += 1
+        return player
+
+    # --- ردیابی تغییرات و ذخیره ---
+
+    def mark_dirty(self, player: Player):
+        """توسط Player._touch پس از هر تغییر وضعیت فراخوانی می‌شود."""
+        with self._lock:
+            self._dirty[player.user_id] = player
+            pending = len(self._dirty)
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """تمام بازیکنان تغییر یافته را در یک تراکنش ذخیره می‌کند و تعدادشان را برمی‌گرداند."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+
+            # اگر بازیکنی حین سریال‌سازی تغییر کند، دوباره علامت‌گذاری
+            # می‌شود و در نوبت بعدی ذخیره خواهد شد.
+            records = [player.to_record() for player in dirty.values()]
+            try:
+                self.backend.save_many(records)
+            except Exception:
+                with self._lock:
+                    for user_id, player in dirty.items():
+                        self._dirty.setdefault(user_id, player)
+                self.stats['flush_errors'] += 1
+                raise
+
+            self.stats['flushes'] += 1
+            self.stats['flushed_players'] += len(records)
+            return len(records)
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Player store flush failed; will retry")
+
+    def close(self):
+        """نخ پس‌زمینه را متوقف، تغییرات باقی‌مانده را ذخیره و بک‌اند را می‌بندد."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self.backend.close()
+
+
+def create_player_store() -> PlayerStore:
+    """انبار بازیکنان را بر اساس متغیرهای محیطی می‌سازد."""
+    backend_name = os.environ.get('PLAYER_STORE', 'sqlite')
+    if backend_name == 'memory':
+        backend = MemoryBackend()
+    elif backend_name == 'sqlite':
+        backend = SQLiteBackend(os.environ.get('PLAYER_DB_PATH', 'players.db'))
+    else:
+        raise ValueError(f"Unknown PLAYER_STORE backend: {backend_name!r}")
+
+    return PlayerStore(backend,
+                       flush_interval=float(os.environ.get('STORE_FLUSH_INTERVAL', 2.0)),
+                       batch_size=int(os.environ.get('STORE_BATCH_SIZE', 500)))
+
+
+# --- بنچمارک ---
+
+def _benchmark(sizes):
+    import random
+    import tempfile
+
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+
+            # توان عملیاتی flush: n بازیکن تغییر یافته در یک نوبت
+            store = PlayerStore(SQLiteBackend(db_path), flush_interval=3600, batch_size=n + 1)
+            for user_id in range(n):
+                store[user_id] = Player(user_id=user_id, telegram_name=f"user{user_id}", path="تهذیب")
+            started = time.perf_counter()
+            store.flush()
+            flush_seconds = time.perf_counter() - started
+            store.close()
+
+            # تأخیر شروع سرد: باز کردن انبار + اولین دسترسی به یک بازیکن تصادفی
+            started = time.perf_counter()
+            store = PlayerStore(SQLiteBackend(db_path), flush_interval=3600)
+            open_seconds = time.perf_counter() - started
+            user_id = random.randrange(n)
+            started = time.perf_counter()
+            assert user_id in store
+            first_access_seconds = time.perf_counter() - started
+            store.close()
+
+            print(f"n={n:>9,}  flush: {n / flush_seconds:>10,.0f} players/s ({flush_seconds:.2f}s)  "
+                  f"cold open: {open_seconds * 1000:.2f} ms  first access: {first_access_seconds * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+    _benchmark([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,5 @@
+# ماژول‌های ربات در ریشه مخزن هستند (بدون پکیج)؛ برای import در تست‌ها
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
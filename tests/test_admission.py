@@ -0,0 +1,88 @@
+# =================================================================
+#            tests/test_admission.py - Inbound Flood Control Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+from types import SimpleNamespace
+
+import pytest
+
+import admission
+from admission import DUPLICATE, RATE_LIMITED, AdmissionControl
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    return clock
+
+
+def click(user_id, data='action', message_id=1):
+    return SimpleNamespace(callback_query=SimpleNamespace(
+        from_user=SimpleNamespace(id=user_id), message=SimpleNamespace(message_id=message_id),
+        inline_message_id=None, data=data))
+
+
+def test_messages_are_always_admitted(clock):
+    gate = AdmissionControl(rate=1, burst=1)
+    message = SimpleNamespace(callback_query=None)
+    assert [gate.check(message) for _ in range(5)] == [None] * 5
+    assert gate.tracked() == 0
+
+
+def test_rate_limit_allows_burst_then_refills(clock):
+    gate = AdmissionControl(rate=2, burst=3, dedupe_window=0)
+    results = [gate.check(click(1, data=f"d{i}")) for i in range(5)]
+    assert results == [None, None, None, RATE_LIMITED, RATE_LIMITED]
+
+    clock.now += 0.5                            # یک توکن جدید
+    assert gate.check(click(1, data='x')) is None
+    assert gate.check(click(1, data='y')) == RATE_LIMITED
+    # سطل هر کاربر جداست
+    assert gate.check(click(2)) is None
+    assert gate.stats['rejected_rate'] == 3
+
+
+def test_duplicate_click_within_window_is_dropped_without_a_token(clock):
+    gate = AdmissionControl(rate=1, burst=2, dedupe_window=0.3)
+    assert gate.check(click(1)) is None
+    clock.now += 0.1
+    assert gate.check(click(1)) == DUPLICATE
+    # همان داده روی پیام دیگر، یا داده دیگر روی همان پیام، تکراری نیست
+    assert gate.check(click(1, message_id=2)) is None
+    clock.now += 0.2
+    assert gate.check(click(1, message_id=2)) == DUPLICATE
+    assert gate.stats['rejected_duplicate'] == 2
+
+    clock.now += 1.0                            # پس از پنجره و با یک توکن پر شده
+    assert gate.check(click(1, message_id=2)) is None
+
+
+def test_least_recently_active_user_is_evicted(clock):
+    gate = AdmissionControl(rate=1, burst=1, max_users=3)
+    for user_id in (1, 2, 3):
+        gate.check(click(user_id))
+    gate.check(click(1, data='again'))          # کاربر 1 تازه‌ترین می‌شود
+    gate.check(click(4))
+    assert gate.tracked() == 3
+    assert list(gate._callers) == [3, 1, 4]
+    assert gate.stats['evicted'] == 1
+
+    # کاربر حذف‌شده با سطل پر دوباره شروع می‌کند
+    assert gate.check(click(2)) is None
+
+
+def test_disabled_gate_admits_everything(clock):
+    gate = AdmissionControl(rate=0, dedupe_window=0)
+    assert [gate.check(click(1)) for _ in range(10)] == [None] * 10
+    assert gate.stats['admitted'] == 10
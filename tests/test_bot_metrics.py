@@ -0,0 +1,58 @@
+# =================================================================
+#            tests/test_bot_metrics.py - /metrics & /debug/profile Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import os
+
+import pytest
+
+# bot.py در زمان import انبار بازیکنان و ربات را می‌سازد؛ بدون پایگاه داده روی دیسک
+os.environ.setdefault('BOT_TOKEN', '123:test')
+os.environ.setdefault('PLAYER_STORE', 'memory')
+
+import bot  # noqa: E402
+
+TOKEN = 's3cret'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(bot, 'METRICS_TOKEN', TOKEN)
+    return bot.app.test_client()
+
+
+def test_metrics_require_the_token(client):
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics?token=wrong').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+
+    response = client.get('/metrics', headers={'Authorization': f'Bearer {TOKEN}'})
+    assert response.status_code == 200
+    assert 'rpg_intake_accepted' in response.get_data(as_text=True)
+    assert client.get(f'/metrics?token={TOKEN}').status_code == 200
+
+
+def test_metrics_open_without_configured_token(monkeypatch):
+    monkeypatch.setattr(bot, 'METRICS_TOKEN', None)
+    client = bot.app.test_client()
+    assert client.get('/metrics').status_code == 200
+    # پروفایلر بدون توکن غیرفعال است
+    assert client.get('/debug/profile').status_code == 404
+
+
+def test_profile_requires_the_token(client):
+    assert client.get('/debug/profile?seconds=0.01').status_code == 403
+
+
+@pytest.mark.parametrize('query', ['seconds=abc', 'seconds=nan', 'seconds=inf', 'seconds=-1', 'seconds=0',
+                                   'seconds=1&interval_ms=0', 'seconds=1&interval_ms=nan'])
+def test_profile_rejects_bad_parameters(client, query):
+    response = client.get(f'/debug/profile?{query}&token={TOKEN}')
+    assert response.status_code == 400
+
+
+def test_profile_samples_stacks(client):
+    response = client.get(f'/debug/profile?seconds=0.05&interval_ms=5&token={TOKEN}')
+    assert response.status_code == 200
@@ -0,0 +1,72 @@
+# =================================================================
+#            tests/test_combat.py - Combat Resolver Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import numpy as np
+import pytest
+
+from combat import opponent_vectors, resolve_fights, simulate_rank_win_rates, stats_for_rank
+from encounters import Roster
+
+# جدول کوچک و ثابت: سه حریف کامل و یکی بدون آمار مقایسه (باید کنار گذاشته شود)
+# ستون‌ها به ترتیب STAT_COLUMNS: intelligence, strength, speed, durability, power, combat
+STATS = [
+    [20, 30, 25, 20, 10, 40],
+    [50, 45, 40, 35, 60, 50],
+    [80, 70, 60, 75, 90, 85],
+    [np.nan, 50, 50, 50, 50, 50],
+]
+
+
+@pytest.fixture
+def roster():
+    n = len(STATS)
+    return Roster({
+        'ids': np.arange(1, n + 1, dtype=np.int32),
+        'names': np.array([f"hero{i}" for i in range(n)], dtype=str),
+        'stats': np.array(STATS, dtype=np.float32),
+        'height_cm': np.full(n, np.nan, dtype=np.float32),
+        'weight_kg': np.full(n, np.nan, dtype=np.float32),
+        'alignment_values': np.array(['good'], dtype=str),
+        'alignment_codes': np.zeros(n, dtype=np.int8),
+        'publisher_values': np.array(['test'], dtype=str),
+        'publisher_codes': np.zeros(n, dtype=np.int16),
+    })
+
+
+def test_match_indices_skip_incomplete_characters(roster):
+    assert roster.match_indices().tolist() == [0, 1, 2]
+
+
+def test_same_seed_reproduces_fights(roster):
+    opponents = np.repeat(opponent_vectors(roster.match_indices(), roster), 50, axis=0)
+    player = stats_for_rank(2)[None, :]
+    first = resolve_fights(player, opponents, seed=7)
+    second = resolve_fights(player, opponents, seed=7)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_win_rates_are_probabilities_and_grow_with_rank(roster):
+    rates = simulate_rank_win_rates(fights_per_opponent=500, seed=0, roster=roster)
+    assert rates
+    for path_rates in rates.values():
+        assert ((path_rates >= 0) & (path_rates <= 1)).all()
+        assert path_rates[0] <= path_rates[-1]
+    again = simulate_rank_win_rates(fights_per_opponent=500, seed=0, roster=roster)
+    for path, path_rates in rates.items():
+        np.testing.assert_array_equal(path_rates, again[path])
+    # رشد آمار به مسیر بستگی ندارد؛ همه مسیرها همان نتیجه را گزارش می‌کنند
+    first, *others = rates.values()
+    for path_rates in others:
+        np.testing.assert_array_equal(path_rates, first[:len(path_rates)])
+
+
+def test_unknown_filter_values_share_one_cache_entry(roster):
+    for i in range(50):
+        assert len(roster.nearest([50, 50, 50, 50], alignment=f"nope{i}")) == 0
+        assert len(roster.nearest([50, 50, 50, 50], publisher=f"nope{i}")) == 0
+    assert len(roster.nearest([50, 50, 50, 50], alignment='good', publisher='test')) == 3
+    assert len(roster._candidates) == 3
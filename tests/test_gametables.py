@@ -0,0 +1,117 @@
+# =================================================================
+#            tests/test_gametables.py - Game Data Tables Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import copy
+
+import pytest
+
+import gamedata
+import gametables
+from gametables import GameDataError, GameDataReloader, GameTables, validate
+
+with open(gamedata.__file__, encoding='utf-8') as f:
+    SOURCE = f.read()
+
+
+def base_data():
+    return copy.deepcopy({key: value for key, value in vars(gamedata).items() if not key.startswith('__')})
+
+
+@pytest.fixture(autouse=True)
+def restore_tables(monkeypatch):
+    """reload() جدول سراسری را جایگزین می‌کند؛ پس از هر تست مقدار قبلی برمی‌گردد."""
+    monkeypatch.setattr(gametables, 'tables', gametables.tables)
+
+
+def write_data(tmp_path, extra: str):
+    """کپی gamedata.py به همراه دستورهای تغییر داده در انتهای فایل."""
+    path = tmp_path / "gamedata_test.py"
+    path.write_text(SOURCE + "\n" + extra + "\n", encoding='utf-8')
+    return str(path)
+
+
+def test_shipped_data_is_valid():
+    assert validate(base_data()) == []
+    assert validate(base_data(), previous=gametables.tables) == []
+
+
+def test_broken_rank_list_is_rejected():
+    data = base_data()
+    path = next(iter(data['CULTIVATION_PATHS']))
+    data['CULTIVATION_PATHS'][path][1] = {"rank_name": "broken", "xp_needed": 0}
+    data['CULTIVATION_PATHS'][path].append({"xp_needed": 10})
+    with pytest.raises(GameDataError) as error:
+        GameTables(data)
+    message = str(error.value)
+    assert "rank 1: xp_needed must be a positive int" in message
+    assert "missing rank_name" in message
+
+
+def test_references_to_missing_ids_are_rejected():
+    data = base_data()
+    skill_id = next(iter(data['SKILLS']))
+    data['SKILLS'][skill_id] = dict(data['SKILLS'][skill_id], path='no_such_path')
+    quest_id = next(iter(data['QUESTS']))
+    data['QUESTS'][quest_id] = dict(data['QUESTS'][quest_id], objective={'type': 'escort'})
+    errors = validate(data)
+    assert any(skill_id in e and 'unknown path' in e for e in errors)
+    assert any(quest_id in e and 'unknown objective type' in e for e in errors)
+
+
+def test_running_only_changes_are_rejected_on_reload():
+    data = base_data()
+    data['CULTIVATION_PATHS'].pop(next(iter(data['CULTIVATION_PATHS'])))
+    data['WORLD_SEED'] += 1
+    errors = validate(data, previous=gametables.tables)
+    assert any('paths cannot be removed' in e for e in errors)
+    assert any('WORLD_SEED' in e for e in errors)
+
+
+def test_ids_keep_their_bits_when_removed_and_added():
+    previous = gametables.tables
+    data = base_data()
+    removed_quest = next(iter(data['QUESTS']))
+    removed_skill = next(iter(data['SKILLS']))
+    del data['QUESTS'][removed_quest], data['SKILLS'][removed_skill]
+    data['QUESTS']['q_new'] = dict(previous.quests[removed_quest])
+
+    tables = GameTables(data, previous=previous)
+    assert tables.quest_ids[:len(previous.quest_ids)] == previous.quest_ids
+    assert tables.skill_ids == previous.skill_ids
+    for quest_id, bit in previous.quest_bits.items():
+        assert tables.quest_bits[quest_id] == bit
+    assert tables.quest_bits['q_new'] == 1 << len(previous.quest_ids)
+    assert removed_quest not in tables.quests
+    assert tables.version == previous.version + 1
+
+
+def test_failed_reload_keeps_tables_and_skips_listeners(tmp_path):
+    calls = []
+    reloader = GameDataReloader(write_data(tmp_path, "WORLD_SEED = WORLD_SEED + 1"),
+                                listeners=[lambda new, old: calls.append((new, old))])
+    previous = gametables.tables
+    assert reloader.reload() is False
+    assert gametables.tables is previous
+    assert calls == []
+    assert reloader.stats == {'reloads': 0, 'failures': 1}
+
+
+def test_syntax_error_reload_keeps_tables(tmp_path):
+    reloader = GameDataReloader(write_data(tmp_path, "QUESTS = {"))
+    previous = gametables.tables
+    assert reloader.reload() is False
+    assert gametables.tables is previous
+
+
+def test_successful_reload_swaps_tables_and_notifies(tmp_path):
+    calls = []
+    previous = gametables.tables
+    reloader = GameDataReloader(write_data(tmp_path, "QUESTS = dict(QUESTS, q_reloaded=dict(next(iter(QUESTS.values()))))"),
+                                listeners=[lambda new, old: calls.append((new, old))])
+    assert reloader.reload() is True
+    assert gametables.tables is not previous
+    assert calls == [(gametables.tables, previous)]
+    assert gametables.tables.quest_ids == previous.quest_ids + ('q_reloaded',)
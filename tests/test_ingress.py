@@ -0,0 +1,80 @@
+# =================================================================
+#            tests/test_ingress.py - Update Intake Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import threading
+
+from ingress import UpdateIntake
+
+
+def make_intake(handler, **kwargs):
+    # آپدیت‌های آزمایشی (user_id, seq) هستند
+    return UpdateIntake(handler, key_func=lambda update: update[0], **kwargs)
+
+
+def test_each_users_updates_run_in_order_on_one_thread():
+    seen = {}
+    lock = threading.Lock()
+
+    def handler(update):
+        user_id, seq = update
+        with lock:
+            seen.setdefault(user_id, []).append((seq, threading.current_thread().name))
+
+    intake = make_intake(handler, workers=4, maxsize=10_000)
+    intake.start()
+    for seq in range(200):
+        for user_id in range(10):
+            assert intake.offer((user_id, seq), block=True)
+    intake.stop()
+
+    assert sorted(seen) == list(range(10))
+    for user_id, calls in seen.items():
+        assert [seq for seq, _ in calls] == list(range(200))
+        assert len({name for _, name in calls}) == 1
+    snapshot = intake.snapshot()
+    assert snapshot['accepted'] == snapshot['processed'] == 2000
+    assert snapshot['rejected'] == 0
+
+
+def test_full_queue_rejects_without_block():
+    intake = make_intake(lambda update: None, workers=1, maxsize=2, put_timeout=0.01)
+    assert intake.offer((1, 0)) and intake.offer((1, 1))
+    assert intake.offer((1, 2)) is False
+    assert intake.stats == {'accepted': 2, 'rejected': 1}
+    intake.start()
+    intake.stop()
+
+
+def test_full_queue_blocks_until_a_worker_frees_space():
+    handled = []
+    intake = make_intake(handled.append, workers=1, maxsize=1)
+    intake.offer((1, 0))
+
+    blocked = threading.Thread(target=intake.offer, args=((1, 1),), kwargs={'block': True})
+    blocked.start()
+    blocked.join(0.05)
+    assert blocked.is_alive()
+
+    intake.start()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    intake.stop()
+    assert handled == [(1, 0), (1, 1)]
+
+
+def test_concurrent_offers_are_all_counted():
+    intake = make_intake(lambda update: None, workers=2, maxsize=100_000)
+
+    def offer_many(user_id):
+        for seq in range(5000):
+            intake.offer((user_id, seq))
+
+    threads = [threading.Thread(target=offer_many, args=(user_id,)) for user_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert intake.stats['accepted'] == 40_000
@@ -0,0 +1,119 @@
+# =================================================================
+#            tests/test_leaderboard.py - Leaderboard Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import random
+
+import pytest
+
+import gametables
+from leaderboard import Leaderboard, RankIndex, decode_key, encode_key
+
+PATH = gametables.tables.path_names[0]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """تکه‌های کوچک تا تقسیم و حذف تکه‌ها در چند ده عملیات رخ دهد."""
+    monkeypatch.setattr(RankIndex, 'LOAD', 4)
+
+
+def check_against(index, reference):
+    reference.sort()
+    assert len(index) == len(reference)
+    assert index.slice(0, len(reference) + 5) == reference
+    for start, stop in ((0, 3), (5, 17), (len(reference) - 2, len(reference) + 3)):
+        assert index.slice(start, stop) == reference[max(start, 0):stop]
+    for position, key in enumerate(reference):
+        assert index.index(key) == position
+
+
+def test_rank_index_matches_sorted_reference():
+    rng = random.Random(0)
+    index, reference = RankIndex(), []
+    index.load(rng.sample(range(10_000), 30))
+    reference.extend(index.slice(0, 30))
+
+    for step in range(2000):
+        if reference and rng.random() < 0.45:
+            key = rng.choice(reference)
+            reference.remove(key)
+            assert index.discard(key)
+        else:
+            key = rng.randrange(10_000)
+            if key in reference:
+                continue
+            reference.append(key)
+            index.add(key)
+        if step % 50 == 0:
+            check_against(index, reference)
+        assert len(index._chunks) == 0 or max(map(len, index._chunks)) <= 2 * RankIndex.LOAD
+    check_against(index, reference)
+
+    assert index.discard(-1) is False
+    assert index.index(-1) is None
+
+
+def test_rank_index_empties_and_refills():
+    index = RankIndex()
+    for key in range(20):
+        index.add(key)
+    for key in range(20):
+        assert index.discard(key)
+    assert len(index) == 0 and index.slice(0, 5) == []
+    index.add(3)
+    assert index.index(3) == 0
+
+
+def test_key_order_and_round_trip():
+    assert encode_key(1, 2, 0) < encode_key(1, 1, 999) < encode_key(1, 1, 998)
+    assert encode_key(1, 1, 5) < encode_key(2, 1, 5)
+    assert decode_key(encode_key(123, 4, 56)) == (123, 4, 56)
+
+
+def test_ties_on_equal_xp_are_broken_by_user_id():
+    board = Leaderboard([PATH])
+    board.load([(3, PATH, 1, 50), (1, PATH, 1, 50), (2, PATH, 1, 80), (4, PATH, 0, 900)])
+    assert board.top(PATH, 10) == [(2, 1, 80), (1, 1, 50), (3, 1, 50), (4, 0, 900)]
+    assert board.position(PATH, 1, 1, 50) == (2, 4)
+    assert board.position(PATH, 3, 1, 50) == (3, 4)
+    assert board.top(PATH, 2, start=1) == [(1, 1, 50), (3, 1, 50)]
+    assert board.percentile(PATH, 4, 0, 900) == 0.0
+
+
+def test_move_before_load_keeps_live_value():
+    board = Leaderboard([PATH])
+    board.place(PATH, 1, 0, 10)
+    board.move(PATH, 1, 0, 10, 0, 500)
+    board.load([(1, PATH, 0, 10), (2, PATH, 0, 100)])
+    assert board.ready
+    assert board.top(PATH, 10) == [(1, 0, 500), (2, 0, 100)]
+    assert board.position(PATH, 1, 0, 500) == (1, 2)
+
+
+def test_move_during_load_keeps_live_value():
+    board = Leaderboard([PATH])
+    board.place(PATH, 1, 0, 10)
+
+    def rows():
+        yield 1, PATH, 0, 10
+        # بازیکن حین خواندن ردیف‌های ذخیره‌شده XP می‌گیرد
+        board.move(PATH, 1, 0, 10, 0, 700)
+        yield 2, PATH, 0, 100
+
+    board.load(rows())
+    assert board.top(PATH, 10) == [(1, 0, 700), (2, 0, 100)]
+    board.move(PATH, 1, 0, 700, 0, 50)
+    assert board.top(PATH, 10) == [(2, 0, 100), (1, 0, 50)]
+
+
+def test_remove_during_load_drops_stored_row():
+    paths = gametables.tables.path_names[:2]
+    board = Leaderboard(paths)
+    board.remove(paths[0], 1, 0, 10)
+    board.place(paths[1], 1, 0, 10)
+    board.load([(1, paths[0], 0, 10)])
+    assert board.size(paths[0]) == 0
+    assert board.top(paths[1]) == [(1, 0, 10)]
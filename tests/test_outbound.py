@@ -0,0 +1,88 @@
+# =================================================================
+#            tests/test_outbound.py - Outbound Scheduler Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+from outbound import OutboundScheduler
+
+
+class ApiError(Exception):
+    """شبیه ApiTelegramException: فقط فیلدهایی که زمان‌بند می‌خواند."""
+
+    def __init__(self, error_code, description):
+        super().__init__(description)
+        self.error_code = error_code
+        self.description = description
+        self.result_json = {}
+
+
+class FakeBot:
+    """متدهای telebot را فقط ثبت می‌کند؛ خطاهای failures به ترتیب پرتاب می‌شوند."""
+
+    def __init__(self):
+        self.edits = []
+        self.failures = []
+
+    def edit_message_text(self, text, chat_id, message_id, reply_markup=None, parse_mode=None):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.edits.append(text)
+
+
+def make_scheduler():
+    bot = FakeBot()
+    return bot, OutboundScheduler(bot, global_rate=1000, per_chat_rate=1000, per_chat_burst=1000)
+
+
+def edit(scheduler, text):
+    scheduler.edit_message_text(text, chat_id=1, message_id=10)
+
+
+def test_identical_edit_is_suppressed():
+    bot, scheduler = make_scheduler()
+    edit(scheduler, 'A')
+    scheduler.execute(scheduler.poll_op()[0])
+    edit(scheduler, 'A')
+    assert scheduler.poll_op()[0] is None
+    assert bot.edits == ['A']
+    assert scheduler.stats['suppressed'] == 1
+
+
+def test_return_to_previous_content_while_edit_in_flight():
+    bot, scheduler = make_scheduler()
+    edit(scheduler, 'A')
+    scheduler.execute(scheduler.poll_op()[0])
+
+    edit(scheduler, 'B')
+    in_flight = scheduler.poll_op()[0]
+    # بازیکن پیش از پایان ارسال B به همان محتوای A برمی‌گردد
+    edit(scheduler, 'A')
+    scheduler.execute(in_flight)
+    scheduler.execute(scheduler.poll_op()[0])
+
+    assert bot.edits == ['A', 'B', 'A']
+    assert scheduler.stats['suppressed'] == 0
+
+
+def test_repeat_of_in_flight_edit_is_suppressed():
+    bot, scheduler = make_scheduler()
+    edit(scheduler, 'A')
+    in_flight = scheduler.poll_op()[0]
+    edit(scheduler, 'A')
+    scheduler.execute(in_flight)
+    assert scheduler.poll_op()[0] is None
+    assert bot.edits == ['A']
+
+
+def test_edit_suppressed_by_failed_in_flight_edit_is_resent():
+    bot, scheduler = make_scheduler()
+    bot.failures.append(ApiError(400, 'Bad Request: message to edit not found'))
+    edit(scheduler, 'A')
+    in_flight = scheduler.poll_op()[0]
+    edit(scheduler, 'A')
+    assert scheduler.stats['suppressed'] == 1
+    scheduler.execute(in_flight)
+    scheduler.execute(scheduler.poll_op()[0])
+    assert bot.edits == ['A']
+    assert scheduler.stats['errors'] == 1
@@ -0,0 +1,108 @@
+# =================================================================
+#            tests/test_player.py - Player Representation Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import pytest
+
+import gametables
+import player as player_module
+from leaderboard import Leaderboard
+from player import Player
+from storage import MemoryBackend, PlayerStore
+
+SKILLS = gametables.tables.skill_ids
+QUESTS = gametables.tables.quest_ids
+PATHS = gametables.tables.path_names
+
+
+class FakeStore:
+    """فقط علامت‌گذاری تغییر بازیکنان را ثبت می‌کند."""
+
+    def __init__(self):
+        self.dirty = []
+
+    def mark_dirty(self, player):
+        self.dirty.append(player.user_id)
+
+
+@pytest.fixture
+def player():
+    player = Player(user_id=1, telegram_name="tester", path=gametables.tables.path_names[0])
+    player._store = FakeStore()
+    return player
+
+
+def test_list_views_write_through(player):
+    player.learned_skills.append(SKILLS[0])
+    player.completed_quests.extend([QUESTS[0]])
+    assert player.learned_skills == [SKILLS[0]]
+    assert player.has_skill(SKILLS[0]) and player.has_completed(QUESTS[0])
+    assert player.version == 2
+    assert player._store.dirty == [1, 1]
+
+
+def test_unknown_id_on_live_write_raises(player):
+    with pytest.raises(KeyError):
+        player.learned_skills.append('typo')
+    with pytest.raises(KeyError):
+        player.completed_quests = ['typo']
+    assert player.learned_skills == [] and player.completed_quests == []
+
+
+def test_stats_write_marks_player_dirty(player):
+    player.stats['strength'] = 9
+    assert player.stats['strength'] == 9
+    assert player.version == 1
+    assert player._store.dirty == [1]
+
+
+def test_record_round_trip_drops_removed_ids(player):
+    player.learned_skills = list(SKILLS)
+    player.completed_quests = [QUESTS[0]]
+    record = player.to_record()
+    assert record['learned_skills'] == list(SKILLS)
+    assert record['completed_quests'] == [QUESTS[0]]
+
+    record['completed_quests'].append('q_removed')
+    loaded = Player.from_record(record)
+    assert loaded.completed_quests == [QUESTS[0]]
+    assert loaded.learned_skills == list(SKILLS)
+    assert loaded.version == 0
+
+
+@pytest.fixture
+def board(monkeypatch):
+    board = Leaderboard(PATHS)
+    board.load([])
+    monkeypatch.setattr(player_module, 'leaderboard', board)
+    return board
+
+
+@pytest.fixture
+def store():
+    store = PlayerStore(MemoryBackend(), flush_interval=3600)
+    yield store
+    store.close()
+    player_module.game_world.occupancy.remove(5)
+
+
+@pytest.mark.parametrize('name, value', [
+    ('in_game_name', 'hero'), ('xp', 40), ('rank_index', 2), ('x', 1), ('y', 1),
+    ('gold', 7), ('attribute_points', 3), ('active_quests', {QUESTS[0]: 1}), ('path', PATHS[1]),
+])
+def test_public_writes_are_saved_and_versioned(board, store, name, value):
+    store[5] = Player(user_id=5, telegram_name="tester", path=PATHS[0])
+    store.flush()
+    player = store[5]
+    version = player.version
+
+    setattr(player, name, value)
+
+    assert player.version == version + 1
+    assert store.flush() == 1
+    assert store.backend.load(5)[name] == value
+    # جدول رده‌بندی همیشه وضعیت فعلی بازیکن را نشان می‌دهد
+    assert board.top(player.path) == [(5, player.rank_index, player.xp)]
+    assert sum(board.size(path) for path in PATHS) == 1
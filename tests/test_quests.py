@@ -0,0 +1,118 @@
+# =================================================================
+#            tests/test_quests.py - Quest Engine Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import pytest
+
+import gamedata
+import gametables
+from player import Player
+from quests import QuestBook, QuestEngine, QuestEvent
+
+WOLF_FIELDS = (1, 0)
+
+# کوئست‌های آزمایشی: دو کوئست مکان‌دار و یک کوئست بدون مکان برای همان هدف
+DEFINITIONS = {
+    't_wolves_here': {"name": "wolves here", "description": "", "location": WOLF_FIELDS,
+                      "objective": {"type": "kill", "target": "wolf", "count": 2},
+                      "rewards": {"xp": 100, "gold": 10}},
+    't_wolves_anywhere': {"name": "wolves anywhere", "description": "",
+                          "objective": {"type": "kill", "target": "wolf", "count": 3},
+                          "rewards": {"xp": 50, "attribute_points": 1}},
+    't_wolves_elsewhere': {"name": "wolves elsewhere", "description": "", "location": (5, 5),
+                           "objective": {"type": "kill", "target": "wolf", "count": 1},
+                           "rewards": {"xp": 1}},
+    't_herb': {"name": "herb", "description": "", "location": WOLF_FIELDS,
+               "objective": {"type": "find_item", "item": "rare_herb"},
+               "rewards": {"gold": 5}},
+}
+
+
+@pytest.fixture(autouse=True)
+def quest_tables(monkeypatch):
+    """جدول‌های بازی با کوئست‌های آزمایشی (تا finish_quest برای آن‌ها بیت داشته باشد)."""
+    data = dict(vars(gamedata), QUESTS=DEFINITIONS)
+    monkeypatch.setattr(gametables, 'tables', gametables.GameTables(data, previous=gametables.tables))
+
+
+@pytest.fixture
+def engine():
+    return QuestEngine(QuestBook(DEFINITIONS))
+
+
+@pytest.fixture
+def player():
+    return Player(user_id=1, telegram_name="tester", path=gametables.tables.path_names[0])
+
+
+def ids(quests):
+    return sorted(quest.id for quest in quests)
+
+
+def test_candidates_include_located_and_location_free_quests():
+    book = QuestBook(DEFINITIONS)
+    assert ids(book.candidates('kill', 'wolf', WOLF_FIELDS)) == ['t_wolves_anywhere', 't_wolves_here']
+    assert ids(book.candidates('kill', 'wolf', (9, 9))) == ['t_wolves_anywhere']
+    assert ids(book.candidates('kill', 'bear', WOLF_FIELDS)) == []
+    assert book.events_at(WOLF_FIELDS) == (('find_item', 'rare_herb'), ('kill', 'wolf'))
+    assert book.events_at((9, 9)) == ()
+
+
+def test_event_without_active_quest_does_nothing(engine, player):
+    assert engine.dispatch([QuestEvent(player, 'kill', 'wolf', WOLF_FIELDS)]) == []
+    assert engine.stats['checked'] == 0
+
+
+def test_scans_active_quests_when_fewer_than_candidates(engine, player):
+    engine.accept(player, 't_wolves_anywhere')
+    updates = engine.dispatch([QuestEvent(player, 'kill', 'wolf', WOLF_FIELDS)])
+    # دو کاندید از ایندکس، اما فقط یک کوئست فعال بررسی می‌شود
+    assert engine.stats['checked'] == 1
+    assert [(update.quest.id, update.progress, update.completed) for update in updates] == \
+        [('t_wolves_anywhere', 1, False)]
+    assert player.active_quests == {'t_wolves_anywhere': 1}
+
+
+def test_progress_is_capped_at_count(engine, player):
+    engine.accept(player, 't_wolves_here')
+    updates = engine.dispatch([QuestEvent(player, 'kill', 'wolf', WOLF_FIELDS, amount=5)])
+    assert [(update.progress, update.completed) for update in updates] == [(2, True)]
+
+
+def test_completion_moves_quest_to_completed(engine, player):
+    engine.accept(player, 't_wolves_here')
+    engine.accept(player, 't_herb')
+    engine.dispatch([QuestEvent(player, 'kill', 'wolf', WOLF_FIELDS)] * 2)
+
+    assert 't_wolves_here' not in player.active_quests
+    assert player.active_quests == {'t_herb': 0}
+    assert player.completed_quests == ['t_wolves_here']
+    assert player.has_completed('t_wolves_here')
+    assert not engine.accept(player, 't_wolves_here')
+    assert ids(engine.book.available_for(player)) == ['t_wolves_anywhere', 't_wolves_elsewhere']
+
+
+def test_rewards_of_several_completions_are_granted_once(engine, player, monkeypatch):
+    calls = []
+    grant_rewards = Player.grant_rewards
+
+    def record(self, **rewards):
+        calls.append((self.user_id, rewards))
+        grant_rewards(self, **rewards)
+
+    monkeypatch.setattr(Player, 'grant_rewards', record)
+    other = Player(user_id=2, telegram_name="other", path=gametables.tables.path_names[0])
+    for quest_id in ('t_wolves_here', 't_herb'):
+        engine.accept(player, quest_id)
+    engine.accept(other, 't_herb')
+
+    engine.dispatch([QuestEvent(player, 'kill', 'wolf', WOLF_FIELDS, amount=2),
+                     QuestEvent(player, 'find_item', 'rare_herb', WOLF_FIELDS),
+                     QuestEvent(other, 'find_item', 'rare_herb', WOLF_FIELDS)])
+
+    assert sorted(calls) == [(1, {'xp': 100, 'gold': 15, 'attribute_points': 0}),
+                             (2, {'xp': 0, 'gold': 5, 'attribute_points': 0})]
+    assert (player.xp, player.gold) == (100, 15)
+    assert engine.stats['reward_batches'] == 1
@@ -0,0 +1,67 @@
+# =================================================================
+#            tests/test_render.py - Render Cache Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import gametables
+from player import Player
+from render import UNKNOWN_LOCATION_TEXT, RenderCache
+
+# نقشه آزمایشی: هر خانه با x در بازه 0 تا 9 روی ردیف y=0 تعریف شده است
+WORLD = {(x, 0): {"name": f"tile {x}", "description": "test"} for x in range(10)}
+
+
+def make_player(user_id=1):
+    return Player(user_id=user_id, telegram_name="tester", path=gametables.tables.path_names[0])
+
+
+def test_version_bump_invalidates_status_body():
+    cache = RenderCache(WORLD)
+    player = make_player()
+    first = cache.status_text(player)
+    assert cache.status_text(player) == first
+    assert cache.stats['status_hits'] == 1
+
+    player.xp = 40                              # نوشتن عمومی، بدون متد کمکی
+    assert "40 /" in cache.status_text(player)
+    player.stats['strength'] = 77
+    assert "77" in cache.status_text(player)
+    player.gold = 123
+    assert "123" in cache.status_text(player)
+    assert cache.stats['status_misses'] == 4
+
+
+def test_new_player_object_with_same_version_is_not_served_stale_text():
+    cache = RenderCache(WORLD)
+    player = make_player()
+    cache.status_text(player)
+    replacement = make_player()
+    replacement._in_game_name = "renamed"       # نسخه همان 0 است، ولی شیء دیگری است
+    assert "renamed" in cache.status_text(replacement)
+
+
+def test_location_cache_stays_within_bound():
+    cache = RenderCache(WORLD, max_location_entries=3)
+    player = make_player()
+    for x in range(6):
+        player.x = x
+        assert cache.location_text(player).startswith(f"📍 **tile {x}**")
+        assert len(cache._locations) <= 3
+    assert list(cache._locations) == [(3, 0), (4, 0), (5, 0)]
+
+    player.x = 4                                # برخورد کش، تازه‌ترین می‌شود
+    cache.location_text(player)
+    assert list(cache._locations) == [(3, 0), (5, 0), (4, 0)]
+    assert cache.stats == dict(cache.stats, location_hits=1, location_misses=6)
+
+    player.y = 5
+    assert cache.location_text(player) == UNKNOWN_LOCATION_TEXT
+    assert len(cache._locations) == 3
+
+
+def test_status_cache_stays_within_bound():
+    cache = RenderCache(WORLD, max_status_entries=2)
+    for user_id in range(5):
+        cache.status_text(make_player(user_id))
+    assert list(cache._status) == [3, 4]
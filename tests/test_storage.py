@@ -0,0 +1,78 @@
+# =================================================================
+#            tests/test_storage.py - Player Store Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import sqlite3
+
+import pytest
+
+import gametables
+from player import Player
+from storage import PlayerStore, SQLiteBackend
+
+
+class FailingCommit:
+    """اتصال SQLite که یک بار در COMMIT خطا می‌دهد (مثل SQLITE_BUSY)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.failures = 1
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT" and self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.execute(sql, *args)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PlayerStore(SQLiteBackend(str(tmp_path / "players.db")), flush_interval=3600)
+    yield store
+    store.close()
+
+
+def make_player(user_id):
+    return Player(user_id=user_id, telegram_name=f"user{user_id}", path=gametables.tables.path_names[0])
+
+
+def test_failed_commit_rolls_back_and_retries_on_next_flush(store):
+    store[1] = make_player(1)
+    writer = store.backend._writer
+    store.backend._writer = FailingCommit(writer)
+
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    assert not writer.in_transaction
+    assert store.stats['flush_errors'] == 1
+
+    assert store.flush() == 1
+    assert store.backend.count() == 1
+
+
+def test_unknown_user_lookup_is_cached_until_player_is_created(store, monkeypatch):
+    loads = []
+    load = store.backend.load
+    monkeypatch.setattr(store.backend, 'load', lambda user_id: loads.append(user_id) or load(user_id))
+
+    assert 7 not in store
+    assert store.get(7) is None
+    assert loads == [7]
+    assert store.stats['misses'] == 1
+
+    store[7] = make_player(7)
+    assert 7 in store
+    assert loads == [7]
+
+
+def test_cached_miss_expires(store, monkeypatch):
+    store.miss_ttl = 0
+    monkeypatch.setattr(store.backend, 'load', lambda user_id: None)
+    assert 7 not in store
+    assert 7 not in store
+    assert store.stats['misses'] == 2
@@ -0,0 +1,103 @@
+# =================================================================
+#            tests/test_training.py - Training Scheduler Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+import threading
+
+import gametables
+from ingress import UpdateIntake
+from player import Player
+from training import TrainingScheduler
+
+PATH = gametables.tables.path_names[0]
+
+
+class InlineIntake:
+    """run_batched را بدون نخ کارگر و همان لحظه اجرا می‌کند."""
+
+    def run_batched(self, keyed_items, fn, on_done=None):
+        items = [item for _, item in keyed_items]
+        if items:
+            fn(items)
+        if on_done is not None:
+            on_done()
+
+
+def make_scheduler(player, session_seconds):
+    notified = []
+    scheduler = TrainingScheduler({player.user_id: player}, InlineIntake(), notified.append,
+                                  xp_per_minute=60.0, tick_interval=10.0, session_seconds=session_seconds)
+    return scheduler, notified
+
+
+def test_session_ending_on_the_tick_that_makes_player_ready_is_notified():
+    player = Player(user_id=1, telegram_name="tester", path=PATH)
+    needed = player.get_rank_info()['xp_needed']
+    player.add_xp(needed - 5)
+    # جلسه یک تیکی: همان تیکی که XP کافی می‌دهد، به ends_at هم می‌رسد
+    scheduler, notified = make_scheduler(player, session_seconds=10.0)
+    assert scheduler.start_session(player.user_id, chat_id=42)
+    ends_at = scheduler._sessions[player.user_id].ends_at
+
+    scheduler._credit(scheduler._collect_due(ends_at))
+
+    assert player.can_breakthrough()
+    assert notified == [[(42, player)]]
+    assert not scheduler.is_training(player.user_id)
+    assert scheduler.stats['finished'] == 1
+
+
+def test_stopped_session_is_not_notified():
+    player = Player(user_id=1, telegram_name="tester", path=PATH)
+    player.add_xp(player.get_rank_info()['xp_needed'])
+    scheduler, notified = make_scheduler(player, session_seconds=3600.0)
+    scheduler.start_session(player.user_id, chat_id=42)
+
+    assert scheduler.stop_session(player.user_id)
+    assert notified == []
+    assert not scheduler.is_training(player.user_id)
+
+
+def test_stop_session_credits_partial_xp():
+    player = Player(user_id=1, telegram_name="tester", path=PATH)
+    scheduler, notified = make_scheduler(player, session_seconds=3600.0)
+    scheduler.start_session(player.user_id, chat_id=42)
+    # 10 ثانیه تمرین از آخرین تیک (1 XP در ثانیه)
+    scheduler._sessions[player.user_id].credited_at -= 10.5
+
+    assert scheduler.stop_session(player.user_id)
+    assert player.xp == 10
+    assert scheduler.stats['xp_credited'] == 10
+    assert scheduler.stop_session(player.user_id) is False
+    assert notified == []
+
+
+def test_one_notify_per_tick_across_workers():
+    players = {user_id: Player(user_id=user_id, telegram_name=f"user{user_id}", path=PATH) for user_id in range(16)}
+    for player in players.values():
+        player.add_xp(player.get_rank_info()['xp_needed'])
+    calls = []
+    done = threading.Event()
+
+    def notify(ready):
+        calls.append(ready)
+        done.set()
+
+    intake = UpdateIntake(lambda update: None, workers=4)
+    scheduler = TrainingScheduler(players, intake, notify, tick_interval=10.0)
+    assert len({intake.shard_of(user_id) for user_id in players}) == 4
+    for user_id in players:
+        scheduler.start_session(user_id, chat_id=user_id)
+    due = max(session.due for session in scheduler._sessions.values())
+
+    intake.start()
+    scheduler._credit(scheduler._collect_due(due))
+    assert done.wait(5)
+    intake.stop()
+
+    assert len(calls) == 1
+    assert sorted(chat_id for chat_id, _ in calls[0]) == sorted(players)
+    assert scheduler.stats['notified'] == 16
+    assert scheduler.active_sessions() == 0
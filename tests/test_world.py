@@ -0,0 +1,30 @@
+# =================================================================
+#            tests/test_world.py - World Spatial Index Tests
+#
+# اجرا: python -m pytest -q
+# =================================================================
+
+from world import Occupancy
+
+
+def test_empty_tiles_are_dropped_from_the_index():
+    occupancy = Occupancy()
+    occupancy.place(1, (0, 0))
+    occupancy.place(2, (0, 0))
+    occupancy.place(1, (0, 1))
+    assert occupancy.players_on((0, 0)) == {2}
+
+    occupancy.place(2, (5, 5))
+    assert (0, 0) not in occupancy._tiles
+    occupancy.remove(1)
+    occupancy.remove(2)
+    assert occupancy._tiles == {} and occupancy._positions == {}
+
+
+def test_players_within_radius():
+    occupancy = Occupancy()
+    occupancy.place(1, (0, 0))
+    occupancy.place(2, (3, 4))
+    occupancy.place(3, (10, 10))
+    assert occupancy.players_within(0, 0, 5) == {1, 2}
+    assert occupancy.players_within(0, 0, 4.9) == {1}
@@ -0,0 +1,222 @@
+# =================================================================
+#            training.py - Idle Training Tick Scheduler
+#
+# در حالت «تمرین خودکار»، بازیکن یک جلسه تمرین را شروع می‌کند و به
+# جای یک کلیک (و یک رفت‌وبرگشت API) برای هر 25 XP، یک زمان‌بند مرکزی
+# به صورت دوره‌ای XP همه بازیکنان در حال تمرین را یکجا اعتبار می‌دهد:
+#   - یک هیپ زمان‌سنج (due_time, user_id) و یک نخ که در هر تیک تمام
+#     جلسه‌های سررسیده را با هم برمی‌دارد
+#   - محاسبه XP دسته به صورت برداری (NumPy) انجام می‌شود
+#   - اعمال XP روی نخ کارگر هر کاربر (UpdateIntake.run_batched) انجام
+#     می‌شود تا با کلیک‌های هم‌زمان همان کاربر تداخل نداشته باشد
+#   - وقتی بازیکن آماده صعود شد (با XP تمرین یا هر XP دیگری مثل کلیک و
+#     جایزه کوئست)، جلسه‌اش در همان تیک تمام می‌شود و اعلان‌های کل تیک
+#     با یک فراخوانی notify (یک ارسال دسته‌ای) فرستاده می‌شوند
+#
+# معنای can_breakthrough و perform_breakthrough تغییری نمی‌کند؛
+# XP فقط از طریق add_xp اضافه می‌شود و صعود همچنان دستی است.
+# جلسه‌های تمرین در حافظه نگه داشته می‌شوند و با ری‌استارت از بین می‌روند.
+# =================================================================
+
+import heapq
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingSession:
+    __slots__ = ('user_id', 'chat_id', 'credited_at', 'ends_at', 'due')
+
+    def __init__(self, user_id, chat_id, started_at, ends_at):
+        self.user_id = user_id
+        self.chat_id = chat_id                  # چت مقصد اعلان آماده بودن برای صعود
+        self.credited_at = started_at           # آخرین لحظه‌ای که XP تا آن اعتبار داده شده
+        self.ends_at = ends_at
+        self.due = None                         # زمان تیک بعدی (برای حذف تنبل ورودی‌های کهنه هیپ)
+
+
+class TrainingScheduler:
+    """زمان‌بند مرکزی تیک‌های تمرین خودکار."""
+
+    def __init__(self, players, intake, notify, xp_per_minute: float = 60.0,
+                 tick_interval: float = 30.0, session_seconds: float = 3600.0):
+        self.players = players                  # انبار بازیکنان (storage.PlayerStore)
+        self.intake = intake                    # ingress.UpdateIntake برای اجرا روی نخ هر کاربر
+        self.notify = notify                    # notify(list[(chat_id, Player)]): ارسال دسته‌ای اعلان‌ها
+        self.xp_per_second = xp_per_minute / 60
+        self.tick_interval = tick_interval
+        self.session_seconds = session_seconds
+
+        self._sessions = {}                     # user_id -> TrainingSession
+        self._heap = []                         # (due, user_id)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.stats = {'started': 0, 'finished': 0, 'ticks': 0, 'credited_sessions': 0, 'xp_credited': 0,
+                      'notified': 0}
+
+    # --- مدیریت جلسه‌ها ---
+
+    def start_session(self, user_id: int, chat_id: int) -> bool:
+        """جلسه تمرین را شروع می‌کند؛ اگر بازیکن از قبل در حال تمرین بود False برمی‌گرداند."""
+        now = time.monotonic()
+        with self._cond:
+            if user_id in self._sessions:
+                return False
+            session = TrainingSession(user_id, chat_id, now, now + self.session_seconds)
+            self._sessions[user_id] = session
+            self._push(session, self._next_tick(now))
+            self.stats['started'] += 1
+            self._cond.notify()
+        return True
+
+    def stop_session(self, user_id: int) -> bool:
+        """
+        جلسه را متوقف و XP زمان سپری‌شده از آخرین تیک را همان لحظه اعتبار می‌دهد.
+        باید روی نخ کارگر همان کاربر فراخوانی شود (مثلاً از هندلر دکمه).
+        """
+        with self._cond:
+            session = self._sessions.pop(user_id, None)
+            if session is None:
+                return False
+            gain = self._gain(session, time.monotonic())
+        self._apply([(session, gain, False)])
+        return True
+
+    def is_training(self, user_id: int) -> bool:
+        return user_id in self._sessions
+
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+    def _next_tick(self, now: float) -> float:
+        # تیک‌ها روی یک شبکه زمانی مشترک هستند تا جلسه‌ها با هم سررسید شوند و در یک دسته پردازش شوند
+        return (math.floor(now / self.tick_interval) + 1) * self.tick_interval
+
+    def _push(self, session, due):
+        session.due = min(due, session.ends_at)
+        heapq.heappush(self._heap, (session.due, session.user_id))
+
+    def _gain(self, session, now) -> int:
+        until = min(now, session.ends_at)
+        gain = int((until - session.credited_at) * self.xp_per_second)
+        # کسر باقی‌مانده XP به تیک بعد منتقل می‌شود
+        session.credited_at += gain / self.xp_per_second if self.xp_per_second else 0
+        return gain
+
+    # --- حلقه تیک ---
+
+    def _collect_due(self, now):
+        """تمام جلسه‌های سررسیده را از هیپ برمی‌دارد و XP هر کدام را به صورت برداری محاسبه می‌کند."""
+        due_sessions = []
+        while self._heap and self._heap[0][0] <= now:
+            due, user_id = heapq.heappop(self._heap)
+            session = self._sessions.get(user_id)
+            if session is None or session.due != due:
+                continue                        # جلسه متوقف شده یا ورودی کهنه است
+            due_sessions.append(session)
+        if not due_sessions:
+            return []
+
+        credited_at = np.fromiter((s.credited_at for s in due_sessions), dtype=np.float64, count=len(due_sessions))
+        ends_at = np.fromiter((s.ends_at for s in due_sessions), dtype=np.float64, count=len(due_sessions))
+        elapsed = np.minimum(ends_at, now) - credited_at
+        gains = (elapsed * self.xp_per_second).astype(np.int64)
+        new_credited = credited_at + gains / self.xp_per_second if self.xp_per_second else credited_at
+        finished = ends_at <= now
+
+        batch = []
+        for session, gain, credited, done in zip(due_sessions, gains.tolist(), new_credited.tolist(), finished.tolist()):
+            session.credited_at = credited
+            if done:
+                del self._sessions[session.user_id]
+                self.stats['finished'] += 1
+            else:
+                self._push(session, self._next_tick(now))
+            batch.append((session, gain, done))
+        return batch
+
+    def _credit(self, batch):
+        """
+        XP را روی نخ کارگر هر کاربر اعمال می‌کند؛ پس از اجرای همه گروه‌ها،
+        بازیکنان آماده صعود کل تیک با یک فراخوانی notify اعلان می‌شوند.
+        """
+        ready = []
+        self.intake.run_batched([(item[0].user_id, item) for item in batch],
+                                lambda items: ready.extend(self._apply(items)),
+                                on_done=lambda: self._notify(ready))
+
+    def _notify(self, ready):
+        if ready:
+            with self._cond:
+                self.stats['notified'] += len(ready)
+            self.notify(ready)
+
+    def _apply(self, items) -> list:
+        """XP را اعمال و جلسه بازیکنان آماده صعود را تمام می‌کند؛ خروجی: [(chat_id, Player)] آن‌ها."""
+        ready = []
+        credited_xp = credited_sessions = 0
+        for session, gain, done in items:
+            player = self.players.get(session.user_id)
+            if player is None:
+                continue
+            if gain > 0:
+                player.add_xp(gain)
+                credited_xp += gain
+                credited_sessions += 1
+            if player.can_breakthrough():
+                # XP اضافه پس از رسیدن به آستانه هدر می‌رود؛ پس جلسه همین‌جا تمام می‌شود
+                # (حتی اگر بازیکن پیش از این تیک و با XP دیگری آماده شده باشد)
+                # done: جلسه در همین تیک به ends_at رسیده و _collect_due آن را حذف کرده است
+                with self._cond:
+                    if self._sessions.get(session.user_id) is session:
+                        del self._sessions[session.user_id]
+                        self.stats['finished'] += 1
+                    elif not done:
+                        continue                # جلسه قبلاً متوقف شده (مثلاً stop_session)
+                ready.append((session.chat_id, player))
+        # _apply روی چند نخ کارگر هم‌زمان اجرا می‌شود؛ آمار فقط زیر قفل به‌روز می‌شود
+        with self._cond:
+            self.stats['xp_credited'] += credited_xp
+            self.stats['credited_sessions'] += credited_sessions
+        return ready
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                if self._stopping:
+                    return
+                batch = self._collect_due(time.monotonic())
+                self.stats['ticks'] += 1
+            if batch:
+                try:
+                    self._credit(batch)
+                except Exception:
+                    logger.exception("Training tick failed")
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="training-ticks", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
@@ -0,0 +1,239 @@
+# =================================================================
+#            world.py - The Chunked World Map
+#
+# این فایل نقشه بزرگ بازی را پیاده‌سازی می‌کند. نقشه به چانک‌های
+# مربعی تقسیم می‌شود و هر چانک در اولین بازدید، به صورت قطعی
+# (Deterministic) از روی seed دنیا و مختصات چانک تولید می‌شود:
+#   - هر خانه فقط یک بایت (شناسه نوع زمین) حافظه می‌گیرد
+#   - چانک‌های بارگذاری‌شده در یک کش LRU با سقف حافظه نگه داشته
+#     می‌شوند؛ چانک‌های بیرون‌رانده‌شده می‌توانند در یک فایل
+#     memory-mapped ذخیره شوند تا دوباره تولید نشوند
+#   - پرس‌وجوهای مکانی: خانه‌های داخل شعاع r و بازیکنان روی یک خانه
+#
+# شیء game_world مانند دیکشنری قدیمی gamedata.game_world رفتار
+# می‌کند: (x, y) in game_world و game_world[(x, y)]
+# =================================================================
+
+import math
+import mmap
+import os
+import random
+import threading
+from collections import OrderedDict
+
+import gamedata
+
+# شناسه صفر یعنی «هنوز تولید نشده» (در فایل mmap) یا «خارج از نقشه»
+UNGENERATED = 0
+
+
+class Occupancy:
+    """ایندکس مکانی بازیکنان آنلاین: کدام بازیکن روی کدام خانه است."""
+
+    def __init__(self):
+        self._tiles = {}                        # (x, y) -> set(user_id)
+        self._positions = {}                    # user_id -> (x, y)
+        self._lock = threading.Lock()
+
+    def place(self, user_id: int, coords: tuple):
+        """بازیکن را روی خانه coords قرار می‌دهد (و از خانه قبلی برمی‌دارد)."""
+        with self._lock:
+            old = self._positions.get(user_id)
+            if old == coords:
+                return
+            if old is not None:
+                occupants = self._tiles[old]
+                occupants.discard(user_id)
+                if not occupants:
+                    del self._tiles[old]
+            self._positions[user_id] = coords
+            self._tiles.setdefault(coords, set()).add(user_id)
+
+    def remove(self, user_id: int):
+        with self._lock:
+            coords = self._positions.pop(user_id, None)
+            if coords is not None:
+                occupants = self._tiles[coords]
+                occupants.discard(user_id)
+                if not occupants:
+                    del self._tiles[coords]
+
+    def players_on(self, coords: tuple) -> set:
+        """شناسه بازیکنان روی یک خانه."""
+        with self._lock:
+            return set(self._tiles.get(coords, ()))
+
+    def players_within(self, x: int, y: int, r: float) -> set:
+        """شناسه بازیکنان در فاصله اقلیدسی r از (x, y)."""
+        r2 = r * r
+        found = set()
+        with self._lock:
+            area = (2 * r + 1) ** 2
+            if area < len(self._tiles):
+                for dx, dy in _disc_offsets(r):
+                    found.update(self._tiles.get((x + dx, y + dy), ()))
+            else:
+                for (tx, ty), occupants in self._tiles.items():
+                    if (tx - x) ** 2 + (ty - y) ** 2 <= r2:
+                        found.update(occupants)
+        return found
+
+
+def _disc_offsets(r: float):
+    ri = int(r)
+    r2 = r * r
+    for dy in range(-ri, ri + 1):
+        span = int(math.sqrt(r2 - dy * dy))
+        for dx in range(-span, span + 1):
+            yield dx, dy
+
+
+class ChunkedWorld:
+    """نقشه چانک‌بندی‌شده با تولید تنبل، کش LRU و پشتیبان اختیاری mmap."""
+
+    def __init__(self, seed: int, terrains: dict, landmarks: dict = None, chunk_size: int = 32,
+                 size_chunks: int = 1024, max_memory: int = 64 * 2**20, mmap_path: str = None):
+        self.seed = seed
+        self.terrains = terrains
+        self.landmarks = dict(landmarks or {})  # مکان‌های دست‌ساز با اولویت بر نقشه تولیدی
+        self.chunk_size = chunk_size
+        self.size_chunks = size_chunks
+        self.half = size_chunks // 2            # مختصات چانک در بازه [-half, half)
+        self.chunk_bytes = chunk_size * chunk_size
+        # هزینه تقریبی هر چانک در حافظه: داده‌ها + سربار شیء bytes و ورودی کش
+        self.max_chunks = max(1, max_memory // (self.chunk_bytes + 200))
+
+        self._terrain_ids = [tid for tid in terrains]
+        self._terrain_weights = [terrains[tid].get('weight', 1) for tid in self._terrain_ids]
+        # جدول جست‌وجوی سریع: passable[شناسه زمین] -> 0 یا 1
+        self._passable = bytes(1 if tid in terrains and terrains[tid]['passable'] else 0 for tid in range(256))
+
+        self._chunks = OrderedDict()            # (cx, cy) -> bytes (به ترتیب LRU)
+        self._lock = threading.Lock()
+        self.occupancy = Occupancy()
+        self.stats = {'chunk_hits': 0, 'generated': 0, 'mmap_loads': 0, 'evicted': 0}
+
+        self._mmap = None
+        if mmap_path:
+            size = size_chunks * size_chunks * self.chunk_bytes
+            with open(mmap_path, 'a+b') as f:
+                if os.path.getsize(mmap_path) < size:
+                    f.truncate(size)            # فایل تنک (sparse): فضای دیسک فقط برای چانک‌های نوشته‌شده
+                self._mmap = mmap.mmap(f.fileno(), size)
+
+    # --- تولید و بارگذاری چانک‌ها ---
+
+    def _chunk_seed(self, cx: int, cy: int) -> int:
+        # ترکیب قطعی و مستقل از اجرای پایتون (برخلاف hash رشته‌ها)
+        return (self.seed * 0x9E3779B1 ^ (cx & 0xFFFFFFFF) * 73856093 ^ (cy & 0xFFFFFFFF) * 19349663) & 0xFFFFFFFFFFFF
+
+    def _generate(self, cx: int, cy: int) -> bytes:
+        rng = random.Random(self._chunk_seed(cx, cy))
+        return bytes(rng.choices(self._terrain_ids, weights=self._terrain_weights, k=self.chunk_bytes))
+
+    def _mmap_offset(self, cx: int, cy: int) -> int:
+        return ((cy + self.half) * self.size_chunks + (cx + self.half)) * self.chunk_bytes
+
+    def _chunk(self, cx: int, cy: int) -> bytes:
+        key = (cx, cy)
+        with self._lock:
+            data = self._chunks.get(key)
+            if data is not None:
+                self._chunks.move_to_end(key)
+                self.stats['chunk_hits'] += 1
+                return data
+
+            if self._mmap is not None:
+                offset = self._mmap_offset(cx, cy)
+                if self._mmap[offset] != UNGENERATED:
+                    data = self._mmap[offset:offset + self.chunk_bytes]
+                    self.stats['mmap_loads'] += 1
+            if data is None:
+                data = self._generate(cx, cy)
+                self.stats['generated'] += 1
+
+            self._chunks[key] = data
+            if len(self._chunks) > self.max_chunks:
+                self._evict()
+            return data
+
+    def _evict(self):
+        (cx, cy), data = self._chunks.popitem(last=False)
+        self.stats['evicted'] += 1
+        if self._mmap is not None:
+            offset = self._mmap_offset(cx, cy)
+            if self._mmap[offset] == UNGENERATED:
+                self._mmap[offset:offset + self.chunk_bytes] = data
+
+    def _in_bounds(self, x: int, y: int) -> bool:
+        limit = self.half * self.chunk_size
+        return -limit <= x < limit and -limit <= y < limit
+
+    def terrain_at(self, x: int, y: int) -> int:
+        """شناسه نوع زمین خانه (x, y)؛ صفر برای خارج از نقشه."""
+        if not self._in_bounds(x, y):
+            return UNGENERATED
+        cs = self.chunk_size
+        return self._chunk(x // cs, y // cs)[(y % cs) * cs + (x % cs)]
+
+    # --- رابط شبیه دیکشنری (سازگار با gamedata.game_world قدیمی) ---
+
+    def __contains__(self, coords) -> bool:
+        if coords in self.landmarks:
+            return True
+        return bool(self._passable[self.terrain_at(*coords)])
+
+    def __getitem__(self, coords) -> dict:
+        location = self.landmarks.get(coords)
+        if location is not None:
+            return location
+        terrain_id = self.terrain_at(*coords)
+        if not self._passable[terrain_id]:
+            raise KeyError(coords)
+        return self.terrains[terrain_id]
+
+    def get(self, coords, default=None):
+        try:
+            return self[coords]
+        except KeyError:
+            return default
+
+    # --- پرس‌وجوهای مکانی ---
+
+    def tiles_within(self, x: int, y: int, r: float) -> list:
+        """مختصات خانه‌های قابل عبور در فاصله اقلیدسی r از (x, y)."""
+        cs = self.chunk_size
+        r2 = r * r
+        ri = int(r)
+        found = []
+        # هر چانک فقط یک بار از کش خوانده می‌شود
+        for cy in range((y - ri) // cs, (y + ri) // cs + 1):
+            for cx in range((x - ri) // cs, (x + ri) // cs + 1):
+                x0, y0 = cx * cs, cy * cs
+                chunk = self._chunk(cx, cy) if self._in_bounds(x0, y0) else None
+                for ty in range(max(y0, y - ri), min(y0 + cs, y + ri + 1)):
+                    dy2 = (ty - y) ** 2
+                    row = (ty - y0) * cs
+                    for tx in range(max(x0, x - ri), min(x0 + cs, x + ri + 1)):
+                        if (tx - x) ** 2 + dy2 > r2:
+                            continue
+                        if (tx, ty) in self.landmarks or (chunk is not None and self._passable[chunk[row + tx - x0]]):
+                            found.append((tx, ty))
+        return found
+
+    def players_on(self, coords: tuple) -> set:
+        """شناسه بازیکنان آنلاین روی یک خانه."""
+        return self.occupancy.players_on(coords)
+
+    def loaded_chunks(self) -> int:
+        return len(self._chunks)
+
+
+# --- نمونه سراسری دنیای بازی ---
+game_world = ChunkedWorld(seed=int(os.environ.get('WORLD_SEED', gamedata.WORLD_SEED)),
+                          terrains=gamedata.TERRAINS,
+                          landmarks=gamedata.game_world,
+                          chunk_size=gamedata.WORLD_CHUNK_SIZE,
+                          size_chunks=gamedata.WORLD_SIZE_CHUNKS,
+                          max_memory=int(os.environ.get('WORLD_MAX_MEMORY', 64 * 2**20)),
+                          mmap_path=os.environ.get('WORLD_MMAP_PATH'))